@@ -0,0 +1,245 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import openai
+import yaml
+
+from config.production import ProductionConfig
+from report_generator import RiskReportGenerator
+from services.pdf_reports import PdfReportRenderer
+from utils.api_security import LLMRateLimiter, openai_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Errors worth another attempt; anything else (missing data, bad model) fails the site at once
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+    ConnectionError,
+    TimeoutError
+)
+
+def load_sites(path='config/sites.yaml'):
+    """Site id -> database path, from a YAML mapping or a list of {site_id, db_path}"""
+    with open(path) as f:
+        sites = yaml.safe_load(f) or {}
+    if isinstance(sites, list):
+        sites = {site['site_id']: site['db_path'] for site in sites}
+    return {str(site_id): db_path for site_id, db_path in sites.items()}
+
+@dataclass
+class SiteReportResult:
+    site_id: str
+    ok: bool
+    attempts: int
+    seconds: float
+    report_path: Optional[str] = None
+    pdf_path: Optional[str] = None
+    error: Optional[str] = None
+
+@dataclass
+class BatchReportSummary:
+    results: List[SiteReportResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> List[SiteReportResult]:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> List[SiteReportResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def reports_per_minute(self) -> float:
+        return len(self.succeeded) * 60 / self.seconds if self.seconds else 0.0
+
+class BatchReportRunner:
+    """
+    Generates one report per site concurrently on a single event loop
+    At most `concurrency` reports are in flight at once. Every LLM call also
+    passes the shared request/token buckets, so the fleet stays under the
+    provider limits however many sites there are. Transient failures are
+    retried with full-jitter exponential backoff. A site that still fails is
+    reported in the summary without stopping the rest of the batch. With
+    render_pdf, each report is also rendered to PDF on a process pool shared
+    by all sites, outside the concurrency limit.
+    """
+
+    def __init__(self, sites: Dict[str, str], output_dir='data/reports/batch', concurrency=8,
+                 max_retries=3, base_delay=1.0, max_delay=30.0,
+                 rate_limiter: Optional[LLMRateLimiter] = None,
+                 llm_factory: Optional[Callable] = None, render_pdf=False,
+                 pdf_workers=ProductionConfig.REPORT_RENDER_WORKERS,
+                 chart_dir=ProductionConfig.REPORT_CHART_DIR):
+        self.sites = sites
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiter = rate_limiter or openai_rate_limiter
+        self.llm_factory = llm_factory
+        self.render_pdf = render_pdf
+        self.pdf_workers = pdf_workers
+        self.chart_dir = chart_dir
+        self._pdf_executor: Optional[ProcessPoolExecutor] = None
+
+    def _backoff(self, attempt):
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt))"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _write_report(self, site_id, report):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d')
+        path = os.path.join(self.output_dir, f"{site_id}_{stamp}.txt")
+        with open(path, 'w') as f:
+            f.write(report)
+        return path
+
+    async def _render_pdf(self, site_id, generator, report):
+        renderer = PdfReportRenderer(generator.db_manager, sensor_id=site_id,
+                                     output_dir=os.path.join(self.output_dir, 'pdf'),
+                                     chart_dir=self.chart_dir, executor=self._pdf_executor)
+        _, rendered = await asyncio.to_thread(renderer.render, report)
+        return await asyncio.wrap_future(rendered)
+
+    async def _run_site(self, site_id, db_path, semaphore):
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with semaphore:
+                    generator = RiskReportGenerator(
+                        db_path,
+                        llm=self.llm_factory() if self.llm_factory else None,
+                        rate_limiter=self.rate_limiter,
+                        site_id=site_id
+                    )
+                    report = await generator.agenerate_report()
+                path = await asyncio.to_thread(self._write_report, site_id, report)
+                pdf_path = await self._render_pdf(site_id, generator, report) if self.render_pdf else None
+                return SiteReportResult(site_id, True, attempt, time.perf_counter() - started,
+                                        report_path=path, pdf_path=pdf_path)
+            except RETRYABLE_ERRORS as e:
+                if attempt > self.max_retries:
+                    error = f"{type(e).__name__}: {e}"
+                    break
+                delay = self._backoff(attempt - 1)
+                logger.warning(f"Report for site {site_id} failed ({e}); retry {attempt} in {delay:.1f}s")
+                # Sleep outside the semaphore so other sites use the slot meanwhile
+                await asyncio.sleep(delay)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                break
+
+        logger.error(f"Report for site {site_id} failed after {attempt} attempt(s): {error}")
+        return SiteReportResult(site_id, False, attempt, time.perf_counter() - started, error=error)
+
+    async def run(self) -> BatchReportSummary:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        if self.render_pdf:
+            self._pdf_executor = ProcessPoolExecutor(self.pdf_workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            results = await asyncio.gather(
+                *(self._run_site(site_id, db_path, semaphore) for site_id, db_path in self.sites.items())
+            )
+        finally:
+            if self._pdf_executor is not None:
+                self._pdf_executor.shutdown()
+                self._pdf_executor = None
+        summary = BatchReportSummary(list(results), time.perf_counter() - started)
+        logger.info(f"Generated {len(summary.succeeded)}/{len(results)} site reports "
+                    f"in {summary.seconds:.1f}s ({len(summary.failed)} failed)")
+        return summary
+
+class StubLLM:
+    """Local stand-in for the OpenAI client with fixed latency and a failure rate"""
+
+    def __init__(self, latency=0.5, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency * self.random.uniform(0.8, 1.2))
+        if self.random.random() < self.failure_rate:
+            raise ConnectionError("stub LLM connection reset")
+        return f"Stub report for a {len(prompt)}-character prompt."
+
+def _benchmark_site(path):
+    """Small site database with a day of simulated readings"""
+    from services.sensor_simulation import ingest_simulator
+    from utils.database import DatabaseManager
+
+    simulator = ingest_simulator(DatabaseManager(path))
+    simulator.save_to_db(simulator.simulate_batch(duration_hours=24))
+    return path
+
+def run_benchmark(n_sites=100, concurrency_levels=(1, 8, 32), latency=0.5, failure_rate=0.05,
+                  requests_per_minute=6000, tokens_per_minute=2_000_000, render_pdf=False):
+    """Throughput of the runner at several concurrency levels against StubLLM"""
+    with tempfile.TemporaryDirectory() as tmp:
+        template = _benchmark_site(os.path.join(tmp, 'site.db'))
+        sites = {f"site-{i:04d}": template for i in range(n_sites)}
+        rows = []
+        for concurrency in concurrency_levels:
+            runner = BatchReportRunner(
+                sites, output_dir=os.path.join(tmp, f"reports-{concurrency}"),
+                concurrency=concurrency, base_delay=0.05, max_delay=0.5,
+                rate_limiter=LLMRateLimiter(requests_per_minute, tokens_per_minute),
+                llm_factory=lambda: StubLLM(latency, failure_rate),
+                render_pdf=render_pdf, chart_dir=os.path.join(tmp, 'charts')
+            )
+            summary = asyncio.run(runner.run())
+            rows.append((concurrency, summary))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate risk reports for every site")
+    parser.add_argument('--sites', default='config/sites.yaml', help="YAML mapping of site id to database path")
+    parser.add_argument('--output-dir', default='data/reports/batch')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--max-retries', type=int, default=3)
+    parser.add_argument('--pdf', action='store_true', help="also render each report to PDF")
+    parser.add_argument('--benchmark', action='store_true', help="measure throughput against a stub LLM")
+    parser.add_argument('--benchmark-sites', type=int, default=100)
+    parser.add_argument('--stub-latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if args.benchmark else logging.INFO)
+
+    if args.benchmark:
+        for concurrency, summary in run_benchmark(args.benchmark_sites, latency=args.stub_latency,
+                                                   render_pdf=args.pdf):
+            retries = sum(r.attempts - 1 for r in summary.results)
+            print(f"concurrency {concurrency:>3}: {len(summary.succeeded)}/{len(summary.results)} ok, "
+                  f"{retries} retries, {summary.seconds:6.1f}s, {summary.reports_per_minute:8.0f} reports/min")
+        return
+
+    runner = BatchReportRunner(load_sites(args.sites), args.output_dir,
+                               concurrency=args.concurrency, max_retries=args.max_retries, render_pdf=args.pdf)
+    summary = asyncio.run(runner.run())
+    print(f"{len(summary.succeeded)}/{len(summary.results)} reports written to {args.output_dir} "
+          f"in {summary.seconds:.1f}s")
+    for result in summary.failed:
+        print(f"  FAILED {result.site_id} after {result.attempts} attempt(s): {result.error}")
+    if summary.failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
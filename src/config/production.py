@@ -1,6 +1,9 @@
 from dataclasses import dataclass
 from typing import Dict
 import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 @dataclass
 class ProductionConfig:
@@ -8,11 +11,21 @@ class ProductionConfig:
     DB_POOL_SIZE: int = 5
     DB_POOL_TIMEOUT: int = 30
     DB_MAX_OVERFLOW: int = 10
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", 100))   # statements this slow are logged
+    DB_SLOW_QUERY_LOG_SIZE: int = 200     # slow statements kept for GET /admin/slow-queries
+    DB_EXPLAIN_SLOW_QUERIES: bool = os.getenv("DB_EXPLAIN_SLOW_QUERIES", "true").lower() == "true"
     
     # API Rate limits
     API_RATE_LIMIT: int = 60  # requests per minute
     API_TIMEOUT: int = 30     # seconds
     
+    # Admission control (see middleware/admission.py)
+    ADMISSION_CONTROL_ENABLED: bool = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0   # seconds a request may wait for a slot
+    ADMISSION_RETRY_AFTER: int = 5         # Retry-After sent with 503s
+    ADMISSION_CRITICAL_P99: float = float(os.getenv("ADMISSION_CRITICAL_P99", 0.25))
+    ADMISSION_EXPENSIVE_CONCURRENCY: int = int(os.getenv("ADMISSION_EXPENSIVE_CONCURRENCY", 4))
+    
     # Cache settings
     CACHE_TYPE: str = "redis"
     CACHE_REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -23,14 +36,54 @@ class ProductionConfig:
     SESSION_COOKIE_HTTPONLY: bool = True
     PERMANENT_SESSION_LIFETIME: int = 3600  # 1 hour
     
-    # Monitoring thresholds
+    # Risk thresholds: the safe range of each parameter (see .env.example).
+    # Every risk rule, model label and risk level is derived from these.
+    TEMPERATURE_THRESHOLD: float = float(os.getenv("TEMPERATURE_THRESHOLD", 25))
+    PH_MIN_THRESHOLD: float = float(os.getenv("PH_MIN_THRESHOLD", 6.5))
+    PH_MAX_THRESHOLD: float = float(os.getenv("PH_MAX_THRESHOLD", 8.5))
+    TURBIDITY_THRESHOLD: float = float(os.getenv("TURBIDITY_THRESHOLD", 8))
+    DISSOLVED_OXYGEN_THRESHOLD: float = float(os.getenv("DISSOLVED_OXYGEN_THRESHOLD", 6))
+    CONDUCTIVITY_THRESHOLD: float = float(os.getenv("CONDUCTIVITY_THRESHOLD", 600))
+    HIGH_RISK_MIN_FACTORS: int = 2   # out-of-range parameters for a high-risk label
+
+    # Monitoring thresholds (alarm levels, deliberately wider than the risk thresholds)
     ALERT_TEMPERATURE_HIGH: float = 30.0
     ALERT_PH_LOW: float = 6.0
     ALERT_PH_HIGH: float = 9.0
+    ALERT_TURBIDITY_HIGH: float = 15.0
+    ALERT_DISSOLVED_OXYGEN_LOW: float = 4.0
+    ALERT_CONDUCTIVITY_HIGH: float = 900.0
+
+    # Alert engine (services/alerts.py)
+    ALERTS_ENABLED: bool = os.getenv("ALERTS_ENABLED", "true").lower() == "true"
+    ALERT_HYSTERESIS: float = 0.05     # fraction of the threshold a value must come back inside to clear
+    ALERT_RAISE_READINGS: int = 3      # consecutive readings past the threshold before raising
+    ALERT_CLEAR_READINGS: int = 3      # consecutive readings inside the clear level before clearing
+    ALERT_FILE_PATH: str = os.getenv("ALERT_FILE_PATH", "logs/alerts.jsonl")
+    ALERT_WEBHOOK_URL: str = os.getenv("ALERT_WEBHOOK_URL", "")
+    ALERT_BATCH_SIZE: int = 500        # alerts per dispatch
+    ALERT_FLUSH_SECONDS: float = 1.0   # longest an alert waits for its batch to fill
+    ALERT_QUEUE_SIZE: int = 10000      # undispatched alerts before new ones are dropped
+    ALERT_MAX_RETRIES: int = 3
+    ALERT_RETRY_BACKOFF: float = 0.5   # seconds, doubled per retry
     
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    LOG_QUEUED: bool = os.getenv("LOG_QUEUED", "true").lower() == "true"   # file I/O on a listener thread
+    LOG_JSON: bool = os.getenv("LOG_JSON", "false").lower() == "true"
+    LOG_QUEUE_SIZE: int = 10000      # records waiting for the listener before new ones are dropped
+    REQUEST_LOG_SAMPLE_RATE: float = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", 1.0))
+    REQUEST_LOG_SLOW_SECONDS: float = 1.0  # slower requests (and 5xx) are always logged
+    
+    # On-demand profiling (middleware/profiling.py); off unless enabled
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")   # required for X-Profile headers
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "logs/profiles")
+    PROFILE_MAX_COUNT: int = 50
+    PROFILE_MAX_BYTES: int = 50 * 1024 * 1024
+    PROFILE_SAMPLE_INTERVAL: float = 0.005    # seconds between stack samples
+    PROFILE_MAX_WINDOW_SECONDS: float = 600.0
     
     # Backup
     BACKUP_ENABLED: bool = True
@@ -39,11 +92,61 @@ class ProductionConfig:
     
     # Health check
     HEALTH_CHECK_INTERVAL: int = 300  # 5 minutes
-    
+
+    # Sensors
+    DEFAULT_SENSOR_ID: str = os.getenv("SENSOR_ID", "sensor-001")
+    # Store invalid readings in sensor_data_quarantine instead of failing the whole batch
+    QUARANTINE_INVALID_READINGS: bool = os.getenv("QUARANTINE_INVALID_READINGS", "false").lower() == "true"
+
+    # Window features (services/feature_store.py): /risk/predict refuses features older than this
+    FEATURE_MAX_AGE_MINUTES: float = float(os.getenv("FEATURE_MAX_AGE_MINUTES", 15))
+
+    # Model inference micro-batching (services/inference.py)
+    INFERENCE_MAX_BATCH_SIZE: int = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 64))
+    INFERENCE_MAX_WAIT_MS: float = float(os.getenv("INFERENCE_MAX_WAIT_MS", 5.0))
+
+    # PDF reports (services/pdf_reports.py)
+    REPORT_PDF_DIR: str = os.getenv("REPORT_PDF_DIR", "data/reports/pdf")
+    REPORT_CHART_DIR: str = os.getenv("REPORT_CHART_DIR", "data/reports/charts")
+    REPORT_CHART_WINDOWS: tuple = (24, 168)   # hours covered by each chart
+    REPORT_CHART_POINTS: int = 500            # time buckets plotted per chart
+    REPORT_CHART_CACHE_SIZE: int = 500        # cached chart images kept, least recently used removed first
+    REPORT_RENDER_WORKERS: int = int(os.getenv("REPORT_RENDER_WORKERS", 2))
+    REPORT_PENDING_TIMEOUT: int = 900         # seconds before a pending report whose worker died counts as failed
+
+    # Live streaming
+    STREAM_INTERVAL_SECONDS: float = 5.0
+    STREAM_QUEUE_SIZE: int = 100     # pending events per subscriber
+    STREAM_MAX_DROPS: int = 500      # disconnect subscribers that fall this far behind
+
+    @classmethod
+    def get_risk_thresholds(cls) -> Dict[str, tuple]:
+        """Safe (min, max) range per parameter; None means unbounded"""
+        return {
+            "temperature": (None, cls.TEMPERATURE_THRESHOLD),
+            "ph": (cls.PH_MIN_THRESHOLD, cls.PH_MAX_THRESHOLD),
+            "turbidity": (None, cls.TURBIDITY_THRESHOLD),
+            "dissolved_oxygen": (cls.DISSOLVED_OXYGEN_THRESHOLD, None),
+            "conductivity": (None, cls.CONDUCTIVITY_THRESHOLD)
+        }
+
+    @classmethod
+    def get_admission_classes(cls) -> Dict[str, tuple]:
+        """Route class -> (priority, max concurrency, max queued, p99 budget seconds, timeout seconds)"""
+        return {
+            "critical": (0, 64, 256, cls.ADMISSION_CRITICAL_P99, None),
+            "standard": (1, 32, 64, 2.0, None),
+            "expensive": (2, cls.ADMISSION_EXPENSIVE_CONCURRENCY, 2 * cls.ADMISSION_EXPENSIVE_CONCURRENCY, None, None)
+        }
+
     @classmethod
     def get_alert_thresholds(cls) -> Dict[str, float]:
+        """Alarm level per rule, named <parameter>_<high|low>"""
         return {
             "temperature_high": cls.ALERT_TEMPERATURE_HIGH,
             "ph_low": cls.ALERT_PH_LOW,
-            "ph_high": cls.ALERT_PH_HIGH
+            "ph_high": cls.ALERT_PH_HIGH,
+            "turbidity_high": cls.ALERT_TURBIDITY_HIGH,
+            "dissolved_oxygen_low": cls.ALERT_DISSOLVED_OXYGEN_LOW,
+            "conductivity_high": cls.ALERT_CONDUCTIVITY_HIGH
         }
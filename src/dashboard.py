@@ -4,32 +4,126 @@ import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime, timedelta
 import sqlite3
+import threading
 
-from sensor_simulation import WaterSensorSimulator
+from services.sensor_simulation import ingest_simulator
 from risk_prediction import WaterRiskPredictor
 from report_generator import RiskReportGenerator
+from risk_scoring import RiskScoreStore
+from utils.database import DatabaseManager
+from utils.downsampling import downsample_series
+from services.cold_storage import TieredSensorStore
+
+PARAMETERS = ['temperature', 'ph', 'turbidity', 'dissolved_oxygen', 'conductivity']
+MAX_CHART_POINTS = 1000
+TREND_WINDOWS = {'24 hours': 24, '7 days': 24 * 7, '30 days': 24 * 30}
+
+DB_PATH = 'data/water_monitoring.db'
+
+class RecentDataCache:
+    """Rolling window of recent readings shared by all dashboard sessions
+
+    Only rows newer than the last seen timestamp are fetched; their scores
+    come from the risk_scores table, and only rows nobody has scored yet are
+    predicted. They are appended to the cached frame and rows that leave the
+    window are trimmed.
+    """
+
+    def __init__(self, predictor, db_path=DB_PATH, window_hours=24):
+        self.predictor = predictor
+        self.db_manager = DatabaseManager(db_path)
+        self.scores = RiskScoreStore(self.db_manager)
+        self.window = f'-{window_hours} hours'
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.frame = pd.DataFrame()
+        self.last_timestamp = None
+
+    def invalidate(self):
+        """Force a full reload, e.g. after back-dated rows were written"""
+        with self.lock:
+            self.frame = pd.DataFrame()
+            self.last_timestamp = None
+
+    def _fetch_new_rows(self):
+        if self.last_timestamp is None:
+            return self.db_manager.read_frame("""
+                SELECT * FROM sensor_data
+                WHERE timestamp >= datetime('now', ?)
+                ORDER BY timestamp
+            """, (self.window,), self.conn)
+        return self.db_manager.read_frame("""
+            SELECT * FROM sensor_data
+            WHERE timestamp > ?
+            ORDER BY timestamp
+        """, (self.last_timestamp,), self.conn)
+
+    def refresh(self):
+        """Append and score rows written since the last refresh"""
+        with self.lock:
+            new_rows = self._fetch_new_rows()
+            if not new_rows.empty:
+                new_rows = self.scores.score_frame(new_rows, self.predictor)
+                self.frame = pd.concat([self.frame, new_rows], ignore_index=True)
+                self.last_timestamp = new_rows['timestamp'].iloc[-1]
+
+            if not self.frame.empty:
+                cutoff = self.conn.execute(
+                    "SELECT datetime('now', ?)", (self.window,)
+                ).fetchone()[0]
+                self.frame = self.frame[self.frame['timestamp'] >= cutoff].reset_index(drop=True)
+            return self.frame
+
+@st.cache_resource
+def get_shared_resources():
+    """Simulator, loaded model, data cache and tiered store, built once per server process"""
+    store = TieredSensorStore(DatabaseManager(DB_PATH))
+    simulator = ingest_simulator(store.db_manager, archive_store=store)  # saves update features and evaluate alerts
+    predictor = WaterRiskPredictor()
+    try:
+        predictor.load_model()
+    except Exception:
+        pass  # predict() reports the missing model when it is first needed
+    return simulator, predictor, RecentDataCache(predictor, DB_PATH), store
+
+@st.cache_resource
+def get_report_generator():
+    """Report generator (and its OpenAI client), built on first use"""
+    return RiskReportGenerator(DB_PATH)
 
 class WaterMonitoringDashboard:
     def __init__(self):
-        self.simulator = WaterSensorSimulator()
-        self.predictor = WaterRiskPredictor()
-        self.report_generator = RiskReportGenerator()
+        self.simulator, self.predictor, self.data_cache, self.store = get_shared_resources()
+
+    @property
+    def report_generator(self):
+        return get_report_generator()
 
     def load_recent_data(self):
-        """Load recent sensor data from database"""
-        conn = sqlite3.connect('data/water_monitoring.db')
-        df = pd.read_sql_query("""
-            SELECT * FROM sensor_data 
-            WHERE timestamp >= datetime('now', '-24 hours')
-            ORDER BY timestamp DESC
-        """, conn)
-        conn.close()
-        return df
-
-    def create_line_plot(self, df, parameter):
-        """Create a line plot for a specific parameter"""
-        fig = px.line(df, x='timestamp', y=parameter, 
-                     title=f'{parameter.replace("_", " ").title()} Over Time')
+        """Load recent sensor data, fetching only rows not yet cached"""
+        return self.data_cache.refresh()
+
+    def load_parameter_history(self, parameter, hours):
+        """Load timestamps and one parameter for a trends window from both storage tiers"""
+        if parameter not in PARAMETERS:
+            raise ValueError(f"Unknown parameter: {parameter}")
+        return self.store.query(datetime.now() - timedelta(hours=hours), columns=[parameter])
+
+    def create_line_plot(self, df, parameter, max_points=MAX_CHART_POINTS, method='lttb'):
+        """Create a line plot for a specific parameter with a bounded number of points"""
+        title = f'{parameter.replace("_", " ").title()} Over Time'
+        df = downsample_series(df, parameter, max_points, method=method)
+        if method == 'lttb':
+            return px.line(df, x='timestamp', y=parameter, title=title)
+
+        fig = go.Figure([
+            go.Scatter(x=df['timestamp'], y=df[f'{parameter}_max'], mode='lines',
+                       line={'width': 0}, showlegend=False, name='max'),
+            go.Scatter(x=df['timestamp'], y=df[f'{parameter}_min'], mode='lines',
+                       line={'width': 0}, fill='tonexty', name='min/max'),
+            go.Scatter(x=df['timestamp'], y=df[parameter], mode='lines', name='mean'),
+        ])
+        fig.update_layout(title=title)
         return fig
 
     def create_gauge_chart(self, value, title, min_val, max_val, safe_range):
@@ -56,6 +150,8 @@ class WaterMonitoringDashboard:
         if st.sidebar.button("Simulate New Data"):
             data = self.simulator.simulate_batch(duration_hours=1)
             self.simulator.save_to_db(data)
+            # The batch is back-dated, so rows may predate the last cached one
+            self.data_cache.invalidate()
             st.sidebar.success("New data generated!")
 
         # Load and display current data
@@ -66,7 +162,7 @@ class WaterMonitoringDashboard:
 
         # Latest Readings Section
         st.header("Current Readings")
-        latest = df.iloc[0]
+        latest = df.iloc[-1]
         col1, col2, col3 = st.columns(3)
 
         with col1:
@@ -89,16 +185,19 @@ class WaterMonitoringDashboard:
 
         # Trends Section
         st.header("Trends")
-        parameter = st.selectbox(
-            "Select Parameter to View",
-            ['temperature', 'ph', 'turbidity', 'dissolved_oxygen', 'conductivity']
+        parameter = st.selectbox("Select Parameter to View", PARAMETERS)
+        window = st.selectbox("Time Range", list(TREND_WINDOWS))
+        method = st.radio(
+            "Downsampling", ['lttb', 'envelope'], horizontal=True,
+            format_func={'lttb': 'LTTB', 'envelope': 'Min/max envelope'}.get
         )
-        st.plotly_chart(self.create_line_plot(df, parameter))
+        hours = TREND_WINDOWS[window]
+        trend_df = df if hours == 24 else self.load_parameter_history(parameter, hours)
+        st.plotly_chart(self.create_line_plot(trend_df, parameter, method=method))
 
         # Risk Assessment Section
         st.header("Risk Assessment")
-        predictions, probabilities = self.predictor.predict(df)
-        risk_percentage = (predictions.sum() / len(predictions)) * 100
+        risk_percentage = df['risk_prediction'].mean() * 100
 
         st.metric(
             "Current Risk Level",
@@ -109,9 +208,8 @@ class WaterMonitoringDashboard:
         # AI-Generated Report Section
         st.header("AI Risk Report")
         if st.button("Generate New Report"):
-            with st.spinner("Generating report..."):
-                report = self.report_generator.generate_report()
-                st.text_area("Report", report, height=300)
+            with st.container(border=True):
+                st.write_stream(self.report_generator.stream_report())
 
 if __name__ == "__main__":
     dashboard = WaterMonitoringDashboard()
@@ -0,0 +1,278 @@
+import os
+import csv
+import time
+import sqlite3
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import yaml
+from scipy.signal import lfilter
+
+from models.sensor_frame import PARAMETERS, SensorFrame
+from services.sensor_simulation import WaterSensorSimulator
+from utils.database import DatabaseManager
+from utils.validators import DataValidator
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('sqlite', 'parquet')
+CHUNK_ROWS = 1_000_000
+
+# AR(1) anomaly per parameter: (stationary standard deviation, correlation time in hours)
+AR_NOISE = {
+    'temperature': (0.8, 6.0),
+    'ph': (0.15, 12.0),
+    'turbidity': (0.35, 2.0),  # on the log scale
+    'dissolved_oxygen': (0.4, 3.0),
+    'conductivity': (25.0, 24.0)
+}
+INCIDENT_MEAN_HOURS = 6.0
+
+PARQUET_SCHEMA = pa.schema([('timestamp', pa.timestamp('us'))] +
+                           [(parameter, pa.float64()) for parameter in PARAMETERS])
+
+@dataclass
+class SensorProfile:
+    """Per-sensor baseline, drawn from the sensor's own RNG stream"""
+    base_temperature: float
+    diurnal_amplitude: float
+    base_ph: float
+    base_turbidity: float
+    oxygen_saturation: float
+    base_conductivity: float
+    incidents: List[Tuple[np.datetime64, np.datetime64, float]] = field(default_factory=list)
+
+    @classmethod
+    def draw(cls, rng: np.random.Generator, start: np.datetime64, end: np.datetime64,
+             incidents_per_day: float) -> 'SensorProfile':
+        profile = cls(
+            base_temperature=float(np.clip(rng.normal(18, 4), 4, 30)),
+            diurnal_amplitude=float(rng.uniform(0.5, 3.0)),
+            base_ph=float(rng.normal(7.5, 0.25)),
+            base_turbidity=float(rng.uniform(1, 8)),
+            oxygen_saturation=float(rng.uniform(0.8, 1.0)),
+            base_conductivity=float(rng.lognormal(np.log(500), 0.25))
+        )
+        span_us = int((end - start) / np.timedelta64(1, 'us'))
+        for _ in range(rng.poisson(incidents_per_day * span_us / 86_400e6)):
+            onset = start + np.timedelta64(int(rng.uniform(0, span_us)), 'us')
+            hours = max(0.5, rng.exponential(INCIDENT_MEAN_HOURS))
+            severity = float(rng.uniform(0.3, 1.0))
+            profile.incidents.append((onset, onset + np.timedelta64(int(hours * 3600e6), 'us'), severity))
+        return profile
+
+def _oxygen_saturation(temperature: np.ndarray) -> np.ndarray:
+    """Dissolved oxygen at saturation in fresh water (mg/L), falling as water warms"""
+    return 14.652 - 0.41022 * temperature + 0.007991 * temperature ** 2 - 0.000077774 * temperature ** 3
+
+def _ar1(innovations: np.ndarray, phi: float, previous: float) -> np.ndarray:
+    """x[t] = phi * x[t-1] + e[t], continuing from the last value of the previous chunk"""
+    return lfilter([1.0], [1.0, -phi], innovations, zi=[phi * previous])[0]
+
+def simulate_sensor(seed: int, sensor_index: int, start: np.datetime64, end: np.datetime64,
+                    interval: np.timedelta64, incidents_per_day: float = 0.05,
+                    chunk_rows: int = CHUNK_ROWS) -> Tuple[SensorProfile, Iterator[SensorFrame]]:
+    """
+    One sensor's readings in [start, end) as a stream of frames of at most chunk_rows
+    The sensor draws from its own SeedSequence child, so the data depends only on
+    (seed, sensor_index), never on how sensors are spread across processes or
+    on the chunk size
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(sensor_index,)))
+    profile = SensorProfile.draw(rng, start, end, incidents_per_day)
+    total = int(np.ceil((end - start) / interval))
+    interval_hours = interval / np.timedelta64(1, 'h')
+    phis = np.array([np.exp(-interval_hours / tau) for _, tau in AR_NOISE.values()])
+    scales = np.array([sd for sd, _ in AR_NOISE.values()]) * np.sqrt(1 - phis ** 2)
+    low, high = np.array([DataValidator.VALID_RANGES[p] for p in PARAMETERS], dtype=float).T
+
+    def frames() -> Iterator[SensorFrame]:
+        state = np.zeros(len(PARAMETERS))
+        for offset in range(0, total, chunk_rows):
+            n = min(chunk_rows, total - offset)
+            timestamps = start + interval * np.arange(offset, offset + n)
+            # Time-major draw, so consecutive chunks continue one sequence
+            innovations = rng.standard_normal((n, len(PARAMETERS))).T * scales[:, None]
+            anomaly = np.empty_like(innovations)
+            for i in range(len(PARAMETERS)):
+                anomaly[i] = _ar1(innovations[i], phis[i], state[i])
+            state = anomaly[:, -1].copy()
+
+            hour = (timestamps - timestamps.astype('datetime64[D]')) / np.timedelta64(1, 'h')
+            temperature = (profile.base_temperature + anomaly[0]
+                           + profile.diurnal_amplitude * np.sin(2 * np.pi * (hour - 9) / 24))  # warmest mid-afternoon
+            ph = profile.base_ph + anomaly[1]
+            turbidity = profile.base_turbidity * np.exp(anomaly[2])
+            dissolved_oxygen = profile.oxygen_saturation * _oxygen_saturation(temperature) + anomaly[3]
+            conductivity = profile.base_conductivity * (1 + 0.02 * (temperature - 25)) + anomaly[4]
+
+            # Incident episodes: a smooth bump of turbidity and conductivity with an oxygen and pH sag
+            for onset, resolved, severity in profile.incidents:
+                if onset >= timestamps[-1] or resolved <= timestamps[0]:
+                    continue
+                lo, hi = np.searchsorted(timestamps, [onset, resolved])
+                progress = (timestamps[lo:hi] - onset) / (resolved - onset)
+                bump = severity * 0.5 * (1 - np.cos(2 * np.pi * progress))
+                turbidity[lo:hi] *= 1 + 20 * bump
+                conductivity[lo:hi] += 300 * bump
+                dissolved_oxygen[lo:hi] -= 4 * bump
+                ph[lo:hi] -= 0.8 * bump
+
+            values = np.vstack([temperature, ph, turbidity, dissolved_oxygen, conductivity])
+            np.clip(values, low[:, None], high[:, None], out=values)
+            yield SensorFrame(timestamps, values)
+
+    return profile, frames()
+
+def _sensor_id(index: int, n_sensors: int) -> str:
+    return f"sensor-{index + 1:0{max(3, len(str(n_sensors)))}d}"
+
+def _write_sqlite(path: str, frames: Iterator[SensorFrame]) -> int:
+    """Same sensor_data schema the app uses, bulk loaded with journaling off into a temp file"""
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    WaterSensorSimulator(DatabaseManager(tmp_path))
+    rows = 0
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        for frame in frames:
+            conn.executemany(
+                '''INSERT INTO sensor_data
+                   (timestamp, temperature, ph, turbidity, dissolved_oxygen, conductivity)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                frame.to_rows()
+            )
+            rows += len(frame)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return rows
+
+def _write_parquet(path: str, frames: Iterator[SensorFrame], compression: str) -> int:
+    """One file per sensor, one row group per chunk"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    rows = 0
+    with pq.ParquetWriter(tmp_path, PARQUET_SCHEMA, compression=compression) as writer:
+        for frame in frames:
+            arrays = [pa.array(frame.timestamps)] + [pa.array(values) for values in frame.values]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=PARQUET_SCHEMA))
+            rows += len(frame)
+    os.replace(tmp_path, path)
+    return rows
+
+def _generate_shard(task: dict) -> dict:
+    """Worker entry point: simulate and write one sensor"""
+    sensor_id = task['sensor_id']
+    profile, frames = simulate_sensor(task['seed'], task['index'], task['start'], task['end'],
+                                      task['interval'], task['incidents_per_day'], task['chunk_rows'])
+    if task['format'] == 'sqlite':
+        path = os.path.join(task['output_dir'], f"{sensor_id}.db")
+        rows = _write_sqlite(path, frames)
+    else:
+        path = os.path.join(task['output_dir'], f"sensor_id={sensor_id}", 'data.parquet')
+        rows = _write_parquet(path, frames, task['compression'])
+    return {'sensor_id': sensor_id, 'path': path, 'rows': rows, 'bytes': os.path.getsize(path),
+            'incidents': profile.incidents}
+
+@dataclass
+class GenerationSummary:
+    sensors: int = 0
+    rows: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+def generate_dataset(output_dir: str, n_sensors: int, start: datetime, end: datetime,
+                     interval_minutes: float = 5, fmt: str = 'parquet', workers: Optional[int] = None,
+                     seed: int = 0, incidents_per_day: float = 0.05, compression: str = 'zstd',
+                     chunk_rows: int = CHUNK_ROWS, progress_seconds: float = 2.0) -> GenerationSummary:
+    """
+    Simulate n_sensors over [start, end) across a process pool, one sensor per task
+    Writes one SQLite database (plus sites.yaml for batch_reports) or one Parquet
+    file per sensor, and incidents.csv listing every injected episode
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    os.makedirs(output_dir, exist_ok=True)
+    base = {
+        'output_dir': output_dir, 'seed': seed, 'format': fmt, 'compression': compression,
+        'start': np.datetime64(start, 'us'), 'end': np.datetime64(end, 'us'),
+        'interval': np.timedelta64(int(round(interval_minutes * 60e6)), 'us'),
+        'incidents_per_day': incidents_per_day, 'chunk_rows': chunk_rows
+    }
+    tasks = [dict(base, index=i, sensor_id=_sensor_id(i, n_sensors)) for i in range(n_sensors)]
+
+    summary = GenerationSummary()
+    results = []
+    started = last_report = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for future in as_completed([pool.submit(_generate_shard, task) for task in tasks]):
+            result = future.result()
+            results.append(result)
+            summary.sensors += 1
+            summary.rows += result['rows']
+            summary.bytes += result['bytes']
+            summary.seconds = time.perf_counter() - started
+            if time.perf_counter() - last_report >= progress_seconds or summary.sensors == n_sensors:
+                last_report = time.perf_counter()
+                logger.info(f"{summary.sensors}/{n_sensors} sensors, {summary.rows:,} rows, "
+                            f"{summary.rows_per_second:,.0f} rows/s, {summary.megabytes_per_second:.1f} MB/s")
+
+    results.sort(key=lambda r: r['sensor_id'])
+    with open(os.path.join(output_dir, 'incidents.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['sensor_id', 'start', 'end', 'severity'])
+        for result in results:
+            for onset, resolved, severity in sorted(result['incidents']):
+                writer.writerow([result['sensor_id'], onset, resolved, f"{severity:.3f}"])
+    if fmt == 'sqlite':
+        with open(os.path.join(output_dir, 'sites.yaml'), 'w') as f:
+            yaml.safe_dump({r['sensor_id']: r['path'] for r in results}, f)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large synthetic sensor dataset for scale tests")
+    parser.add_argument('--output-dir', default='data/scale')
+    parser.add_argument('--sensors', type=int, default=100)
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--end', default=None, help="ISO timestamp the data runs up to (default: now)")
+    parser.add_argument('--interval-minutes', type=float, default=5)
+    parser.add_argument('--format', choices=FORMATS, default='parquet')
+    parser.add_argument('--workers', type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--incidents-per-day', type=float, default=0.05,
+                        help="mean incident episodes per sensor per day")
+    parser.add_argument('--compression', default='zstd')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    end = datetime.fromisoformat(args.end) if args.end else datetime.now().replace(second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+    summary = generate_dataset(args.output_dir, args.sensors, start, end, args.interval_minutes,
+                               args.format, args.workers, args.seed, args.incidents_per_day,
+                               args.compression)
+    print(f"{summary.rows:,} rows for {summary.sensors} sensors in {summary.seconds:.1f}s: "
+          f"{summary.rows_per_second:,.0f} rows/s, {summary.megabytes_per_second:.1f} MB/s "
+          f"({summary.bytes / 1e6:,.0f} MB in {args.output_dir})")
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,41 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timedelta
+import asyncio
+import os
 import uvicorn
-from typing import List
+from typing import List, Literal, Optional
 import logging
 
 from auth.security import (
     Token, User, authenticate_user, create_access_token,
-    get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
+    get_current_user, get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from utils.error_handlers import setup_exception_handlers
-from middleware.base import setup_middleware
+from middleware.base import RequestLoggingMiddleware
+from middleware.admission import AdmissionControlMiddleware
+from middleware.profiling import ProfileStore, ProfilingError, ProfilingMiddleware
+from config.production import ProductionConfig
 from utils.logger import Logger
-from utils.database import DatabaseManager
+from utils.database import DatabaseManager, slow_query_log
 from utils.logger import Logger
-from models.schemas import SensorData
-from services.sensor_simulation import WaterSensorSimulator
+from models.sensor_frame import SensorFrame
+from models.schemas import SensorData, BatchRiskRequest, BatchRiskResponse, ReportNote, RiskPrediction
+from services.sensor_simulation import ingest_simulator
 from services.risk_prediction import WaterRiskPredictor
+from services.risk_rules import get_rule_engine
+from services.live_stream import LiveStreamHub, StreamSubscription, format_sse
+from services.aggregation import SensorAggregator, AggregationError
+from services.cold_storage import TieredSensorStore
+from services.inference import BatchingRiskModel, InferenceError
+from services.pdf_reports import PdfReportRenderer
+from utils.downsampling import downsample_readings
+from utils.serialization import FastJSONResponse, dataframe_to_json, frame_to_columnar_json, frame_to_rows_json
+from report_generator import RiskReportGenerator
+from risk_prediction import WaterRiskPredictor as RiskModel
+from utils.shared_state import get_shared_state
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -26,7 +44,19 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS middleware
+# On-demand profiling, inside admission control so queueing time is not profiled
+profile_store = ProfileStore() if ProductionConfig.PROFILING_ENABLED else None
+if profile_store is not None:
+    app.add_middleware(ProfilingMiddleware, store=profile_store)
+
+# Admission control: concurrency limits, load shedding and deadlines per route class
+if ProductionConfig.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# Sampled request log, outside admission control so shed requests are logged too
+app.add_middleware(RequestLoggingMiddleware)
+
+# CORS middleware (added last so it also wraps shed responses)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Modify for production
@@ -38,8 +68,81 @@ app.add_middleware(
 # Initialize services
 db = DatabaseManager()
 logger = Logger().get_logger()
-sensor_simulator = WaterSensorSimulator(db)
+sensor_store = TieredSensorStore(db)  # clean_old_data archives days past retention here
+sensor_simulator = ingest_simulator(db, archive_store=sensor_store)
+feature_store = sensor_simulator.feature_store
+alert_engine = sensor_simulator.alert_engine
 risk_predictor = WaterRiskPredictor(db)
+live_stream = LiveStreamHub(sensor_simulator, risk_predictor)
+aggregator = SensorAggregator(db, store=sensor_store)
+shared_state = get_shared_state()  # latest reading and counters, shared across workers
+report_generator = None
+pdf_renderer = None
+risk_model = None
+inference = None
+
+def get_risk_model() -> RiskModel:
+    """Trained risk model, loaded once per process (or once before forking under server.py)"""
+    global risk_model
+    if risk_model is None:
+        model = RiskModel()
+        model.load_model()
+        risk_model = model
+    return risk_model
+
+def get_inference() -> BatchingRiskModel:
+    """Micro-batching wrapper around the shared risk model"""
+    global inference
+    if inference is None:
+        try:
+            predictor = get_risk_model()
+        except (OSError, ValueError):
+            predictor = RiskModel()  # the first batch retries the load and reports a missing model
+        inference = BatchingRiskModel(predictor)
+    return inference
+
+def get_report_generator() -> RiskReportGenerator:
+    """Report generator (and its OpenAI client), created on first use"""
+    global report_generator
+    if report_generator is None:
+        report_generator = RiskReportGenerator(db.db_path, predictor=get_risk_model())
+    return report_generator
+
+def get_pdf_renderer() -> PdfReportRenderer:
+    """PDF renderer; its worker processes start with the first report"""
+    global pdf_renderer
+    if pdf_renderer is None:
+        pdf_renderer = PdfReportRenderer(db)
+    return pdf_renderer
+
+def preload() -> None:
+    """Load what workers can share copy-on-write; server.py calls this before forking"""
+    get_rule_engine()
+    try:
+        get_risk_model()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Risk model not preloaded, workers will load it on first use: {e}")
+
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    shared_state.increment("requests")
+    response = await call_next(request)
+    if response.status_code >= 500:
+        shared_state.increment("errors")
+    return response
+
+SSE_KEEPALIVE_SECONDS = 15
+
+def _split_csv(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def _subscribe(sensors: Optional[str], parameters: Optional[str]) -> StreamSubscription:
+    try:
+        return live_stream.subscribe(_split_csv(sensors), _split_csv(parameters))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -61,6 +164,8 @@ async def get_current_readings(current_user: User = Depends(get_current_active_u
     """Get current sensor readings"""
     try:
         latest_reading = sensor_simulator.generate_reading()
+        shared_state.set_latest(latest_reading)
+        shared_state.increment("readings")
         return SensorData(
             timestamp=datetime.now(),
             **latest_reading
@@ -72,23 +177,63 @@ async def get_current_readings(current_user: User = Depends(get_current_active_u
 @app.get("/sensor-data/history", response_model=List[SensorData])
 async def get_historical_data(
     hours: int = 24,
+    max_points: Optional[int] = Query(None, ge=3),
+    method: Literal["mean", "lttb", "envelope"] = "mean",
+    parameter: Literal["temperature", "ph", "turbidity", "dissolved_oxygen", "conductivity"] = "temperature",
+    format: Literal["rows", "columnar"] = "rows",
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get historical sensor data"""
+    """
+    Get historical sensor data, reduced to at most max_points readings
+    method=mean averages whole readings into time buckets, lttb keeps the raw
+    readings that best preserve the shape of `parameter`, and envelope adds
+    per-bucket <parameter>_min/<parameter>_max for every parameter.
+    format=columnar returns {"timestamp": [...], "temperature": [...], ...}
+    instead of one object per reading
+    """
     try:
-        df = sensor_simulator.simulate_batch(duration_hours=hours)
-        return [SensorData(timestamp=ts, **row.to_dict()) 
-                for ts, row in df.iterrows()]
+        frame = sensor_simulator.simulate_frame(duration_hours=hours)
+        if max_points:
+            reduced = downsample_readings(frame.to_dataframe(), max_points, method, parameter)
+            if method == "envelope":
+                return FastJSONResponse(dataframe_to_json(reduced, columnar=format == "columnar"))
+            frame = SensorFrame.from_dataframe(reduced)
+        # Readings were validated when the frame was built; encode them directly
+        if format == "columnar":
+            return FastJSONResponse(frame_to_columnar_json(frame))
+        return FastJSONResponse(frame_to_rows_json(frame))
     except Exception as e:
         logger.error(f"Error getting historical data: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/sensor-data/aggregate")
+async def aggregate_sensor_data(
+    bucket: str = "1h",
+    parameters: str = "temperature,ph,turbidity,dissolved_oxygen,conductivity",
+    aggregates: str = "avg",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Time-bucket aggregates (avg/min/max/count/stddev) computed in the database, as columns"""
+    try:
+        return await asyncio.to_thread(
+            aggregator.aggregate, bucket, _split_csv(parameters) or [],
+            _split_csv(aggregates) or [], start, end
+        )
+    except AggregationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error aggregating sensor data: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.post("/reports/generate")
 async def generate_report(current_user: User = Depends(get_current_active_user)):
     """Generate a new risk report"""
     try:
         current_data = await get_current_readings(current_user)
         risk_assessment = risk_predictor.predict_risk(current_data)
+        shared_state.increment("risk_assessments")
         return {
             "risk_assessment": risk_assessment,
             "timestamp": datetime.now(),
@@ -100,5 +245,219 @@ async def generate_report(current_user: User = Depends(get_current_active_user))
         logger.error(f"Error generating report: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/reports/pdf", status_code=status.HTTP_202_ACCEPTED)
+async def generate_pdf_report(current_user: User = Depends(get_current_active_user)):
+    """Generate an AI risk report and queue it for PDF rendering; poll GET /reports/pdf/{report_id}"""
+    try:
+        report = await get_report_generator().agenerate_report()
+        report_id = await asyncio.to_thread(get_pdf_renderer().submit, report)
+    except Exception as e:
+        logger.error(f"Error generating PDF report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return {"report_id": report_id, "status": "pending"}
+
+@app.get("/reports/pdf/{report_id}")
+async def get_pdf_report(report_id: str, current_user: User = Depends(get_current_active_user)):
+    """The rendered PDF, or 202 while it is still rendering"""
+    renderer = get_pdf_renderer()
+    state, error = renderer.status(report_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if state == 'pending':
+        return JSONResponse({"report_id": report_id, "status": state}, status_code=status.HTTP_202_ACCEPTED)
+    if state == 'failed':
+        raise HTTPException(status_code=500, detail=f"Report rendering failed: {error}")
+    return FileResponse(renderer.pdf_path(report_id), media_type="application/pdf",
+                        filename=f"water_quality_report_{report_id}.pdf")
+
+@app.post("/risk/assess-batch", response_model=BatchRiskResponse)
+async def assess_risk_batch(
+    batch: BatchRiskRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Score many readings with the compiled risk rules in one vectorized pass"""
+    engine = get_rule_engine()
+    assessment = engine.assess_batch(batch.model_dump(exclude={"include_factors"}))
+    shared_state.increment("risk_assessments", len(assessment.risk_levels))
+    return {
+        "count": len(assessment.risk_levels),
+        "risk_levels": assessment.risk_levels.tolist(),
+        "high_risk": assessment.high_risk.tolist(),
+        "factor_totals": engine.factor_totals(assessment.factor_mask),
+        "factors": engine.factor_lists(assessment.factor_mask) if batch.include_factors else None
+    }
+
+@app.post("/risk/predict", response_model=RiskPrediction)
+async def predict_risk(
+    reading: SensorData,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Trained-model risk prediction, batched with concurrent requests"""
+    model = get_inference()
+    features = reading.model_dump()
+    if set(model.predictor.feature_names) - features.keys():
+        # Window-feature models get the stored 1h/6h/24h features as of the reading
+        max_age = timedelta(minutes=ProductionConfig.FEATURE_MAX_AGE_MINUTES)
+        window_features = feature_store.latest(reading.timestamp, max_age=max_age)
+        if window_features is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"No window features stored within {ProductionConfig.FEATURE_MAX_AGE_MINUTES:g} "
+                       f"minutes before {reading.timestamp}; ingest recent readings or run the feature backfill"
+            )
+        features.update(window_features)
+    try:
+        label, probability = await model.predict(features)
+    except InferenceError as e:
+        logger.error(f"Risk prediction failed: {str(e)}")
+        raise HTTPException(status_code=503, detail="Risk model unavailable")
+    shared_state.increment("risk_assessments")
+    return RiskPrediction(high_risk=bool(label), probability=probability)
+
+@app.post("/reports/notes", status_code=status.HTTP_201_CREATED)
+async def add_report_note(note: ReportNote, current_user: User = Depends(get_current_active_user)):
+    """Index an incident or remediation note so future reports can draw on it"""
+    generator = get_report_generator()
+    doc_id = await asyncio.to_thread(generator.index.add, note.text, note.kind, generator.site_id)
+    return {"id": doc_id, "kind": note.kind}
+
+@app.get("/reports/stream")
+async def stream_report(current_user: User = Depends(get_current_active_user)):
+    """Stream an AI risk report as Server-Sent Events while the LLM generates it"""
+    generator = get_report_generator()
+
+    async def event_source():
+        try:
+            async for chunk in generator.astream_report():
+                yield format_sse({"type": "token", "text": chunk})
+            yield format_sse({"type": "done"})
+        except Exception as e:
+            logger.error(f"Error streaming report: {str(e)}")
+            yield format_sse({"type": "error", "message": "Report generation failed"})
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/stream/sse")
+async def stream_events(
+    request: Request,
+    sensors: Optional[str] = None,
+    parameters: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Server-Sent Events stream of readings and risk-level changes"""
+    subscription = _subscribe(sensors, parameters)
+
+    async def event_source():
+        try:
+            while not subscription.closed:
+                if await request.is_disconnected():
+                    break
+                event = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield format_sse(event)
+        finally:
+            live_stream.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/stream/ws")
+async def stream_websocket(
+    websocket: WebSocket,
+    token: str,
+    sensors: Optional[str] = None,
+    parameters: Optional[str] = None
+):
+    """WebSocket stream of readings and risk-level changes"""
+    try:
+        await get_current_active_user(await get_current_user(token))
+        subscription = _subscribe(sensors, parameters)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            event = await subscription.get()
+            if event is None:
+                # Closed as a slow consumer; ask the client to reconnect later
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                break
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_stream.unsubscribe(subscription)
+
+@app.get("/alerts/active")
+async def get_active_alerts(current_user: User = Depends(get_current_active_user)):
+    """Alert rules currently raised per sensor, as seen by the answering worker"""
+    if alert_engine is None:
+        raise HTTPException(status_code=404, detail="Alerting is disabled")
+    return alert_engine.active_alerts()
+
+def _profile_store() -> ProfileStore:
+    if profile_store is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return profile_store
+
+@app.post("/admin/profiling/window")
+async def arm_profiling(
+    seconds: float = Query(60, gt=0),
+    mode: Literal["sample", "cprofile"] = "sample",
+    path_prefix: str = "/",
+    current_user: User = Depends(get_current_active_user)
+):
+    """Profile every request under path_prefix, in every worker, for the next `seconds`"""
+    try:
+        window = _profile_store().arm(seconds, mode, path_prefix)
+    except ProfilingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"{current_user.username} armed {mode} profiling of {path_prefix} for {seconds}s")
+    return window
+
+@app.delete("/admin/profiling/window", status_code=status.HTTP_204_NO_CONTENT)
+async def disarm_profiling(current_user: User = Depends(get_current_active_user)):
+    _profile_store().disarm()
+
+@app.get("/admin/profiles")
+async def list_profiles(current_user: User = Depends(get_current_active_user)):
+    """Stored profiles, newest first"""
+    return await asyncio.to_thread(_profile_store().list)
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, current_user: User = Depends(get_current_active_user)):
+    """A stored profile: folded stacks (sample) or a pstats file (cprofile)"""
+    meta = _profile_store().get(profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(meta['path'], media_type="application/octet-stream",
+                        filename=f"{profile_id}.{meta['format']}")
+
+@app.get("/admin/slow-queries")
+async def get_slow_queries(current_user: User = Depends(get_current_active_user)):
+    """Statements slower than DB_SLOW_QUERY_MS in the answering worker, newest first, with their query plans"""
+    return slow_query_log.entries()
+
+@app.get("/server/state")
+async def get_server_state(current_user: User = Depends(get_current_active_user)):
+    """Counters and latest reading shared by every worker, plus the answering worker's pid"""
+    return {
+        "worker_pid": os.getpid(),
+        "counters": shared_state.counters(),
+        "latest_reading": shared_state.get_latest()
+    }
+
 if __name__ == "__main__":
+    # Development server; run server.py for pre-forked production workers
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,178 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config.production import ProductionConfig
+from monitoring.metrics import MetricsCollector
+
+logger = logging.getLogger(__name__)
+
+# Path prefix -> route class, first match wins; None leaves the route uncontrolled
+DEFAULT_ROUTES: Sequence[Tuple[str, Optional[str]]] = (
+    ('/stream/', None),  # long-lived subscriptions
+    ('/token', 'critical'),
+    ('/sensor-data/current', 'critical'),
+    ('/server/state', 'critical'),
+    ('/reports/pdf/', 'standard'),  # status polls and downloads of rendered PDFs are cheap
+    ('/reports/', 'expensive'),
+    ('/sensor-data/history', 'expensive'),
+    ('/sensor-data/aggregate', 'expensive'),
+    ('/risk/assess-batch', 'expensive'),
+)
+DEFAULT_CLASS = 'standard'
+LATENCY_WINDOW_SECONDS = 10.0
+MIN_LATENCY_SAMPLES = 20
+P99_REFRESH_SECONDS = 0.5
+
+@dataclass
+class RouteClass:
+    """Admission state of one class of routes"""
+    name: str
+    priority: int              # 0 is most important; lower priorities are shed first
+    max_concurrency: int
+    max_queue: int
+    p99_budget: Optional[float]
+    timeout: float
+    in_flight: int = 0
+    waiting: int = 0
+    latencies: Deque[Tuple[float, float]] = field(default_factory=lambda: deque(maxlen=1024))
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _p99: float = 0.0
+    _p99_at: float = 0.0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def observe(self, seconds: float) -> None:
+        self.latencies.append((time.monotonic(), seconds))
+
+    def p99(self) -> float:
+        """p99 latency of requests finished in the last LATENCY_WINDOW_SECONDS, refreshed at most every 0.5s"""
+        now = time.monotonic()
+        if now - self._p99_at >= P99_REFRESH_SECONDS:
+            recent = [seconds for finished, seconds in self.latencies if now - finished <= LATENCY_WINDOW_SECONDS]
+            self._p99 = float(np.percentile(recent, 99)) if len(recent) >= MIN_LATENCY_SAMPLES else 0.0
+            self._p99_at = now
+        return self._p99
+
+    def over_budget(self) -> bool:
+        return self.p99_budget is not None and self.p99() > self.p99_budget
+
+class AdmissionControlMiddleware:
+    """
+    Per-route-class concurrency limits, load shedding and deadlines
+    Each class admits up to max_concurrency requests and queues up to
+    max_queue more. Classes below the top priority are shed with 503 and
+    Retry-After when their queue is full, or when their own or any
+    higher-priority class's observed p99 is over budget, so expensive
+    reports and history queries give way before the cheap polls slow down.
+    A queued request that waits longer than ADMISSION_QUEUE_TIMEOUT is shed
+    too, and one whose response has not started within its class timeout
+    (API_TIMEOUT unless configured) gets 504. Streaming responses are not cut
+    off once started. A timed-out sync endpoint keeps its worker thread
+    until it returns.
+    """
+
+    def __init__(self, app: ASGIApp, classes: Optional[Dict[str, tuple]] = None,
+                 routes: Sequence[Tuple[str, Optional[str]]] = DEFAULT_ROUTES,
+                 queue_timeout: Optional[float] = None, retry_after: Optional[int] = None):
+        self.app = app
+        classes = classes or ProductionConfig.get_admission_classes()
+        self.classes = {
+            name: RouteClass(name, priority, concurrency, queue, budget, timeout or ProductionConfig.API_TIMEOUT)
+            for name, (priority, concurrency, queue, budget, timeout) in classes.items()
+        }
+        self.routes = list(routes)
+        self.queue_timeout = queue_timeout or ProductionConfig.ADMISSION_QUEUE_TIMEOUT
+        self.retry_after = retry_after or ProductionConfig.ADMISSION_RETRY_AFTER
+
+    def classify(self, path: str) -> Optional[RouteClass]:
+        for prefix, name in self.routes:
+            if path.startswith(prefix):
+                return self.classes[name] if name else None
+        return self.classes[DEFAULT_CLASS]
+
+    def shed_reason(self, route_class: RouteClass) -> Optional[str]:
+        """Why a request of this class should be rejected right now, or None to admit it"""
+        if route_class.priority == 0:
+            return None
+        if route_class.in_flight + route_class.waiting >= route_class.max_concurrency + route_class.max_queue:
+            return 'queue_full'
+        for other in self.classes.values():
+            if other.priority <= route_class.priority and other.over_budget():
+                return 'latency'
+        return None
+
+    def _reject(self, route_class: RouteClass, reason: str, status_code: int = 503) -> JSONResponse:
+        MetricsCollector.record_admission(route_class.name, reason)
+        if status_code == 504:
+            return JSONResponse({"detail": "Request timed out"}, status_code=504)
+        logger.debug(f"Shedding {route_class.name} request: {reason}")  # counted in metrics; overload must not flood the log
+        return JSONResponse({"detail": "Server busy, retry later"}, status_code=503,
+                            headers={"Retry-After": str(self.retry_after)})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route_class = self.classify(scope['path']) if scope['type'] == 'http' else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = self.shed_reason(route_class)
+        if reason:
+            await self._reject(route_class, reason)(scope, receive, send)
+            return
+
+        arrived = time.perf_counter()
+        route_class.waiting += 1
+        try:
+            await asyncio.wait_for(route_class.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            await self._reject(route_class, 'queue_timeout')(scope, receive, send)
+            return
+        finally:
+            route_class.waiting -= 1
+            self._update_gauges(route_class)
+
+        route_class.in_flight += 1
+        self._update_gauges(route_class)
+        MetricsCollector.record_admission(route_class.name, 'admitted')
+        response_started = asyncio.Event()
+
+        async def tracking_send(message) -> None:
+            if message['type'] == 'http.response.start':
+                response_started.set()
+            await send(message)
+
+        try:
+            handler = asyncio.ensure_future(self.app(scope, receive, tracking_send))
+            waiter = asyncio.ensure_future(response_started.wait())
+            try:
+                await asyncio.wait({handler, waiter}, timeout=route_class.timeout,
+                                   return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+            if not response_started.is_set() and not handler.done():
+                handler.cancel()
+                await asyncio.gather(handler, return_exceptions=True)
+                await self._reject(route_class, 'deadline', status_code=504)(scope, receive, send)
+                return
+            await handler
+        finally:
+            route_class.in_flight -= 1
+            route_class.semaphore.release()
+            route_class.observe(time.perf_counter() - arrived)  # queueing included
+            self._update_gauges(route_class)
+
+    @staticmethod
+    def _update_gauges(route_class: RouteClass) -> None:
+        MetricsCollector.update_admission_load(route_class.name, route_class.in_flight, route_class.waiting)
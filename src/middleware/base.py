@@ -4,6 +4,7 @@ from typing import Callable
 import time
 import logging
 from utils.api_security import RateLimiter
+from utils.logger import log_request
 
 logger = logging.getLogger(__name__)
 
@@ -36,18 +37,13 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Log request
-        logger.info(f"Request: {request.method} {request.url.path}")
-        
         # Track timing
-        start_time = time.time()
+        start_time = time.perf_counter()
         response = await call_next(request)
-        process_time = time.time() - start_time
+        process_time = time.perf_counter() - start_time
         
-        # Log response
-        logger.info(
-            f"Response: {response.status_code} - Processed in {process_time:.2f} seconds"
-        )
+        # One sampled line per request, written by the logging listener thread
+        log_request(request.method, request.url.path, response.status_code, process_time)
         
         return response
 
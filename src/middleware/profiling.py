@@ -0,0 +1,264 @@
+import os
+import sys
+import hmac
+import time
+import uuid
+import marshal
+import cProfile
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config.production import ProductionConfig
+
+logger = logging.getLogger(__name__)
+
+MODES = {'sample': 'folded', 'cprofile': 'pstats'}  # profiler -> stored format
+PROFILE_HEADER = b'x-profile'
+TOKEN_HEADER = b'x-profile-token'
+WINDOW_FILE = 'window.json'
+WINDOW_REFRESH_SECONDS = 1.0
+# Leaf frames in these modules are threads blocked waiting, not doing work
+IDLE_MODULES = ('threading.py', 'selectors.py', 'queue.py')
+
+class ProfilingError(Exception):
+    """Custom exception for profiling errors"""
+    pass
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """
+    Samples the stacks of every other thread every `interval` seconds
+    Covers the event loop and the threadpool running sync endpoints alike;
+    stacks are folded (root;...;leaf -> count), the input format of flame graph tools.
+    """
+
+    def __init__(self, interval: float = ProductionConfig.PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        me = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == me or os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            self.stacks[';'.join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> bytes:
+        self._stop.set()
+        self._thread.join()
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()).encode()
+
+class ProfileStore:
+    """
+    Profiles on disk, capped at max_profiles files and max_bytes in total
+    Each profile is <id>.<format> plus an <id>.json sidecar describing the
+    request. The profiling window lives in the same directory, so arming it
+    through one worker arms every worker sharing the directory.
+    """
+
+    def __init__(self, directory: str = ProductionConfig.PROFILE_DIR,
+                 max_profiles: int = ProductionConfig.PROFILE_MAX_COUNT,
+                 max_bytes: int = ProductionConfig.PROFILE_MAX_BYTES):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._window: Optional[Dict] = None
+        self._window_checked = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def save(self, data: bytes, meta: Dict, profile_id: Optional[str] = None) -> str:
+        profile_id = profile_id or uuid.uuid4().hex
+        meta = {**meta, 'id': profile_id, 'bytes': len(data), 'created_at': datetime.now().isoformat()}
+        with self._lock:
+            with open(self._path(f"{profile_id}.{meta['format']}"), 'wb') as f:
+                f.write(data)
+            with open(self._path(f"{profile_id}.json"), 'wb') as f:
+                f.write(orjson.dumps(meta))
+            self._enforce_limits()
+        return profile_id
+
+    def _enforce_limits(self) -> None:
+        """Remove the oldest profiles until both caps hold"""
+        profiles = sorted(self.list(), key=lambda meta: meta['created_at'])
+        total = sum(meta['bytes'] for meta in profiles)
+        while profiles and (len(profiles) > self.max_profiles or total > self.max_bytes):
+            oldest = profiles.pop(0)
+            total -= oldest['bytes']
+            for name in (f"{oldest['id']}.{oldest['format']}", f"{oldest['id']}.json"):
+                try:
+                    os.remove(self._path(name))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[Dict]:
+        """Stored profiles, newest first"""
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json') and entry.name != WINDOW_FILE:
+                try:
+                    with open(entry.path, 'rb') as f:
+                        profiles.append(orjson.loads(f.read()))
+                except (OSError, orjson.JSONDecodeError):
+                    continue  # removed or half-written by another worker
+        return sorted(profiles, key=lambda meta: meta['created_at'], reverse=True)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        """Metadata of a stored profile, with its file path"""
+        if not (len(profile_id) == 32 and all(c in '0123456789abcdef' for c in profile_id)):
+            return None
+        try:
+            with open(self._path(f"{profile_id}.json"), 'rb') as f:
+                meta = orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        path = self._path(f"{profile_id}.{meta['format']}")
+        return {**meta, 'path': path} if os.path.exists(path) else None
+
+    def arm(self, seconds: float, mode: str = 'sample', path_prefix: str = '/') -> Dict:
+        """Profile every request under path_prefix for the next `seconds`"""
+        if mode not in MODES:
+            raise ProfilingError(f"Unknown profiling mode {mode!r}; expected one of {sorted(MODES)}")
+        seconds = min(seconds, ProductionConfig.PROFILE_MAX_WINDOW_SECONDS)
+        window = {'mode': mode, 'path_prefix': path_prefix, 'until': time.time() + seconds}
+        tmp = self._path(f"{WINDOW_FILE}.{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(orjson.dumps(window))
+        os.replace(tmp, self._path(WINDOW_FILE))
+        self._window_checked = 0.0
+        return window
+
+    def disarm(self) -> None:
+        try:
+            os.remove(self._path(WINDOW_FILE))
+        except FileNotFoundError:
+            pass
+        self._window_checked = 0.0
+
+    def window(self) -> Optional[Dict]:
+        """The armed window, re-read from disk at most once a second"""
+        now = time.monotonic()
+        if now - self._window_checked >= WINDOW_REFRESH_SECONDS:
+            try:
+                with open(self._path(WINDOW_FILE), 'rb') as f:
+                    self._window = orjson.loads(f.read())
+            except (OSError, orjson.JSONDecodeError):
+                self._window = None
+            self._window_checked = now
+        if self._window is not None and self._window['until'] < time.time():
+            return None
+        return self._window
+
+class ProfilingMiddleware:
+    """
+    Profiles selected requests on demand
+    A request is profiled when it carries X-Profile: sample|cprofile together
+    with X-Profile-Token matching PROFILING_TOKEN (header profiling is off
+    without a token), or when it falls under an armed profiling window.
+    'sample' records folded stacks of all threads, every
+    PROFILE_SAMPLE_INTERVAL seconds; 'cprofile' traces the event loop thread
+    deterministically, so it misses sync endpoints run in the threadpool.
+    Both see whatever else runs concurrently. One request per worker is
+    profiled at a time; others are served normally. The profile id is
+    returned in X-Profile-Id. Otherwise a request only costs a header scan
+    and a cached window check.
+    """
+
+    def __init__(self, app: ASGIApp, store: Optional[ProfileStore] = None, token: Optional[str] = None):
+        self.app = app
+        self.store = store or ProfileStore()
+        token = ProductionConfig.PROFILING_TOKEN if token is None else token
+        self.token = token.encode() if token else None
+        self._busy = False
+
+    def _mode(self, scope: Scope) -> Optional[str]:
+        if self.token is not None:
+            headers = dict(scope['headers'])
+            mode = headers.get(PROFILE_HEADER)
+            if mode is not None and hmac.compare_digest(headers.get(TOKEN_HEADER, b''), self.token):
+                mode = mode.decode('latin-1').strip().lower()
+                if mode in MODES:
+                    return mode
+        window = self.store.window()
+        if window is not None and scope['path'].startswith(window['path_prefix']):
+            return window['mode']
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        mode = self._mode(scope) if scope['type'] == 'http' and not self._busy else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        profile_id = uuid.uuid4().hex  # reserved up front so it can go out with the response headers
+        status_code = 500
+
+        async def tagging_send(message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                message = {**message, 'headers': [*message.get('headers', []),
+                                                  (b'x-profile-id', profile_id.encode())]}
+            await send(message)
+
+        sampler, profiler = None, None
+        if mode == 'sample':
+            sampler = StackSampler()
+            sampler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, tagging_send)
+        finally:
+            duration = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                profiler.create_stats()
+                data = marshal.dumps(profiler.stats)
+            else:
+                data = sampler.stop()
+            self._busy = False
+            self._save(profile_id, data, {
+                'mode': mode, 'format': MODES[mode], 'method': scope['method'], 'path': scope['path'],
+                'status_code': status_code, 'duration_ms': round(duration * 1000, 1), 'pid': os.getpid(),
+                **({'samples': sampler.samples} if sampler else {})
+            })
+
+    def _save(self, profile_id: str, data: bytes, meta: Dict) -> None:
+        try:
+            self.store.save(data, meta, profile_id=profile_id)
+            logger.info(f"Profiled {meta['method']} {meta['path']} ({meta['mode']}): {profile_id}")
+        except OSError as e:
+            logger.error(f"Failed to store profile {profile_id}: {str(e)}")
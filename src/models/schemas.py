@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Literal, Optional
+
+MAX_BATCH_READINGS = 100_000
 
 class SensorData(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -27,9 +29,46 @@ class RiskAssessment(BaseModel):
     risk_factors: list[str]
     timestamp: datetime = Field(default_factory=datetime.now)
 
+class RiskPrediction(BaseModel):
+    """Trained-model prediction for one reading"""
+    high_risk: bool
+    probability: float = Field(..., ge=0, le=1)
+    timestamp: datetime = Field(default_factory=datetime.now)
+
 class Report(BaseModel):
     id: str
     timestamp: datetime = Field(default_factory=datetime.now)
     content: str
     risk_assessment: RiskAssessment
     recommendations: list[str]
+
+class ReportNote(BaseModel):
+    """Incident or remediation note indexed for report context"""
+    text: str = Field(..., min_length=1, max_length=20_000)
+    kind: Literal["incident", "note"] = "note"
+
+class BatchRiskRequest(BaseModel):
+    """Readings in columnar form: one list per parameter, same length"""
+    temperature: List[float]
+    ph: List[float]
+    turbidity: List[float]
+    dissolved_oxygen: List[float]
+    conductivity: List[float]
+    include_factors: bool = False
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        lengths = {len(self.temperature), len(self.ph), len(self.turbidity),
+                   len(self.dissolved_oxygen), len(self.conductivity)}
+        if len(lengths) != 1:
+            raise ValueError("All parameter lists must have the same length")
+        if lengths.pop() > MAX_BATCH_READINGS:
+            raise ValueError(f"At most {MAX_BATCH_READINGS} readings per batch")
+        return self
+
+class BatchRiskResponse(BaseModel):
+    count: int
+    risk_levels: List[float]
+    high_risk: List[bool]
+    factor_totals: Dict[str, int]
+    factors: Optional[List[List[str]]] = None
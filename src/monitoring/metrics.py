@@ -31,6 +31,86 @@ API_ERRORS = Counter(
     ['error_type']
 )
 
+STREAM_SUBSCRIBERS = Gauge(
+    'water_monitoring_stream_subscribers',
+    'Number of connected live stream subscribers'
+)
+
+STREAM_DROPS = Counter(
+    'water_monitoring_stream_drops_total',
+    'Live stream events dropped or coalesced for slow subscribers',
+    ['reason']
+)
+
+READINGS_REJECTED = Counter(
+    'water_monitoring_readings_rejected_total',
+    'Sensor values that failed validation at ingest',
+    ['parameter']
+)
+
+ADMISSION_DECISIONS = Counter(
+    'water_monitoring_admission_decisions_total',
+    'Admission control outcomes per route class',
+    ['route_class', 'decision']
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    'water_monitoring_admission_in_flight',
+    'Requests being served per route class',
+    ['route_class']
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'water_monitoring_admission_queue_depth',
+    'Requests waiting for a slot per route class',
+    ['route_class']
+)
+
+INFERENCE_BATCH_SIZE = Histogram(
+    'water_monitoring_inference_batch_size',
+    'Readings scored per batched model call',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+INFERENCE_QUEUE_WAIT = Histogram(
+    'water_monitoring_inference_queue_wait_seconds',
+    'Time a prediction request waited for its batch to be scored',
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+)
+
+ALERTS_EMITTED = Counter(
+    'water_monitoring_alerts_total',
+    'Alert state changes detected at ingest',
+    ['rule', 'state']
+)
+
+ALERT_DISPATCH = Counter(
+    'water_monitoring_alert_dispatch_total',
+    'Alerts handed to each sink, by outcome',
+    ['sink', 'outcome']
+)
+
+DB_QUERY_SECONDS = Histogram(
+    'water_monitoring_db_query_seconds',
+    'SQLite statement execution time, including fetching the rows',
+    ['operation', 'table'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+
+DB_QUERY_ROWS = Counter(
+    'water_monitoring_db_query_rows_total',
+    'Rows returned or affected by SQLite statements',
+    ['operation', 'table']
+)
+
+_DB_QUERY_CHILDREN = {}
+
+DB_FULL_SCANS = Counter(
+    'water_monitoring_db_full_scans_total',
+    'Slow statements whose query plan scans a whole table',
+    ['table']
+)
+
 class MetricsCollector:
     @staticmethod
     def record_request(endpoint: str, method: str, status: int):
@@ -52,6 +132,61 @@ class MetricsCollector:
     def record_error(error_type: str):
         API_ERRORS.labels(error_type=error_type).inc()
 
+    @staticmethod
+    def update_stream_subscribers(count: int):
+        STREAM_SUBSCRIBERS.set(count)
+
+    @staticmethod
+    def record_stream_drop(reason: str):
+        STREAM_DROPS.labels(reason=reason).inc()
+
+    @staticmethod
+    def record_admission(route_class: str, decision: str):
+        ADMISSION_DECISIONS.labels(route_class=route_class, decision=decision).inc()
+
+    @staticmethod
+    def update_admission_load(route_class: str, in_flight: int, waiting: int):
+        ADMISSION_IN_FLIGHT.labels(route_class=route_class).set(in_flight)
+        ADMISSION_QUEUE_DEPTH.labels(route_class=route_class).set(waiting)
+
+    @staticmethod
+    def observe_inference_batch(batch_size: int, queue_waits: list):
+        INFERENCE_BATCH_SIZE.observe(batch_size)
+        for wait in queue_waits:
+            INFERENCE_QUEUE_WAIT.observe(wait)
+
+    @staticmethod
+    def record_rejected_readings(reject_counts: dict):
+        for parameter, count in reject_counts.items():
+            if count:
+                READINGS_REJECTED.labels(parameter=parameter).inc(count)
+
+    @staticmethod
+    def record_alerts(rule_counts: dict):
+        for (rule, state), count in rule_counts.items():
+            ALERTS_EMITTED.labels(rule=rule, state=state).inc(count)
+
+    @staticmethod
+    def record_alert_dispatch(sink: str, outcome: str, count: int = 1):
+        ALERT_DISPATCH.labels(sink=sink, outcome=outcome).inc(count)
+
+    @staticmethod
+    def observe_query(operation: str, table: str, seconds: float, rows: int):
+        # Runs for every statement: resolve the labelled children once per (operation, table)
+        children = _DB_QUERY_CHILDREN.get((operation, table))
+        if children is None:
+            children = _DB_QUERY_CHILDREN[(operation, table)] = (
+                DB_QUERY_SECONDS.labels(operation=operation, table=table),
+                DB_QUERY_ROWS.labels(operation=operation, table=table)
+            )
+        children[0].observe(seconds)
+        if rows > 0:
+            children[1].inc(rows)
+
+    @staticmethod
+    def record_full_scan(table: str):
+        DB_FULL_SCANS.labels(table=table).inc()
+
 def start_metrics_server(port: int = 9090):
     """Start the Prometheus metrics server"""
     start_http_server(port)
@@ -1,19 +1,44 @@
 import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import pandas as pd
 from langchain_community.llms import OpenAI
 from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
 from utils.database import DatabaseManager
 from utils.validators import DataValidator
-from utils.api_security import require_api_key, openai_rate_limiter
+from utils.api_security import require_api_key, openai_rate_limiter, estimate_tokens
+from risk_scoring import RiskScoreStore
+from risk_prediction import WaterRiskPredictor
+from report_index import ReportIndex
+from services.risk_rules import get_rule_engine
 
 load_dotenv()  # Load OpenAI API key from .env file
 
+logger = logging.getLogger(__name__)
+
+MAX_COMPLETION_TOKENS = 256  # OpenAI completion default, reserved per request
+RETRIEVED_DOCS = 3
+RETRIEVED_CHARS = 400        # per retrieved document, to keep the prompt bounded
+
+@require_api_key
+def create_openai_llm():
+    """Default LLM; fails fast when the OpenAI key is missing or malformed"""
+    return OpenAI(temperature=0.7, max_tokens=MAX_COMPLETION_TOKENS)
+
 class RiskReportGenerator:
-    def __init__(self, db_path='data/water_monitoring.db'):
+    def __init__(self, db_path='data/water_monitoring.db', llm=None, rate_limiter=None, index=None,
+                 predictor=None, site_id=None):
         self.db_manager = DatabaseManager(db_path)
-        self.llm = OpenAI(temperature=0.7)
+        self.score_store = RiskScoreStore(self.db_manager)
+        self.llm = llm or create_openai_llm()
+        self.rate_limiter = rate_limiter or openai_rate_limiter
+        # Past reports and notes live next to the site's database; sites sharing a
+        # directory share the index, so documents are tagged and searched by site
+        self.index = index if index is not None else ReportIndex(os.path.join(os.path.dirname(db_path), 'report_index'))
+        self.site_id = site_id or os.path.splitext(os.path.basename(db_path))[0]
+        self._predictor = predictor  # loaded lazily when not shared by the caller
         
         self.report_template = PromptTemplate(
             input_variables=["date", "metrics", "risk_levels", "historical_context"],
@@ -45,9 +70,7 @@ class RiskReportGenerator:
             WHERE timestamp >= datetime('now', ?)
             ORDER BY timestamp DESC
         """
-        with self.db_manager.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(f'-{hours} hours',))
-        return df
+        return self.db_manager.read_frame(query, (f'-{hours} hours',))
 
     def get_historical_context(self, days=7):
         """Get statistical summary of historical data"""
@@ -61,9 +84,7 @@ class RiskReportGenerator:
             FROM sensor_data 
             WHERE timestamp >= datetime('now', ?)
         """
-        with self.db_manager.get_connection() as conn:
-            historical_stats = pd.read_sql_query(query, conn, params=(f'-{days} days',))
-        return historical_stats
+        return self.db_manager.read_frame(query, (f'-{days} days',))
 
     def format_metrics(self, df):
         """Format current metrics for the report"""
@@ -76,25 +97,110 @@ class RiskReportGenerator:
         Conductivity: {latest['conductivity']:.1f} µS/cm
         """
 
-    def generate_report(self):
-        """Generate a comprehensive risk report"""
-        current_data = self.get_recent_data()
-        historical_stats = self.get_historical_context()
-        
-        # Get risk predictions
-        from risk_prediction import WaterRiskPredictor
-        predictor = WaterRiskPredictor()
-        predictions, probabilities = predictor.predict(current_data)
-        risk_percentage = (predictions.sum() / len(predictions)) * 100
-        
-        report_input = self.report_template.format(
+    def retrieve_context(self, current_data, k=RETRIEVED_DOCS):
+        """Past reports, incidents and notes most related to the current risk factors"""
+        latest = current_data.iloc[0]
+        _, factors = get_rule_engine().assess(latest)
+        query = " ".join(factors) if factors else "all parameters within safe range normal water quality"
+        results = self.index.search(query, k=k, site_id=self.site_id)
+        if not results:
+            return "No related past reports or notes."
+        return "\n".join(
+            f"- [{doc['created_at']}, {doc['kind']}] {doc['text'].strip()[:RETRIEVED_CHARS]}"
+            for _, doc in results
+        )
+
+    def remember_report(self, report):
+        """Index a generated report for future retrieval; never fails the report itself"""
+        try:
+            self.index.add(report, kind='report', site_id=self.site_id)
+        except Exception as e:
+            logger.warning(f"Could not index report: {str(e)}")
+
+    def load_predictor(self):
+        """Risk model, loaded from disk once per generator"""
+        if self._predictor is None:
+            predictor = WaterRiskPredictor()
+            predictor.load_model()
+            self._predictor = predictor
+        return self._predictor
+
+    def build_report_input(self, current_data, historical_stats, predictor):
+        """Fill the prompt template from the fetched inputs"""
+        scored = self.score_store.score_frame(current_data, predictor)
+        risk_percentage = scored['risk_prediction'].mean() * 100
+
+        return self.report_template.format(
             date=datetime.now().strftime("%Y-%m-%d"),
             metrics=self.format_metrics(current_data),
             risk_levels=f"Overall Risk Level: {risk_percentage:.1f}% of readings show elevated risk",
-            historical_context=f"Weekly Averages: Temp={historical_stats['avg_temp'].iloc[0]:.1f}°C, pH={historical_stats['avg_ph'].iloc[0]:.1f}"
+            historical_context=(
+                f"Weekly Averages: Temp={historical_stats['avg_temp'].iloc[0]:.1f}°C, "
+                f"pH={historical_stats['avg_ph'].iloc[0]:.1f}\n\n"
+                f"Related past reports and notes:\n{self.retrieve_context(current_data)}"
+            )
         )
-        
-        return self.llm.predict(report_input)
+
+    def prepare_report_input(self):
+        """Fetch recent data, historical context and the model concurrently, then build the prompt"""
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            current_data = pool.submit(self.get_recent_data)
+            historical_stats = pool.submit(self.get_historical_context)
+            predictor = pool.submit(self.load_predictor)
+            return self.build_report_input(
+                current_data.result(), historical_stats.result(), predictor.result()
+            )
+
+    async def aprepare_report_input(self):
+        """Async variant of prepare_report_input for the API's event loop"""
+        current_data, historical_stats, predictor = await asyncio.gather(
+            asyncio.to_thread(self.get_recent_data),
+            asyncio.to_thread(self.get_historical_context),
+            asyncio.to_thread(self.load_predictor)
+        )
+        return await asyncio.to_thread(
+            self.build_report_input, current_data, historical_stats, predictor
+        )
+
+    def _request_budget(self, report_input):
+        """Tokens reserved against the rate limit: prompt plus completion"""
+        return estimate_tokens(report_input) + MAX_COMPLETION_TOKENS
+
+    def generate_report(self):
+        """Generate a comprehensive risk report"""
+        report_input = self.prepare_report_input()
+        self.rate_limiter.acquire(self._request_budget(report_input))
+        report = self.llm.invoke(report_input)
+        self.remember_report(report)
+        return report
+
+    async def agenerate_report(self):
+        """Async report generation, waiting on the rate limiter without blocking the loop"""
+        report_input = await self.aprepare_report_input()
+        await self.rate_limiter.acquire_async(self._request_budget(report_input))
+        report = await self.llm.ainvoke(report_input)
+        await asyncio.to_thread(self.remember_report, report)
+        return report
+
+    def stream_report(self):
+        """Yield the report text as the LLM produces it"""
+        report_input = self.prepare_report_input()
+        self.rate_limiter.acquire(self._request_budget(report_input))
+        chunks = []
+        for chunk in self.llm.stream(report_input):
+            chunks.append(chunk)
+            yield chunk
+        self.remember_report("".join(chunks))
+
+    async def astream_report(self):
+        """Async generator of report text chunks"""
+        report_input = await self.aprepare_report_input()
+        await self.rate_limiter.acquire_async(self._request_budget(report_input))
+        chunks = []
+        async for chunk in self.llm.astream(report_input):
+            chunks.append(chunk)
+            yield chunk
+        await asyncio.to_thread(self.remember_report, "".join(chunks))
 
 if __name__ == '__main__':
     generator = RiskReportGenerator()
@@ -0,0 +1,287 @@
+import os
+import re
+import json
+import time
+import zlib
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; single writer assumed there
+    fcntl = None
+
+EMBED_DIM = 256          # signed hashed-feature embedding, float32
+BM25_BUCKETS = 2048      # hashed term buckets for BM25 counts, uint16
+INITIAL_CAPACITY = 1024  # rows; the matrices double when full
+SHORTLIST = 256          # cosine candidates reranked with BM25
+DOC_KINDS = ('report', 'incident', 'note')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or that the this to was were with".split()
+)
+
+def tokenize(text):
+    """Lowercase words and numbers plus adjacent-word bigrams"""
+    words = [w for w in _TOKEN_RE.findall(text.lower()) if w not in _STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+def _hashes(tokens):
+    return np.fromiter((zlib.crc32(t.encode()) for t in tokens), dtype=np.uint32, count=len(tokens))
+
+def featurize(text):
+    """
+    Hashed features of one text
+    Returns the L2-normalised float32 embedding (log-scaled, signed hashing)
+    and the uint16 term counts per BM25 bucket
+    """
+    hashes = _hashes(tokenize(text))
+    counts = np.bincount(hashes % BM25_BUCKETS, minlength=BM25_BUCKETS)
+
+    slots, tf = np.unique(hashes >> 8, return_counts=True)
+    signs = np.where(slots & 1, 1.0, -1.0)
+    embedding = np.zeros(EMBED_DIM, dtype=np.float32)
+    np.add.at(embedding, (slots >> 1) % EMBED_DIM, signs * (1.0 + np.log(tf)))
+    norm = np.linalg.norm(embedding)
+    if norm > 0:
+        embedding /= norm
+    return embedding, np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16)
+
+class ReportIndex:
+    """
+    Append-only local retrieval index over reports, incidents and remediation notes
+    Embeddings and BM25 term counts are kept in memory-mapped NumPy matrices
+    that double in size when full. Document text and metadata go to an
+    append-only JSON-lines file, and a row is only visible once its line has
+    been written. Search shortlists by cosine similarity (one matrix-vector
+    product) and reranks the shortlist with BM25 over the hashed buckets, so
+    count rows are only read for candidates. Appends made by other processes
+    are picked up on the next search. Sites sharing an index directory only
+    see each other's documents when searching without a site_id.
+    """
+
+    def __init__(self, index_dir='data/report_index'):
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self._docs_path = os.path.join(index_dir, 'docs.jsonl')
+        self._lock = threading.Lock()
+        self.docs = []
+        self._docs_offset = 0
+        self._capacity = 0
+        self._vectors = None
+        self._counts = None
+        self._kinds = np.empty(0, dtype=np.int8)
+        self._sites = np.empty(0, dtype=np.int32)  # codes into _site_codes, -1 for no site
+        self._site_codes = {}
+        self._lengths = np.empty(0, dtype=np.float32)
+        self._df = np.zeros(BM25_BUCKETS, dtype=np.int64)
+        with self._lock:
+            self._refresh()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _matrix_path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _open_matrices(self, capacity):
+        """Map both matrices at capacity rows, growing the files if needed"""
+        for name, dtype, width in (('vectors.f32', np.float32, EMBED_DIM),
+                                   ('counts.u16', np.uint16, BM25_BUCKETS)):
+            path = self._matrix_path(name)
+            size = capacity * width * np.dtype(dtype).itemsize
+            with open(path, 'ab') as f:
+                if f.tell() < size:
+                    f.truncate(size)
+        self._vectors = np.memmap(self._matrix_path('vectors.f32'), dtype=np.float32,
+                                  mode='r+', shape=(capacity, EMBED_DIM))
+        self._counts = np.memmap(self._matrix_path('counts.u16'), dtype=np.uint16,
+                                 mode='r+', shape=(capacity, BM25_BUCKETS))
+        self._capacity = capacity
+
+    def _refresh(self):
+        """Load document lines appended since the last refresh (by any process)"""
+        try:
+            size = os.path.getsize(self._docs_path)
+        except FileNotFoundError:
+            size = 0
+        if self._vectors is not None and size == self._docs_offset:
+            return
+
+        with open(self._docs_path, 'a+') as f:
+            f.seek(self._docs_offset)
+            new_docs = []
+            for line in f:
+                if not line.endswith('\n'):
+                    break  # a writer is mid-line; pick it up next time
+                new_docs.append(json.loads(line))
+                self._docs_offset += len(line.encode())
+
+        n = len(self.docs) + len(new_docs)
+        on_disk = os.path.getsize(self._matrix_path('vectors.f32')) if os.path.exists(
+            self._matrix_path('vectors.f32')) else 0
+        capacity = max(INITIAL_CAPACITY, on_disk // (EMBED_DIM * 4))
+        if capacity != self._capacity:
+            self._open_matrices(capacity)
+
+        if new_docs:
+            start = len(self.docs)
+            self.docs.extend(new_docs)
+            counts = self._counts[start:n]
+            self._lengths = np.concatenate([self._lengths, counts.sum(axis=1, dtype=np.float32)])
+            self._df += (counts > 0).sum(axis=0)
+            self._kinds = np.concatenate([
+                self._kinds,
+                np.array([DOC_KINDS.index(d['kind']) for d in new_docs], dtype=np.int8)
+            ])
+            self._sites = np.concatenate([
+                self._sites,
+                np.array([self._site_code(d.get('site_id')) for d in new_docs], dtype=np.int32)
+            ])
+
+    def _site_code(self, site_id):
+        if site_id is None:
+            return -1
+        return self._site_codes.setdefault(site_id, len(self._site_codes))
+
+    @contextmanager
+    def _writer_lock(self):
+        """Serialise appends across processes"""
+        with open(self._matrix_path('write.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, text, kind='report', site_id=None, created_at=None):
+        """Append one document and return its row id"""
+        if kind not in DOC_KINDS:
+            raise ValueError(f"kind must be one of {DOC_KINDS}")
+        embedding, counts = featurize(text)
+        with self._lock, self._writer_lock():
+            self._refresh()
+            row = len(self.docs)
+            if row >= self._capacity:
+                self._open_matrices(self._capacity * 2)
+            self._vectors[row] = embedding
+            self._counts[row] = counts
+            self._vectors.flush()
+            self._counts.flush()
+            # The document line is the commit point for the row written above
+            doc = {
+                'id': row,
+                'kind': kind,
+                'site_id': site_id,
+                'created_at': (created_at or datetime.now()).isoformat(timespec='seconds'),
+                'text': text
+            }
+            with open(self._docs_path, 'a') as f:
+                f.write(json.dumps(doc) + '\n')
+            self._refresh()
+        return row
+
+    def search(self, query, k=3, kinds=None, alpha=0.5, site_id=None):
+        """
+        Top-k documents for a query as (score, doc) pairs, best first
+        alpha weighs cosine similarity against BM25 normalised to the best candidate.
+        With site_id, only that site's documents are returned.
+        """
+        with self._lock:
+            self._refresh()
+            n = len(self.docs)
+            vectors, counts = self._vectors, self._counts
+            lengths, df, doc_kinds, doc_sites = self._lengths, self._df.copy(), self._kinds, self._sites
+            site_code = self._site_codes.get(site_id) if site_id is not None else None
+        if n == 0 or (site_id is not None and site_code is None):
+            return []
+
+        embedding, query_counts = featurize(query)
+        cosine = vectors[:n] @ embedding
+        if kinds is not None:
+            allowed = np.isin(doc_kinds, [DOC_KINDS.index(kind) for kind in kinds])
+            cosine = np.where(allowed, cosine, -np.inf)
+        if site_code is not None:
+            cosine = np.where(doc_sites == site_code, cosine, -np.inf)
+
+        candidates = np.arange(n)
+        if n > SHORTLIST:
+            candidates = np.argpartition(-cosine, SHORTLIST - 1)[:SHORTLIST]
+        candidates = candidates[np.isfinite(cosine[candidates])]
+        if len(candidates) == 0:
+            return []
+
+        buckets = np.flatnonzero(query_counts)
+        tf = counts[candidates[:, None], buckets].astype(np.float32)
+        idf = np.log1p((n - df[buckets] + 0.5) / (df[buckets] + 0.5)).astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[candidates] / max(lengths.mean(), 1.0))
+        bm25 = (tf * (BM25_K1 + 1) / (tf + norm[:, None])) @ idf
+        top_bm25 = bm25.max()
+        scores = alpha * cosine[candidates] + (1 - alpha) * (bm25 / top_bm25 if top_bm25 > 0 else bm25)
+
+        order = np.argsort(-scores)[:k]
+        return [(float(scores[i]), self.docs[candidates[i]]) for i in order]
+
+def run_benchmark(n_docs=10_000, n_queries=200, k=5):
+    """Append and top-k search latency on a synthetic corpus"""
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    vocabulary = ("temperature ph turbidity dissolved oxygen conductivity high low elevated "
+                  "risk filter flush chlorine intake pump valve storm runoff algae bloom "
+                  "sensor calibration drift inspection maintenance upstream discharge").split()
+    texts = [" ".join(rng.choice(vocabulary, 80)) for _ in range(n_docs)]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ReportIndex(tmp)
+        started = time.perf_counter()
+        for text in texts:
+            index.add(text)
+        append_ms = (time.perf_counter() - started) * 1000 / n_docs
+
+        timings = []
+        for text in texts[:n_queries]:
+            started = time.perf_counter()
+            index.search(text[:120], k=k)
+            timings.append(time.perf_counter() - started)
+    return append_ms, np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Local retrieval index for reports and notes")
+    parser.add_argument('--index-dir', default='data/report_index')
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add', help="index an incident or remediation note")
+    add.add_argument('--kind', choices=DOC_KINDS, default='note')
+    add.add_argument('--site-id')
+    add.add_argument('text')
+    search = sub.add_parser('search')
+    search.add_argument('query')
+    search.add_argument('-k', type=int, default=3)
+    search.add_argument('--site-id')
+    bench = sub.add_parser('benchmark')
+    bench.add_argument('--docs', type=int, default=10_000)
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        append_ms, p50, p99 = run_benchmark(args.docs)
+        print(f"{args.docs} docs: append {append_ms:.3f} ms/doc, search p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+        return
+
+    index = ReportIndex(args.index_dir)
+    if args.command == 'add':
+        print(f"Indexed document {index.add(args.text, args.kind, args.site_id)}")
+    else:
+        for score, doc in index.search(args.query, args.k, site_id=args.site_id):
+            print(f"{score:.3f}  [{doc['kind']} {doc['created_at']}] {doc['text'][:100]}")
+
+if __name__ == '__main__':
+    main()
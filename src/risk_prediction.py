@@ -1,47 +1,94 @@
+import io
+import os
+import json
+import hashlib
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 import joblib
 import sqlite3
+from services.risk_rules import get_rule_engine
+
+FEATURES = ['temperature', 'ph', 'turbidity', 'dissolved_oxygen', 'conductivity']
+
+def metadata_path(model_path):
+    """Sidecar file describing the saved model"""
+    return os.path.splitext(model_path)[0] + '.json'
+
+def load_model_metadata(model_path='models/risk_model.joblib'):
+    """Metadata written by the training pipeline, or {} for older models"""
+    try:
+        with open(metadata_path(model_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def model_digest(data):
+    """Content hash of a saved model file"""
+    return 'sha256:' + hashlib.sha256(data).hexdigest()[:12]
+
+def model_version(model_path='models/risk_model.joblib', data=None):
+    """
+    Version of the model file's contents (data, if given, else read from disk)
+    The training pipeline's version when its metadata describes these bytes,
+    else their hash
+    """
+    if data is None:
+        with open(model_path, 'rb') as f:
+            data = f.read()
+    digest = model_digest(data)
+    metadata = load_model_metadata(model_path)
+    if metadata.get('version') and metadata.get('sha256', digest) == digest:
+        return metadata['version']
+    return digest
+
+def label_risk(df):
+    """Vectorized risk labels: 1 when enough parameters are out of range"""
+    return get_rule_engine().risk_labels(df)
 
 class WaterRiskPredictor:
     def __init__(self, model_path='models/risk_model.joblib'):
         self.model_path = model_path
         self.model = None
         self.scaler = StandardScaler()
+        self.version = None  # of the model in memory, set when it is trained or loaded
         
     def _get_risk_label(self, row):
         """Define risk conditions based on water parameters"""
-        high_risk_conditions = [
-            row['temperature'] > 25,  # High temperature risk
-            row['ph'] < 6.5 or row['ph'] > 8.5,  # pH out of safe range
-            row['turbidity'] > 8,  # High turbidity
-            row['dissolved_oxygen'] < 6,  # Low dissolved oxygen
-            row['conductivity'] > 600  # High conductivity
-        ]
-        return 1 if sum(high_risk_conditions) >= 2 else 0
+        return 1 if get_rule_engine().is_high_risk(row) else 0
+
+    @property
+    def feature_names(self):
+        """Columns the model was trained on: FEATURES, plus window features for feature-store models"""
+        return list(getattr(self.scaler, 'feature_names_in_', FEATURES))
 
-    def prepare_data(self, df):
+    def prepare_data(self, df, features=FEATURES):
         """Prepare features and add risk labels"""
-        df['risk'] = df.apply(self._get_risk_label, axis=1)
-        features = ['temperature', 'ph', 'turbidity', 'dissolved_oxygen', 'conductivity']
+        df['risk'] = label_risk(df)
         X = df[features]
         y = df['risk']
         return X, y
 
-    def train(self, training_data):
+    def train(self, training_data, features=FEATURES):
         """Train the risk prediction model"""
-        X, y = self.prepare_data(training_data)
+        X, y = self.prepare_data(training_data, features)
         X_scaled = self.scaler.fit_transform(X)
         
         self.model = RandomForestClassifier(n_estimators=100, random_state=42)
         self.model.fit(X_scaled, y)
-        joblib.dump((self.model, self.scaler), self.model_path)
+        buffer = io.BytesIO()
+        joblib.dump((self.model, self.scaler), buffer)
+        with open(self.model_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        self.version = model_version(self.model_path, buffer.getvalue())
         
     def load_model(self):
-        """Load trained model from disk"""
-        self.model, self.scaler = joblib.load(self.model_path)
+        """Load trained model from disk, recording the version of the bytes read"""
+        with open(self.model_path, 'rb') as f:
+            data = f.read()
+        self.model, self.scaler = joblib.load(io.BytesIO(data))
+        self.version = model_version(self.model_path, data)
 
     def predict(self, data):
         """Predict risk levels for new data"""
@@ -51,7 +98,7 @@ class WaterRiskPredictor:
             except:
                 raise Exception("No trained model found. Please train the model first.")
         
-        X_scaled = self.scaler.transform(data[['temperature', 'ph', 'turbidity', 'dissolved_oxygen', 'conductivity']])
+        X_scaled = self.scaler.transform(data[self.feature_names])
         predictions = self.model.predict(X_scaled)
         probabilities = self.model.predict_proba(X_scaled)
         
@@ -59,7 +106,7 @@ class WaterRiskPredictor:
 
 def train_initial_model():
     """Train initial model with simulated data"""
-    from sensor_simulation import WaterSensorSimulator
+    from services.sensor_simulation import WaterSensorSimulator
     
     # Generate training data
     simulator = WaterSensorSimulator()
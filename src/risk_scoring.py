@@ -0,0 +1,231 @@
+import os
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from risk_prediction import FEATURES, WaterRiskPredictor
+from services.feature_store import WINDOW_FEATURES, FeatureStore
+from utils.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+class RiskScoringError(Exception):
+    """Custom exception for risk scoring errors"""
+    pass
+
+def _uses_window_features(predictor):
+    """True for models trained on the feature store's rolling-window features"""
+    return bool(set(WINDOW_FEATURES) & set(predictor.feature_names))
+
+class RiskScoreStore:
+    """Persisted model outputs for sensor_data rows, keyed by timestamp and model version"""
+
+    def __init__(self, db_manager=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self._feature_store = None
+        self._init_tables()
+
+    def _init_tables(self):
+        self.db_manager.execute_write('''
+            CREATE TABLE IF NOT EXISTS risk_scores (
+                timestamp DATETIME NOT NULL,
+                model_version TEXT NOT NULL,
+                risk_prediction INTEGER NOT NULL,
+                risk_probability FLOAT NOT NULL,
+                scored_at DATETIME NOT NULL,
+                PRIMARY KEY (timestamp, model_version)
+            )
+        ''')
+        self.db_manager.execute_write('''
+            CREATE TABLE IF NOT EXISTS risk_score_checkpoints (
+                job TEXT PRIMARY KEY,
+                model_version TEXT NOT NULL,
+                last_timestamp DATETIME NOT NULL,
+                rows_scored INTEGER NOT NULL,
+                updated_at DATETIME NOT NULL
+            )
+        ''')
+
+    def save(self, conn, timestamps, predictions, probabilities, version):
+        """Insert scores on an open connection so callers control the transaction"""
+        scored_at = datetime.now().isoformat(sep=' ')
+        conn.executemany(
+            '''INSERT OR REPLACE INTO risk_scores
+               (timestamp, model_version, risk_prediction, risk_probability, scored_at)
+               VALUES (?, ?, ?, ?, ?)''',
+            [(ts, version, int(p), float(prob), scored_at)
+             for ts, p, prob in zip(timestamps, predictions, probabilities)]
+        )
+
+    def get_checkpoint(self, job):
+        rows = self.db_manager.execute_query(
+            "SELECT model_version, last_timestamp, rows_scored FROM risk_score_checkpoints WHERE job = ?",
+            (job,)
+        )
+        return dict(rows[0]) if rows else None
+
+    def _save_checkpoint(self, conn, job, version, last_timestamp, rows_scored):
+        conn.execute(
+            '''INSERT OR REPLACE INTO risk_score_checkpoints
+               (job, model_version, last_timestamp, rows_scored, updated_at)
+               VALUES (?, ?, ?, ?, ?)''',
+            (job, version, last_timestamp, rows_scored, datetime.now().isoformat(sep=' '))
+        )
+
+    def _with_window_features(self, df):
+        """Rows joined with their materialized window features, which must all exist"""
+        if self._feature_store is None:
+            self._feature_store = FeatureStore(self.db_manager)
+        df = self._feature_store.attach(df)
+        if df[WINDOW_FEATURES].isna().to_numpy().any():
+            raise RiskScoringError("Readings without window features cannot be scored by this model; "
+                                   "run FeatureStore.backfill() first")
+        return df
+
+    def score_frame(self, df, predictor):
+        """
+        Attach risk_prediction/risk_probability to rows read from sensor_data
+        Stored scores for the predictor's model are reused; only unscored rows
+        are predicted, and their scores are persisted for the next reader under
+        the version of the model in memory, not of the file on disk. Models
+        trained on window features get them from sensor_features, as in training.
+        """
+        if df.empty:
+            return df.assign(risk_prediction=pd.Series(dtype='int64'),
+                             risk_probability=pd.Series(dtype='float64'))
+
+        if predictor.model is None:
+            predictor.load_model()
+        version = predictor.version
+        timestamps = df['timestamp'].astype(str)
+        rows = self.db_manager.execute_query(
+            '''SELECT timestamp, risk_prediction, risk_probability FROM risk_scores
+               WHERE model_version = ? AND timestamp >= ? AND timestamp <= ?''',
+            (version, timestamps.min(), timestamps.max())
+        )
+        stored = pd.DataFrame([tuple(r) for r in rows],
+                              columns=['timestamp', 'risk_prediction', 'risk_probability'])
+        scored = df.assign(timestamp=timestamps).merge(stored, on='timestamp', how='left')
+
+        missing = scored['risk_prediction'].isna().to_numpy()
+        if missing.any():
+            unscored = scored.loc[missing]
+            if _uses_window_features(predictor):
+                unscored = self._with_window_features(unscored)
+            predictions, probabilities = predictor.predict(unscored)
+            scored.loc[missing, 'risk_prediction'] = predictions
+            scored.loc[missing, 'risk_probability'] = probabilities[:, -1]
+            with self.db_manager.get_connection() as conn:
+                self.save(conn, unscored['timestamp'], predictions, probabilities[:, -1], version)
+
+        scored['risk_prediction'] = scored['risk_prediction'].astype('int64')
+        scored.index = df.index
+        return scored
+
+_worker_predictor = None
+
+def _init_worker(model_path):
+    """Load the model once per worker process"""
+    global _worker_predictor
+    _worker_predictor = WaterRiskPredictor(model_path)
+    _worker_predictor.load_model()
+
+def _score_chunk(chunk):
+    predictions, probabilities = _worker_predictor.predict(chunk)
+    return _worker_predictor.version, chunk['timestamp'].tolist(), predictions, probabilities[:, -1]
+
+def backfill_risk_scores(db_path='data/water_monitoring.db', model_path='models/risk_model.joblib',
+                         chunk_size=20_000, workers=None, job='backfill'):
+    """
+    Score every unscored sensor_data row with the current model across a process pool
+    Chunks are read by keyset pagination while workers predict. Results are
+    written in order together with a checkpoint, so an interrupted run resumes
+    after the last committed chunk. A new model version restarts from the beginning;
+    if the model file is replaced mid-run, the run stops rather than mixing versions.
+    Models trained on window features read them from sensor_features; readings
+    without materialized features are left unscored.
+    """
+    store = RiskScoreStore(DatabaseManager(db_path))
+    predictor = WaterRiskPredictor(model_path)
+    predictor.load_model()
+    version = predictor.version
+    checkpoint = store.get_checkpoint(job)
+    resume_from = ''
+    rows_scored = 0
+    if checkpoint and checkpoint['model_version'] == version:
+        resume_from = checkpoint['last_timestamp']
+        rows_scored = checkpoint['rows_scored']
+        logger.info(f"Resuming backfill for model {version} after {resume_from}")
+
+    columns = ", ".join(f"s.{name}" for name in FEATURES)
+    join = ''
+    if _uses_window_features(predictor):
+        columns += ", " + ", ".join(f"f.{name}" for name in WINDOW_FEATURES)
+        join = "JOIN sensor_features f ON f.timestamp = s.timestamp"
+    del predictor  # workers load their own copy
+    query = f'''
+        SELECT s.timestamp, {columns} FROM sensor_data s {join}
+        WHERE s.timestamp > ?
+          AND NOT EXISTS (SELECT 1 FROM risk_scores r
+                          WHERE r.timestamp = s.timestamp AND r.model_version = ?)
+        ORDER BY s.timestamp
+        LIMIT ?
+    '''
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    session_rows = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path,)) as pool:
+        in_flight = deque()
+        cursor = resume_from
+        exhausted = False
+
+        while in_flight or not exhausted:
+            # Keep every worker busy with one chunk queued behind it
+            while not exhausted and len(in_flight) < workers * 2:
+                chunk = store.db_manager.read_frame(query, (cursor, version, chunk_size))
+                if chunk.empty:
+                    exhausted = True
+                    break
+                cursor = chunk['timestamp'].iloc[-1]
+                in_flight.append(pool.submit(_score_chunk, chunk))
+
+            if not in_flight:
+                break
+            scored_by, timestamps, predictions, probabilities = in_flight.popleft().result()
+            if scored_by != version:
+                raise RiskScoringError(f"Model file changed during the backfill ({version} -> {scored_by}); "
+                                       f"rerun to score with the new model")
+            rows_scored += len(timestamps)
+            session_rows += len(timestamps)
+            with store.db_manager.get_connection() as conn:
+                store.save(conn, timestamps, predictions, probabilities, version)
+                store._save_checkpoint(conn, job, version, timestamps[-1], rows_scored)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Backfilled {session_rows} risk scores for model {version} in {elapsed:.1f}s")
+    return {'model_version': version, 'rows_scored': session_rows, 'seconds': elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill persisted risk scores for sensor_data")
+    parser.add_argument('--db-path', default='data/water_monitoring.db')
+    parser.add_argument('--model-path', default='models/risk_model.joblib')
+    parser.add_argument('--chunk-size', type=int, default=20_000)
+    parser.add_argument('--workers', type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument('--job', default='backfill', help="checkpoint name")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = backfill_risk_scores(args.db_path, args.model_path, args.chunk_size, args.workers, args.job)
+    rate = result['rows_scored'] / result['seconds'] if result['seconds'] else 0
+    print(f"Scored {result['rows_scored']} rows with model {result['model_version']} "
+          f"in {result['seconds']:.1f}s ({rate:,.0f} rows/s)")
+
+if __name__ == '__main__':
+    main()
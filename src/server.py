@@ -0,0 +1,231 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import importlib
+import subprocess
+
+import uvicorn
+
+from utils.logger import stop_logging
+from utils.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def _import_app(app_path: str, preload: bool):
+    """Import 'module:attr' and, when asked, run the module's preload() hook"""
+    module_name, attr = app_path.split(':')
+    module = importlib.import_module(module_name)
+    if preload and callable(getattr(module, 'preload', None)):
+        module.preload()
+    return getattr(module, attr)
+
+class PreforkServer:
+    """
+    Production launcher: one listening socket, N forked uvicorn workers
+    With preload (the default) the app module is imported and its preload()
+    hook run in the parent, so the model, the rule engine and every imported
+    library are loaded once and shared copy-on-write by the workers. gc.freeze()
+    keeps the collector from writing to (and so copying) those pages. State
+    that must be the same in every worker lives in utils.shared_state, which
+    is created at import time and inherited across the fork. The kernel
+    balances connections across workers accepting on the shared socket.
+    Workers that die are restarted.
+    """
+
+    def __init__(self, app: str = 'main:app', host: str = '0.0.0.0', port: int = 8000,
+                 workers: int = None, preload: bool = True, log_level: str = 'info'):
+        self.app_path = app
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.preload = preload
+        self.log_level = log_level
+        self.children = {}
+        self.stopping = False
+        self._sock = None
+        self._app = None
+
+    def _run_worker(self) -> None:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        app = self._app if self._app is not None else _import_app(self.app_path, preload=True)
+        config = uvicorn.Config(app, log_level=self.log_level, access_log=False)
+        uvicorn.Server(config).run(sockets=[self._sock])
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker()
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                stop_logging()  # os._exit skips atexit, so flush queued log records here
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        self._sock = _bind(self.host, self.port)
+        get_shared_state()  # create the segment here so every worker inherits the same one
+        if self.preload:
+            started = time.perf_counter()
+            self._app = _import_app(self.app_path, preload=True)
+            gc.collect()
+            gc.freeze()
+            logger.info(f"Preloaded {self.app_path} in {time.perf_counter() - started:.1f}s")
+
+        for _ in range(self.workers):
+            self._spawn()
+        logger.info(f"Serving on {self.host}:{self.port} with {self.workers} workers")
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if self.stopping or started is None:
+                continue
+            logger.warning(f"Worker {pid} exited with status {status}; restarting")
+            if time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+                time.sleep(RESPAWN_BACKOFF_SECONDS)  # don't spin on a worker that fails at start
+            self._spawn()
+        self._sock.close()
+
+def _memory_mb(pids) -> tuple:
+    """Summed RSS and PSS (proportional: shared pages split between sharers) in MB"""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+        except FileNotFoundError:
+            pass
+    return rss / 1024, pss / 1024
+
+def _process_tree(pid):
+    children = subprocess.run(['pgrep', '-P', str(pid)], capture_output=True, text=True).stdout.split()
+    return [pid] + [int(child) for child in children]
+
+async def _load(url, headers, n_requests, concurrency):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, headers=headers, timeout=30) as client:
+        remaining = iter(range(n_requests))
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                response = await client.get(url)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started, errors
+
+def _wait_for_port(port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server did not start listening on port {port}")
+
+def benchmark(worker_counts, app='main:app', path='/sensor-data/current', port=8765,
+              n_requests=5000, concurrency=64, username=None, password=None, preload=True):
+    """Requests/s and memory for each worker count against a freshly launched server"""
+    import httpx
+
+    results = []
+    for workers in worker_counts:
+        command = [sys.executable, os.path.abspath(__file__), '--app', app, '--port', str(port),
+                   '--host', '127.0.0.1', '--workers', str(workers), '--log-level', 'warning']
+        if not preload:
+            command.append('--no-preload')
+        server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            _wait_for_port(port)
+            headers = {}
+            if username:
+                token = httpx.post(f"http://127.0.0.1:{port}/token",
+                                   data={'username': username, 'password': password}).json()
+                headers['Authorization'] = f"Bearer {token['access_token']}"
+            url = f"http://127.0.0.1:{port}{path}"
+            asyncio.run(_load(url, headers, min(500, n_requests), concurrency))  # warm up
+            seconds, errors = asyncio.run(_load(url, headers, n_requests, concurrency))
+            rss, pss = _memory_mb(_process_tree(server.pid))
+            results.append({'workers': workers, 'rps': n_requests / seconds, 'errors': errors,
+                            'rss_mb': rss, 'pss_mb': pss})
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-forking production server")
+    parser.add_argument('--app', default='main:app')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help="import the app in each worker instead of once before forking")
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--benchmark', type=str, default=None,
+                        help="comma-separated worker counts to benchmark, e.g. 1,2,4")
+    parser.add_argument('--path', default='/sensor-data/current')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--username', default=os.getenv('BENCHMARK_USERNAME'))
+    parser.add_argument('--password', default=os.getenv('BENCHMARK_PASSWORD'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+    if args.benchmark:
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        counts = [int(n) for n in args.benchmark.split(',')]
+        for row in benchmark(counts, args.app, args.path, args.port, args.requests,
+                             args.concurrency, args.username, args.password, args.preload):
+            print(f"{row['workers']:>3} workers: {row['rps']:8.0f} req/s  {row['errors']} errors  "
+                  f"RSS {row['rss_mb']:7.1f} MB  PSS {row['pss_mb']:7.1f} MB")
+        return
+
+    PreforkServer(args.app, args.host, args.port, args.workers, args.preload, args.log_level).run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+import re
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from utils.database import DatabaseManager
+from services.cold_storage import SENSOR_COLUMNS, TieredSensorStore, _sql_timestamp
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = ('avg', 'min', 'max', 'count', 'stddev')
+PARAMETERS = SENSOR_COLUMNS[1:]
+MAX_BUCKETS = 100_000
+DECIMALS = 4  # well below sensor resolution; keeps the response compact
+
+# unixepoch() (SQLite 3.38+) parses timestamps about a third faster than strftime('%s')
+_EPOCH_SQL = ("unixepoch(timestamp)" if sqlite3.sqlite_version_info >= (3, 38, 0)
+              else "CAST(strftime('%s', timestamp) AS INTEGER)")
+
+_WIDTH_RE = re.compile(r'^(\d+)([smhdw])$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+# Mergeable partial aggregates each requested aggregate is computed from
+_PARTIALS = {
+    'avg': ('count', 'sum'),
+    'min': ('min',),
+    'max': ('max',),
+    'count': ('count',),
+    'stddev': ('count', 'sum', 'sumsq')
+}
+_SQL_PARTIALS = {
+    'count': 'count({p})',
+    'sum': 'sum({p})',
+    'sumsq': 'sum({p} * {p})',
+    'min': 'min({p})',
+    'max': 'max({p})'
+}
+_MERGE = {'count': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'min': 'min', 'max': 'max'}
+
+class AggregationError(Exception):
+    """Custom exception for invalid aggregation requests"""
+    pass
+
+def parse_bucket_width(width: str) -> int:
+    """'15m', '1h', '1d' ... to seconds"""
+    match = _WIDTH_RE.match(width.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise AggregationError(f"Invalid bucket width '{width}'; use e.g. 30s, 15m, 1h, 1d, 1w")
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+def _validate(names: Sequence[str], allowed: Sequence[str], kind: str) -> List[str]:
+    names = list(dict.fromkeys(names))
+    invalid = [name for name in names if name not in allowed]
+    if invalid or not names:
+        raise AggregationError(f"Unknown or missing {kind}: {invalid}; choose from {list(allowed)}")
+    return names
+
+def _partial_columns(parameters: Sequence[str], aggregates: Sequence[str]) -> List[tuple]:
+    """(parameter, partial) pairs needed for the requested aggregates, in output order"""
+    partials = dict.fromkeys(p for agg in aggregates for p in _PARTIALS[agg])
+    return [(param, partial) for param in parameters for partial in partials]
+
+def build_aggregate_sql(bucket_seconds: int, parameters: Sequence[str],
+                        aggregates: Sequence[str]) -> str:
+    """
+    One grouped statement over the timestamp key
+    The range predicate is on the raw timestamp so the primary-key index
+    bounds the scan; buckets are whole multiples of the width since the epoch
+    """
+    select = ",\n               ".join(
+        f"{_SQL_PARTIALS[partial].format(p=param)} AS {param}__{partial}"
+        for param, partial in _partial_columns(parameters, aggregates)
+    )
+    return f'''
+        SELECT ({_EPOCH_SQL} / {int(bucket_seconds)}) * {int(bucket_seconds)} AS bucket,
+               {select}
+        FROM sensor_data
+        WHERE timestamp >= ? AND timestamp < ?
+        GROUP BY bucket
+        ORDER BY bucket
+    '''
+
+class SensorAggregator:
+    """
+    Time-bucket aggregates over sensor_data, computed where the data lives
+    Hot rows are reduced by SQLite in one grouped statement. Archived days
+    are reduced from their Parquet files. Both produce mergeable partials
+    (count, sum, sum of squares, min, max), which are combined per bucket
+    before the requested aggregates are finalised.
+    """
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None,
+                 store: Optional[TieredSensorStore] = None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.store = store or TieredSensorStore(self.db_manager)
+
+    def _hot_partials(self, sql: str, start: str, end: str) -> pd.DataFrame:
+        return self.db_manager.read_frame(sql, (start, end)).set_index('bucket')
+
+    def _cold_partials(self, path: str, bucket_seconds: int, parameters: Sequence[str],
+                       aggregates: Sequence[str], start: datetime, end: datetime) -> pd.DataFrame:
+        filters = [('timestamp', '>=', pd.Timestamp(start)), ('timestamp', '<', pd.Timestamp(end))]
+        df = pq.read_table(path, columns=['timestamp', *parameters], filters=filters).to_pandas()
+        seconds = df['timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+        buckets = (seconds // bucket_seconds) * bucket_seconds
+
+        partials = {}
+        for param, partial in _partial_columns(parameters, aggregates):
+            values = df[param] ** 2 if partial == 'sumsq' else df[param]
+            how = 'sum' if partial == 'sumsq' else partial
+            partials[f"{param}__{partial}"] = values.groupby(buckets).agg(how)
+        result = pd.DataFrame(partials)
+        result.index.name = 'bucket'
+        return result
+
+    def aggregate(self, bucket: str, parameters: Sequence[str], aggregates: Sequence[str],
+                  start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict:
+        """
+        Columnar aggregates for [start, end): bucket start times (epoch
+        seconds) plus one list per parameter/aggregate, null where undefined
+        """
+        bucket_seconds = parse_bucket_width(bucket)
+        parameters = _validate(parameters, PARAMETERS, 'parameters')
+        aggregates = _validate(aggregates, AGGREGATES, 'aggregates')
+        end = end or datetime.now()
+        start = start or end - timedelta(days=1)
+        if start >= end:
+            raise AggregationError("start must be before end")
+        if (end - start).total_seconds() / bucket_seconds > MAX_BUCKETS:
+            raise AggregationError(f"Range covers more than {MAX_BUCKETS} buckets; use a wider bucket")
+
+        start_sql, end_sql = _sql_timestamp(start), _sql_timestamp(end)
+        frames = [
+            self._cold_partials(path, bucket_seconds, parameters, aggregates, start, end)
+            for path in self.store._archive_files(start_sql, end_sql)
+        ]
+        frames.append(self._hot_partials(
+            build_aggregate_sql(bucket_seconds, parameters, aggregates), start_sql, end_sql
+        ))
+        partials = pd.concat(frames)
+        if len(frames) > 1:
+            # A bucket may straddle the tier boundary (or two archive parts)
+            merge = {column: _MERGE[column.split('__')[1]] for column in partials.columns}
+            partials = partials.groupby(level=0).agg(merge)
+
+        columns = {}
+        for param in parameters:
+            for agg in aggregates:
+                columns[f"{param}_{agg}"] = self._finalise(partials, param, agg)
+
+        buckets = partials.index.to_numpy(dtype=np.int64)
+        return {
+            'bucket_seconds': bucket_seconds,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'bucket': buckets.tolist(),
+            'columns': {
+                name: (values.astype(np.int64).tolist() if name.endswith('_count')
+                       else [None if np.isnan(v) else v for v in np.round(values, DECIMALS).tolist()])
+                for name, values in columns.items()
+            }
+        }
+
+    @staticmethod
+    def _finalise(partials: pd.DataFrame, param: str, agg: str) -> np.ndarray:
+        def col(partial):
+            return partials[f"{param}__{partial}"].to_numpy(dtype=np.float64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if agg in ('min', 'max', 'count'):
+                return col(agg)
+            count, total = col('count'), col('sum')
+            mean = total / count
+            if agg == 'avg':
+                return mean
+            # Sample variance from the partial sums; clip rounding below zero
+            variance = (col('sumsq') - total * mean) / (count - 1)
+            return np.sqrt(np.clip(variance, 0, None))
@@ -0,0 +1,295 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import urllib.request
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+from config.production import ProductionConfig
+from models.sensor_frame import PARAMETERS, SensorFrame
+from monitoring.metrics import MetricsCollector
+
+logger = logging.getLogger(__name__)
+
+class AlertError(Exception):
+    """Custom exception for alert evaluation and dispatch errors"""
+    pass
+
+@dataclass(frozen=True)
+class AlertRule:
+    """Raise above (high) or below (low) threshold; clear once back past the clear level"""
+    name: str
+    parameter: str
+    direction: str  # 'high' or 'low'
+    threshold: float
+    clear: float
+
+@dataclass
+class Alert:
+    sensor_id: str
+    rule: str
+    parameter: str
+    state: str  # 'raised' or 'cleared'
+    value: float
+    threshold: float
+    timestamp: str
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+def rules_from_thresholds(thresholds: Optional[Dict[str, float]] = None,
+                          hysteresis: float = ProductionConfig.ALERT_HYSTERESIS) -> List[AlertRule]:
+    """One rule per <parameter>_<high|low> entry of get_alert_thresholds()"""
+    rules = []
+    for name, threshold in (thresholds or ProductionConfig.get_alert_thresholds()).items():
+        parameter, _, direction = name.rpartition('_')
+        if parameter not in PARAMETERS or direction not in ('high', 'low'):
+            raise AlertError(f"Alert threshold {name!r} is not <parameter>_<high|low>")
+        band = abs(threshold) * hysteresis
+        clear = threshold - band if direction == 'high' else threshold + band
+        rules.append(AlertRule(name, parameter, direction, float(threshold), clear))
+    return rules
+
+def _run_lengths(mask: np.ndarray, carry: np.ndarray) -> np.ndarray:
+    """Length of the run of True ending at each column, per row; runs at the start continue `carry`"""
+    index = np.arange(mask.shape[1])
+    last_false = np.maximum.accumulate(np.where(mask, -1, index), axis=1)
+    return index - last_false + np.where(last_false < 0, carry[:, None], 0)
+
+def _hold_last(events: np.ndarray, initial: np.ndarray) -> np.ndarray:
+    """Active state per column: the latest nonzero event so far (1 raise, -1 clear), else `initial`"""
+    index = np.arange(events.shape[1])
+    last = np.maximum.accumulate(np.where(events != 0, index, -1), axis=1)
+    latest = np.take_along_axis(events, np.maximum(last, 0), axis=1) > 0
+    return np.where(last < 0, initial[:, None], latest)
+
+class _SensorState:
+    """Per-rule hysteresis state of one sensor, carried from batch to batch"""
+
+    def __init__(self, n_rules: int):
+        self.active = np.zeros(n_rules, dtype=bool)
+        self.beyond_run = np.zeros(n_rules, dtype=np.int64)
+        self.clear_run = np.zeros(n_rules, dtype=np.int64)
+
+class FileAlertSink:
+    """Appends each batch to a JSON-lines file"""
+    name = 'file'
+
+    def __init__(self, path: str = ProductionConfig.ALERT_FILE_PATH):
+        self.path = path
+
+    def send(self, alerts: List[Dict]) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(orjson.dumps(alert) + b'\n' for alert in alerts))
+
+class WebhookAlertSink:
+    """POSTs each batch as {"alerts": [...]}; any non-2xx response is a failure"""
+    name = 'webhook'
+
+    def __init__(self, url: str = ProductionConfig.ALERT_WEBHOOK_URL, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts: List[Dict]) -> None:
+        request = urllib.request.Request(self.url, data=orjson.dumps({'alerts': alerts}), method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise AlertError(f"Webhook returned {response.status}")
+
+def default_sinks() -> list:
+    sinks = [FileAlertSink()]
+    if ProductionConfig.ALERT_WEBHOOK_URL:
+        sinks.append(WebhookAlertSink())
+    return sinks
+
+_STOP = object()
+
+class AlertDispatcher:
+    """
+    Delivers alerts to the sinks in batches from a background thread
+    submit() only enqueues, so ingest never waits on a sink. The thread sends
+    once batch_size alerts are queued or the oldest has waited flush_seconds,
+    and retries a failing sink with exponential backoff before giving up on
+    that batch. When the queue is full new alerts are dropped and counted.
+    """
+
+    def __init__(self, sinks: Optional[Sequence] = None,
+                 batch_size: int = ProductionConfig.ALERT_BATCH_SIZE,
+                 flush_seconds: float = ProductionConfig.ALERT_FLUSH_SECONDS,
+                 queue_size: int = ProductionConfig.ALERT_QUEUE_SIZE,
+                 max_retries: int = ProductionConfig.ALERT_MAX_RETRIES,
+                 retry_backoff: float = ProductionConfig.ALERT_RETRY_BACKOFF):
+        self.sinks = list(default_sinks() if sinks is None else sinks)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        atexit.register(self.close)
+
+    def _ensure_thread(self) -> queue.Queue:
+        # A forked worker inherits neither the thread nor a usable queue
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            with self._lock:
+                if self._pid != os.getpid() or not self._thread.is_alive():
+                    self._queue = queue.Queue(maxsize=self.queue_size)
+                    self._thread = threading.Thread(target=self._run, args=(self._queue,),
+                                                    name='alert-dispatcher', daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def submit(self, alerts: List[Alert]) -> None:
+        alert_queue = self._ensure_thread()
+        for i, alert in enumerate(alerts):
+            try:
+                alert_queue.put_nowait(alert.as_dict())
+            except queue.Full:
+                for sink in self.sinks:
+                    MetricsCollector.record_alert_dispatch(sink.name, 'dropped', len(alerts) - i)
+                logger.error(f"Alert queue full, dropped {len(alerts) - i} alerts")
+                return
+
+    def _collect(self, alert_queue: queue.Queue) -> Tuple[List[Dict], bool]:
+        """Block for the first alert, then take more until the batch is full or its wait is up"""
+        first = alert_queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = alert_queue.get(timeout=remaining) if remaining > 0 else alert_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _deliver(self, sink, batch: List[Dict]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                sink.send(batch)
+                MetricsCollector.record_alert_dispatch(sink.name, 'delivered', len(batch))
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    MetricsCollector.record_alert_dispatch(sink.name, 'failed', len(batch))
+                    logger.error(f"Giving up on {len(batch)} alerts for {sink.name} sink: {str(e)}")
+                    return
+                MetricsCollector.record_alert_dispatch(sink.name, 'retried', len(batch))
+                logger.warning(f"Alert delivery to {sink.name} sink failed, retrying: {str(e)}")
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _run(self, alert_queue: queue.Queue) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect(alert_queue)
+            for sink in self.sinks:
+                if batch:
+                    self._deliver(sink, batch)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Deliver what is queued and stop the thread"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("Alert queue full at shutdown, undelivered alerts are lost")
+            return
+        self._thread.join(timeout)
+
+class AlertEngine:
+    """
+    Evaluates ingested readings against the alert thresholds, per sensor
+    Each batch is checked for all rules at once: a rule raises after
+    raise_readings consecutive readings past its threshold and clears after
+    clear_readings consecutive readings back inside its clear level (the
+    threshold moved ALERT_HYSTERESIS inwards); readings in between keep the
+    current state. Run lengths and states carry over between batches, so
+    only state changes become alerts, whatever the batch size. Readings are
+    taken in timestamp order within a batch and in arrival order across
+    batches.
+    """
+
+    def __init__(self, dispatcher: Optional[AlertDispatcher] = None,
+                 rules: Optional[Sequence[AlertRule]] = None,
+                 raise_readings: int = ProductionConfig.ALERT_RAISE_READINGS,
+                 clear_readings: int = ProductionConfig.ALERT_CLEAR_READINGS):
+        self.dispatcher = dispatcher or AlertDispatcher()
+        self.rules = list(rules or rules_from_thresholds())
+        self.raise_readings = raise_readings
+        self.clear_readings = clear_readings
+        self._parameter_index = np.array([PARAMETERS.index(rule.parameter) for rule in self.rules])
+        self._sign = np.array([1.0 if rule.direction == 'high' else -1.0 for rule in self.rules])[:, None]
+        self._threshold = np.array([rule.threshold for rule in self.rules])[:, None]
+        self._clear = np.array([rule.clear for rule in self.rules])[:, None]
+        self._states: Dict[str, _SensorState] = {}
+        self._lock = threading.Lock()
+
+    def evaluate(self, frame: SensorFrame) -> List[Alert]:
+        """Update the frame's sensor state and dispatch the alerts it raises or clears"""
+        if not len(frame) or not self.rules:
+            return []
+        sensor_id = frame.sensor_id or ProductionConfig.DEFAULT_SENSOR_ID
+        timestamps = frame.timestamps
+        if (np.diff(timestamps) < np.timedelta64(0)).any():
+            frame = frame.select(np.argsort(timestamps, kind='stable'))
+
+        values = frame.values[self._parameter_index].astype(float)
+        beyond = self._sign * (values - self._threshold) > 0
+        inside = self._sign * (values - self._clear) < 0  # NaN is neither: state holds
+
+        with self._lock:
+            state = self._states.get(sensor_id)
+            if state is None:
+                state = self._states[sensor_id] = _SensorState(len(self.rules))
+            beyond_run = _run_lengths(beyond, state.beyond_run)
+            clear_run = _run_lengths(inside, state.clear_run)
+            events = np.where(beyond_run >= self.raise_readings, 1,
+                              np.where(clear_run >= self.clear_readings, -1, 0))
+            active = _hold_last(events, state.active)
+            changed = active != np.concatenate([state.active[:, None], active[:, :-1]], axis=1)
+            state.active = active[:, -1].copy()
+            state.beyond_run = beyond_run[:, -1].copy()
+            state.clear_run = clear_run[:, -1].copy()
+
+        if not changed.any():
+            return []
+        rule_rows, readings = np.nonzero(changed)
+        timestamps = frame.timestamp_strings()
+        alerts = [
+            Alert(sensor_id, self.rules[r].name, self.rules[r].parameter,
+                  'raised' if active[r, i] else 'cleared', float(values[r, i]),
+                  self.rules[r].threshold, str(timestamps[i]))
+            for r, i in zip(rule_rows.tolist(), readings.tolist())
+        ]
+        alerts.sort(key=lambda alert: alert.timestamp)
+        MetricsCollector.record_alerts(Counter((alert.rule, alert.state) for alert in alerts))
+        self.dispatcher.submit(alerts)
+        return alerts
+
+    def active_alerts(self) -> List[Dict[str, str]]:
+        """Rules currently raised, per sensor"""
+        with self._lock:
+            return [{'sensor_id': sensor_id, 'rule': self.rules[r].name}
+                    for sensor_id, state in self._states.items() for r in np.flatnonzero(state.active)]
+
+    def close(self) -> None:
+        self.dispatcher.close()
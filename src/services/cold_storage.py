@@ -0,0 +1,208 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+SENSOR_COLUMNS = ['timestamp', 'temperature', 'ph', 'turbidity', 'dissolved_oxygen', 'conductivity']
+
+class ColdStorageError(Exception):
+    """Custom exception for archive tier errors"""
+    pass
+
+def _sql_timestamp(value: datetime) -> str:
+    """Format a datetime the way readings are stored in SQLite"""
+    return value.isoformat(sep=' ')
+
+def _parse_timestamps(values: pd.Series) -> pd.Series:
+    """Parse stored timestamps, which may or may not carry fractional seconds"""
+    return pd.to_datetime(values, format='ISO8601')
+
+class TieredSensorStore:
+    """
+    Two-tier storage for sensor readings
+    Recent readings stay in SQLite; whole days past the retention period are
+    moved into compressed Parquet files partitioned by date. A manifest table
+    records each file's time range so range queries only open matching files.
+    """
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None,
+                 archive_dir: str = None, compression: str = 'zstd'):
+        self.db_manager = db_manager or DatabaseManager()
+        self.archive_dir = archive_dir or os.getenv('ARCHIVE_PATH', 'data/archive')
+        self.compression = compression
+        self._init_manifest()
+
+    def _init_manifest(self) -> None:
+        """Create the archive manifest table"""
+        try:
+            self.db_manager.execute_write('''
+                CREATE TABLE IF NOT EXISTS sensor_archive_manifest (
+                    path TEXT PRIMARY KEY,
+                    min_timestamp DATETIME NOT NULL,
+                    max_timestamp DATETIME NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    archived_at DATETIME NOT NULL
+                )
+            ''')
+            self.db_manager.execute_write('''
+                CREATE INDEX IF NOT EXISTS idx_archive_manifest_range
+                ON sensor_archive_manifest (min_timestamp, max_timestamp)
+            ''')
+        except Exception as e:
+            logger.error(f"Failed to initialize archive manifest: {str(e)}")
+            raise ColdStorageError(f"Archive manifest initialization failed: {str(e)}")
+
+    def _partition_path(self, day: datetime, archived_at: datetime) -> str:
+        """One file per archive run and day; late rows for a day get their own part"""
+        return os.path.join(
+            self.archive_dir,
+            f"year={day:%Y}", f"month={day:%m}", f"day={day:%d}",
+            f"sensor_data_{archived_at:%Y%m%dT%H%M%S%f}.parquet"
+        )
+
+    def _write_parquet(self, df: pd.DataFrame, path: str) -> None:
+        """Write atomically so a crash never leaves a half-written file behind"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = df.assign(timestamp=_parse_timestamps(df['timestamp']))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, compression=self.compression)
+        os.replace(tmp_path, path)
+
+    def archive_closed_partitions(self, retention_days: int = 30) -> int:
+        """
+        Move every whole day older than the retention period to Parquet
+        Returns the number of readings archived
+        """
+        cutoff = (datetime.now() - timedelta(days=retention_days)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        try:
+            days = self.db_manager.execute_query(
+                "SELECT DISTINCT date(timestamp) FROM sensor_data WHERE timestamp < ? ORDER BY 1",
+                (_sql_timestamp(cutoff),)
+            )
+            archived = 0
+            for (day_str,) in days:
+                archived += self._archive_day(datetime.strptime(day_str, '%Y-%m-%d'))
+            logger.info(f"Archived {archived} readings older than {cutoff:%Y-%m-%d}")
+            return archived
+        except Exception as e:
+            logger.error(f"Failed to archive old data: {str(e)}")
+            raise ColdStorageError(f"Archival failed: {str(e)}")
+
+    def _archive_day(self, day: datetime) -> int:
+        start, end = _sql_timestamp(day), _sql_timestamp(day + timedelta(days=1))
+        archived_at = datetime.now()
+
+        with self.db_manager.get_connection() as conn:
+            # Hold the write lock so no row can land between the read and the delete
+            conn.execute("BEGIN IMMEDIATE")
+            df = self.db_manager.read_frame(
+                "SELECT * FROM sensor_data WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+                (start, end), conn
+            )
+            if df.empty:
+                return 0
+
+            path = self._partition_path(day, archived_at)
+            self._write_parquet(df, path)
+
+            # Manifest entry and hot-tier delete commit together
+            conn.execute(
+                '''INSERT INTO sensor_archive_manifest
+                   (path, min_timestamp, max_timestamp, row_count, archived_at)
+                   VALUES (?, ?, ?, ?, ?)''',
+                (path, df['timestamp'].iloc[0], df['timestamp'].iloc[-1],
+                 len(df), _sql_timestamp(archived_at))
+            )
+            conn.execute(
+                "DELETE FROM sensor_data WHERE timestamp >= ? AND timestamp <= ?",
+                (start, df['timestamp'].iloc[-1])
+            )
+        return len(df)
+
+    def _archive_files(self, start: str, end: str) -> List[str]:
+        """Archive files whose time range overlaps [start, end)"""
+        rows = self.db_manager.execute_query(
+            '''SELECT path FROM sensor_archive_manifest
+               WHERE max_timestamp >= ? AND min_timestamp < ?
+               ORDER BY min_timestamp''',
+            (start, end)
+        )
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _columns(columns: Optional[Sequence[str]]) -> List[str]:
+        columns = list(columns) if columns else SENSOR_COLUMNS[1:]
+        invalid = [c for c in columns if c not in SENSOR_COLUMNS]
+        if invalid:
+            raise ColdStorageError(f"Unknown columns: {invalid}")
+        return ['timestamp'] + [c for c in columns if c != 'timestamp']
+
+    def iter_chunks(self, start: datetime, end: Optional[datetime] = None,
+                    columns: Optional[Sequence[str]] = None,
+                    chunk_size: int = 50_000) -> Iterator[pd.DataFrame]:
+        """
+        Stream readings in [start, end) from both tiers in time order
+        Archived files come first (pruned by manifest range and row-group
+        statistics), then the hot SQLite rows
+        """
+        columns = self._columns(columns)
+        end = end or datetime.now() + timedelta(days=1)
+        start_sql, end_sql = _sql_timestamp(start), _sql_timestamp(end)
+        filters = [('timestamp', '>=', pd.Timestamp(start)), ('timestamp', '<', pd.Timestamp(end))]
+
+        for path in self._archive_files(start_sql, end_sql):
+            table = pq.read_table(path, columns=columns, filters=filters)
+            for batch in table.to_batches(max_chunksize=chunk_size):
+                yield batch.to_pandas()
+
+        query = f'''
+            SELECT {", ".join(columns)} FROM sensor_data
+            WHERE timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp
+        '''
+        for chunk in self.db_manager.iter_frames(query, (start_sql, end_sql), chunk_size):
+            chunk['timestamp'] = _parse_timestamps(chunk['timestamp'])
+            yield chunk
+
+    def count(self, start: datetime, end: Optional[datetime] = None) -> int:
+        """
+        Readings in [start, end) across both tiers
+        Archive files inside the range are counted from the manifest; only
+        files straddling a bound are opened, and only their timestamp column
+        """
+        end = end or datetime.now() + timedelta(days=1)
+        start_sql, end_sql = _sql_timestamp(start), _sql_timestamp(end)
+        total = self.db_manager.execute_query(
+            "SELECT COUNT(*) FROM sensor_data WHERE timestamp >= ? AND timestamp < ?", (start_sql, end_sql)
+        )[0][0]
+        files = self.db_manager.execute_query(
+            '''SELECT path, min_timestamp, max_timestamp, row_count FROM sensor_archive_manifest
+               WHERE max_timestamp >= ? AND min_timestamp < ?''',
+            (start_sql, end_sql)
+        )
+        filters = [('timestamp', '>=', pd.Timestamp(start)), ('timestamp', '<', pd.Timestamp(end))]
+        for path, min_timestamp, max_timestamp, row_count in files:
+            if min_timestamp >= start_sql and max_timestamp < end_sql:
+                total += row_count
+            else:
+                total += pq.read_table(path, columns=['timestamp'], filters=filters).num_rows
+        return total
+
+    def query(self, start: datetime, end: Optional[datetime] = None,
+              columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Readings in [start, end) across the hot and archive tiers"""
+        chunks = list(self.iter_chunks(start, end, columns))
+        if not chunks:
+            return pd.DataFrame(columns=self._columns(columns))
+        return pd.concat(chunks, ignore_index=True)
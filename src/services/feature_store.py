@@ -0,0 +1,225 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.production import ProductionConfig
+from models.sensor_frame import PARAMETERS, SensorFrame
+from utils.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {'1h': 1, '6h': 6, '24h': 24}  # name -> hours
+STATISTICS = ('mean', 'max', 'hours_out')
+WINDOW_FEATURES = [f"{parameter}_{statistic}_{window}"
+                   for window in WINDOWS for parameter in PARAMETERS for statistic in STATISTICS]
+HISTORY = timedelta(hours=max(WINDOWS.values()))
+
+class FeatureStoreError(Exception):
+    """Custom exception for feature store errors"""
+    pass
+
+def _sql_timestamp(value) -> str:
+    """
+    value in the 'YYYY-MM-DD HH:MM:SS.ffffff' form SensorFrame stores, so string
+    bounds compare correctly against whole-second readings too
+    """
+    return np.datetime_as_string(np.datetime64(value, 'us'), unit='us').replace('T', ' ')
+
+def _window_max(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    max(values[:, s:e + 1]) for every (s, e) pair, from a sparse table
+    Level k holds the max of 2**k consecutive readings, so every window is
+    the max of two overlapping power-of-two blocks
+    """
+    levels = [values]
+    longest = int((ends - starts).max()) + 1
+    while 2 ** len(levels) <= longest:
+        previous, half = levels[-1], 2 ** (len(levels) - 1)
+        levels.append(np.maximum(previous[:, :-half], previous[:, half:]))
+    k = np.floor(np.log2(ends - starts + 1)).astype(int)
+    result = np.empty((values.shape[0], len(starts)))
+    for level in np.unique(k):
+        rows = np.flatnonzero(k == level)
+        table = levels[level]
+        result[:, rows] = np.maximum(table[:, starts[rows]], table[:, ends[rows] - 2 ** level + 1])
+    return result
+
+def compute_window_features(frame: SensorFrame, first: int = 0) -> np.ndarray:
+    """
+    (len(frame) - first, len(WINDOW_FEATURES)) features for readings first..end
+    Earlier readings of the frame serve as window history. Each window is
+    (t - w, t]; hours_out holds each out-of-range reading's value until the next one.
+    """
+    seconds = (frame.timestamps - frame.timestamps[0]) / np.timedelta64(1, 's')
+    values = frame.values.astype(float)
+    rows = np.arange(first, len(frame))
+
+    thresholds = ProductionConfig.get_risk_thresholds()
+    out = np.zeros(values.shape, dtype=bool)
+    for i, parameter in enumerate(PARAMETERS):
+        low, high = thresholds[parameter]
+        if low is not None:
+            out[i] |= values[i] < low
+        if high is not None:
+            out[i] |= values[i] > high
+    held = out * np.append(np.diff(seconds), 0.0)
+
+    value_sums = np.concatenate([np.zeros((len(PARAMETERS), 1)), np.cumsum(values, axis=1)], axis=1)
+    held_sums = np.concatenate([np.zeros((len(PARAMETERS), 1)), np.cumsum(held, axis=1)], axis=1)
+
+    blocks = []
+    for hours in WINDOWS.values():
+        starts = np.searchsorted(seconds, seconds[rows] - hours * 3600, side='right')
+        means = (value_sums[:, rows + 1] - value_sums[:, starts]) / (rows - starts + 1)
+        maxima = _window_max(values, starts, rows)
+        hours_out = (held_sums[:, rows] - held_sums[:, starts]) / 3600
+        # parameter-major, then statistic, to match WINDOW_FEATURES
+        blocks.append(np.stack([means, maxima, hours_out], axis=1).reshape(-1, len(rows)))
+    return np.concatenate(blocks).T
+
+class FeatureStore:
+    """
+    Rolling-window features per reading, kept in sensor_features next to sensor_data
+    Features are computed once, when readings are ingested, from the new
+    readings and the 24 hours before them. Readings that land in the past
+    also refresh the features of the stored readings they fall inside the
+    windows of. Training joins the table instead of scanning windows, and
+    serving reads the latest row, so both see the same values. A database
+    holds one sensor's readings (sensor_data is keyed by timestamp alone),
+    so the windows are per sensor and the table is keyed the same way.
+    """
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None):
+        self.db_manager = db_manager or DatabaseManager()
+        self._init_table()
+
+    def _init_table(self) -> None:
+        columns = ",\n".join(f"{name} FLOAT NOT NULL" for name in WINDOW_FEATURES)
+        try:
+            self.db_manager.execute_write(f'''
+                CREATE TABLE IF NOT EXISTS sensor_features (
+                    timestamp DATETIME PRIMARY KEY,
+                    {columns}
+                )
+            ''')
+        except Exception as e:
+            logger.error(f"Failed to initialize feature table: {str(e)}")
+            raise FeatureStoreError(f"Feature table initialization failed: {str(e)}")
+
+    def _readings(self, start, end) -> SensorFrame:
+        """Stored readings in [start, end]"""
+        rows = self.db_manager.execute_query(
+            f'''SELECT timestamp, {", ".join(PARAMETERS)} FROM sensor_data
+                WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp''',
+            (_sql_timestamp(start), _sql_timestamp(end))
+        )
+        return SensorFrame.from_rows([tuple(row) for row in rows])
+
+    def _write(self, frame: SensorFrame, features: np.ndarray) -> None:
+        placeholders = ", ".join("?" * (len(WINDOW_FEATURES) + 1))
+        self.db_manager.execute_many(
+            f'''INSERT OR REPLACE INTO sensor_features (timestamp, {", ".join(WINDOW_FEATURES)})
+                VALUES ({placeholders})''',
+            zip(frame.timestamp_strings().tolist(), *features.T.tolist())
+        )
+
+    def update(self, frame: SensorFrame) -> int:
+        """
+        Materialize features for newly stored readings (and any later ones they affect)
+        Call after the readings are in sensor_data; returns the rows written
+        """
+        if not len(frame):
+            return 0
+        try:
+            first, last = frame.timestamps.min(), frame.timestamps.max()
+            stored = self._readings(first - HISTORY, last + HISTORY)
+            start = int(np.searchsorted(stored.timestamps, first))
+            if start == len(stored):
+                return 0
+            features = compute_window_features(stored, start)
+            self._write(stored.select(slice(start, None)), features)
+            return len(stored) - start
+        except Exception as e:
+            logger.error(f"Failed to update window features: {str(e)}")
+            raise FeatureStoreError(f"Feature update failed: {str(e)}")
+
+    def backfill(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 chunk_rows: int = 100_000) -> int:
+        """(Re)compute features for stored readings in [start, end], chunk_rows readings at a time"""
+        cursor = _sql_timestamp(start or datetime.min)
+        end = _sql_timestamp(end or datetime.max)
+        written = 0
+        while True:
+            bounds = self.db_manager.execute_query(
+                '''SELECT MIN(timestamp), MAX(timestamp) FROM (
+                       SELECT timestamp FROM sensor_data WHERE timestamp >= ? AND timestamp <= ?
+                       ORDER BY timestamp LIMIT ?)''',
+                (cursor, end, chunk_rows)
+            )[0]
+            if bounds[0] is None:
+                break
+            first, last = np.datetime64(pd.Timestamp(bounds[0]), 'us'), np.datetime64(pd.Timestamp(bounds[1]), 'us')
+            stored = self._readings(first - HISTORY, last)
+            offset = int(np.searchsorted(stored.timestamps, first))
+            self._write(stored.select(slice(offset, None)), compute_window_features(stored, offset))
+            written += len(stored) - offset
+            cursor = _sql_timestamp(last + np.timedelta64(1, 'us'))
+        logger.info(f"Backfilled window features for {written} readings")
+        return written
+
+    def latest(self, at: Optional[datetime] = None,
+               max_age: Optional[timedelta] = None) -> Optional[Dict[str, float]]:
+        """
+        Features of the most recent reading at or before `at` (default: now)
+        None when there is none, or when it is older than max_age before `at`
+        """
+        at = at or datetime.now()
+        oldest = _sql_timestamp(at - max_age if max_age is not None else datetime.min)
+        rows = self.db_manager.execute_query(
+            f'''SELECT {", ".join(WINDOW_FEATURES)} FROM sensor_features
+                WHERE timestamp <= ? AND timestamp >= ? ORDER BY timestamp DESC LIMIT 1''',
+            (_sql_timestamp(at), oldest)
+        )
+        return dict(zip(WINDOW_FEATURES, rows[0])) if rows else None
+
+    def attach(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Readings (with a 'timestamp' column) joined with their stored window features
+        Readings without materialized features get NaN; the index is kept
+        """
+        times = pd.to_datetime(df['timestamp'], format='ISO8601')
+        features = pd.DataFrame(columns=['timestamp', *WINDOW_FEATURES])
+        if len(df):
+            features = self.db_manager.read_frame(
+                f'''SELECT timestamp, {", ".join(WINDOW_FEATURES)} FROM sensor_features
+                    WHERE timestamp >= ? AND timestamp <= ?''',
+                (_sql_timestamp(times.min()), _sql_timestamp(times.max()))
+            )
+        features.index = pd.to_datetime(features.pop('timestamp'), format='ISO8601')
+        joined = features.reindex(times).astype(float)
+        joined.index = df.index
+        return pd.concat([df.drop(columns=WINDOW_FEATURES, errors='ignore'), joined], axis=1)
+
+    def count_training_rows(self, start: datetime, end: datetime) -> int:
+        """Readings in [start, end) that have stored features"""
+        return self.db_manager.execute_query(
+            '''SELECT COUNT(*) FROM sensor_data d JOIN sensor_features f ON f.timestamp = d.timestamp
+               WHERE d.timestamp >= ? AND d.timestamp < ?''',
+            (_sql_timestamp(start), _sql_timestamp(end))
+        )[0][0]
+
+    def iter_training_chunks(self, start: datetime, end: datetime,
+                             chunk_size: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Readings joined with their stored features in [start, end), oldest first"""
+        query = f'''
+            SELECT d.timestamp, {", ".join(f"d.{p}" for p in PARAMETERS)}, {", ".join(WINDOW_FEATURES)}
+            FROM sensor_data d JOIN sensor_features f ON f.timestamp = d.timestamp
+            WHERE d.timestamp >= ? AND d.timestamp < ?
+            ORDER BY d.timestamp
+        '''
+        for chunk in self.db_manager.iter_frames(query, (_sql_timestamp(start), _sql_timestamp(end)), chunk_size):
+            chunk['timestamp'] = pd.to_datetime(chunk['timestamp'], format='ISO8601')
+            yield chunk
@@ -0,0 +1,124 @@
+import time
+import asyncio
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.production import ProductionConfig
+from monitoring.metrics import MetricsCollector
+from risk_prediction import WaterRiskPredictor
+
+logger = logging.getLogger(__name__)
+
+class InferenceError(Exception):
+    """Custom exception for model inference errors"""
+    pass
+
+class BatchingRiskModel:
+    """
+    Micro-batches concurrent predictions for the trained risk model
+    Callers await predict_proba(); requests that arrive within max_wait_ms of
+    the first queued one (or until max_batch_size rows are queued) are scored
+    by one predict_proba call on the executor, and each caller gets back its
+    own rows. The event loop never runs the model, and the next batch fills
+    while the current one is being scored.
+    """
+
+    def __init__(self, predictor: Optional[WaterRiskPredictor] = None,
+                 max_batch_size: int = ProductionConfig.INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms: float = ProductionConfig.INFERENCE_MAX_WAIT_MS,
+                 executor: Optional[Executor] = None):
+        self.predictor = predictor or WaterRiskPredictor()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run(self._queue))
+        return self._queue
+
+    async def predict_proba(self, rows: np.ndarray) -> np.ndarray:
+        """Class probabilities for a (n, len(feature_names)) array of readings"""
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        expected = len(self.predictor.feature_names)
+        if rows.shape[1] != expected:
+            raise InferenceError(f"Expected {expected} features per reading, got {rows.shape[1]}")
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker().put_nowait((rows, future, time.perf_counter()))
+        return await future
+
+    async def predict(self, reading: Dict[str, float]) -> Tuple[int, float]:
+        """
+        Predicted risk label and probability of the high-risk class for one reading
+        Models trained with window features need them in `reading` as well
+        """
+        missing = [f for f in self.predictor.feature_names if f not in reading]
+        if missing:
+            raise InferenceError(f"Missing model features: {missing[:5]}")
+        probabilities = (await self.predict_proba([[reading[f] for f in self.predictor.feature_names]]))[0]
+        classes = self.predictor.model.classes_
+        high_risk = float(probabilities[list(classes).index(1)]) if 1 in classes else 0.0
+        return int(classes[np.argmax(probabilities)]), high_risk
+
+    def _score(self, rows: np.ndarray) -> np.ndarray:
+        if self.predictor.model is None:
+            try:
+                self.predictor.load_model()
+            except (OSError, ValueError) as e:
+                raise InferenceError(f"No trained model found. Please train the model first: {e}")
+        scaled = self.predictor.scaler.transform(pd.DataFrame(rows, columns=self.predictor.feature_names))
+        return self.predictor.model.predict_proba(scaled)
+
+    async def _collect(self, queue: asyncio.Queue) -> List[tuple]:
+        """Block for the first request, then take more until the batch is full or its wait is up"""
+        batch = [await queue.get()]
+        rows = len(batch[0][0])
+        deadline = batch[0][2] + self.max_wait
+        while rows < self.max_batch_size:
+            if queue.empty():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = queue.get_nowait()
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(queue)
+            started = time.perf_counter()
+            rows = np.concatenate([item[0] for item in batch])
+            MetricsCollector.observe_inference_batch(len(rows), [started - item[2] for item in batch])
+            try:
+                probabilities = await loop.run_in_executor(self.executor, self._score, rows)
+            except Exception as e:
+                logger.error(f"Batched inference of {len(rows)} readings failed: {str(e)}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e if isinstance(e, InferenceError) else InferenceError(str(e)))
+                continue
+
+            offset = 0
+            for item_rows, future, _ in batch:
+                if not future.done():  # the caller may have gone away
+                    future.set_result(probabilities[offset:offset + len(item_rows)])
+                offset += len(item_rows)
+
+    def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, Optional, Set
+
+from config.production import ProductionConfig
+from models.schemas import SensorData
+from monitoring.metrics import MetricsCollector
+
+logger = logging.getLogger(__name__)
+
+STREAM_PARAMETERS = ('temperature', 'ph', 'turbidity', 'dissolved_oxygen', 'conductivity')
+
+
+class StreamSubscription:
+    """Bounded event buffer for one subscriber with server-side topic filtering
+
+    When the buffer is full, a new reading replaces the pending reading for
+    the same sensor (coalescing); otherwise the oldest reading is dropped.
+    Subscribers that keep falling behind are closed.
+    """
+
+    def __init__(self, sensors: Optional[Iterable[str]] = None,
+                 parameters: Optional[Iterable[str]] = None,
+                 max_queue: int = ProductionConfig.STREAM_QUEUE_SIZE,
+                 max_drops: int = ProductionConfig.STREAM_MAX_DROPS):
+        self.sensors = set(sensors) if sensors else None
+        self.parameters = set(parameters) if parameters else None
+        if self.parameters and not self.parameters <= set(STREAM_PARAMETERS):
+            unknown = sorted(self.parameters - set(STREAM_PARAMETERS))
+            raise ValueError(f"Unknown stream parameters: {unknown}")
+
+        self.max_queue = max_queue
+        self.max_drops = max_drops
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+        self._lagging_drops = 0
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        """Check whether an event belongs to this subscriber's topics"""
+        return self.sensors is None or event.get('sensor_id') in self.sensors
+
+    def _project(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Restrict reading events to the subscribed parameters"""
+        if event['type'] != 'reading' or self.parameters is None:
+            return event
+        values = {k: v for k, v in event['values'].items() if k in self.parameters}
+        if not values:
+            return None
+        return {**event, 'values': values}
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        """Queue an event without ever blocking the producer"""
+        if self.closed or not self.matches(event):
+            return
+        event = self._project(event)
+        if event is None:
+            return
+
+        if len(self._events) >= self.max_queue:
+            if event['type'] == 'reading' and self._coalesce(event):
+                self.coalesced += 1
+                MetricsCollector.record_stream_drop('coalesced')
+                return
+            self._drop_oldest()
+            if self.closed:
+                return
+
+        self._events.append(event)
+        self._ready.set()
+
+    def _coalesce(self, event: Dict[str, Any]) -> bool:
+        """Replace the pending reading for the same sensor with a newer one"""
+        for index in range(len(self._events) - 1, -1, -1):
+            pending = self._events[index]
+            if pending['type'] == 'reading' and pending['sensor_id'] == event['sensor_id']:
+                self._events[index] = event
+                return True
+        return False
+
+    def _drop_oldest(self) -> None:
+        """Drop the oldest reading, or the oldest event if only risk events are queued"""
+        for index, pending in enumerate(self._events):
+            if pending['type'] == 'reading':
+                del self._events[index]
+                break
+        else:
+            self._events.popleft()
+
+        self.dropped += 1
+        self._lagging_drops += 1
+        MetricsCollector.record_stream_drop('dropped')
+        if self._lagging_drops > self.max_drops:
+            logger.warning(f"Disconnecting slow stream subscriber after {self.dropped} drops")
+            MetricsCollector.record_stream_drop('disconnected')
+            self.close()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for the next event; returns None on timeout or when closed"""
+        if not self._events and not self.closed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if not self._events:
+            return None
+        self._lagging_drops = 0
+        return self._events.popleft()
+
+    def close(self) -> None:
+        self.closed = True
+        self._events.clear()
+        self._ready.set()
+
+
+class LiveStreamHub:
+    """Fans out readings and risk-level changes from one shared producer
+
+    The producer task only runs while there is at least one subscriber, so
+    idle viewers cost nothing and N viewers cost the same as one.
+    """
+
+    def __init__(self, simulator, risk_predictor,
+                 interval_seconds: float = ProductionConfig.STREAM_INTERVAL_SECONDS,
+                 sensor_id: str = ProductionConfig.DEFAULT_SENSOR_ID):
+        self.simulator = simulator
+        self.risk_predictor = risk_predictor
+        self.interval_seconds = interval_seconds
+        self.sensor_id = sensor_id
+        self.latest: Optional[Dict[str, Any]] = None
+        self._last_risk_level: Optional[float] = None
+        self._subscribers: Set[StreamSubscription] = set()
+        self._producer: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, sensors: Optional[Iterable[str]] = None,
+                  parameters: Optional[Iterable[str]] = None) -> StreamSubscription:
+        """Register a subscriber and prime it with the latest reading"""
+        subscription = StreamSubscription(sensors=sensors, parameters=parameters)
+        self._subscribers.add(subscription)
+        MetricsCollector.update_stream_subscribers(len(self._subscribers))
+        if self.latest is not None:
+            subscription.offer(self.latest)
+        self._ensure_producer()
+        return subscription
+
+    def unsubscribe(self, subscription: StreamSubscription) -> None:
+        subscription.close()
+        self._subscribers.discard(subscription)
+        MetricsCollector.update_stream_subscribers(len(self._subscribers))
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Deliver an event to every matching subscriber"""
+        for subscription in list(self._subscribers):
+            if subscription.closed:
+                self.unsubscribe(subscription)
+                continue
+            subscription.offer(event)
+
+    def _ensure_producer(self) -> None:
+        if self._producer is None or self._producer.done():
+            self._producer = asyncio.get_running_loop().create_task(self._produce())
+
+    async def _produce(self) -> None:
+        """Generate one reading per interval and broadcast it while anyone listens"""
+        while self._subscribers:
+            try:
+                self._publish_reading(self.simulator.generate_reading())
+            except Exception as e:
+                logger.error(f"Live stream producer failed to publish reading: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def _publish_reading(self, reading: Dict[str, float]) -> None:
+        timestamp = datetime.now()
+        values = {k: float(reading[k]) for k in STREAM_PARAMETERS}
+        event = {
+            'type': 'reading',
+            'sensor_id': self.sensor_id,
+            'timestamp': timestamp.isoformat(),
+            'values': values
+        }
+        self.latest = event
+        self.publish(event)
+
+        assessment = self.risk_predictor.predict_risk(SensorData(timestamp=timestamp, **values))
+        if assessment.risk_level != self._last_risk_level:
+            self.publish({
+                'type': 'risk',
+                'sensor_id': self.sensor_id,
+                'timestamp': timestamp.isoformat(),
+                'risk_level': assessment.risk_level,
+                'previous_risk_level': self._last_risk_level,
+                'risk_factors': assessment.risk_factors
+            })
+            self._last_risk_level = assessment.risk_level
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Render an event as a Server-Sent Events frame"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,287 @@
+import os
+import re
+import time
+import uuid
+import hashlib
+import logging
+import textwrap
+import threading
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.production import ProductionConfig
+from models.sensor_frame import PARAMETERS, SensorFrame
+from utils.database import DatabaseManager
+from utils.downsampling import bucket_means
+
+logger = logging.getLogger(__name__)
+
+CHART_STYLE_VERSION = 1  # bump to invalidate cached charts when their look changes
+PAGE_SIZE = (8.27, 11.69)  # A4, inches
+LINES_PER_PAGE = 60
+LINE_WIDTH = 95
+UNITS = {'temperature': '°C', 'ph': 'pH', 'turbidity': 'NTU', 'dissolved_oxygen': 'mg/L', 'conductivity': 'µS/cm'}
+_REPORT_ID = re.compile(r'[0-9a-f]{32}')
+
+class PdfReportError(Exception):
+    """Custom exception for PDF report rendering errors"""
+    pass
+
+def _publish(figure_writer, path: str) -> None:
+    """Write to a temporary file and rename, so readers never see a partial file"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    figure_writer(tmp)
+    os.replace(tmp, path)
+
+def render_chart(path: str, title: str, timestamps: np.ndarray, values: np.ndarray) -> str:
+    """One panel per parameter with its safe range; runs in a worker process"""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(PAGE_SIZE[0], PAGE_SIZE[1] * 0.8))
+    axes = figure.subplots(len(PARAMETERS), 1, sharex=True)
+    thresholds = ProductionConfig.get_risk_thresholds()
+    for ax, parameter, series in zip(axes, PARAMETERS, values):
+        ax.plot(timestamps, series, linewidth=0.8)
+        for limit in thresholds[parameter]:
+            if limit is not None:
+                ax.axhline(limit, color='tab:red', linestyle='--', linewidth=0.8)
+        ax.set_ylabel(f"{parameter.replace('_', ' ')}\n({UNITS[parameter]})", fontsize=8)
+        ax.tick_params(labelsize=7)
+    figure.suptitle(title)
+    figure.autofmt_xdate()
+    _publish(lambda tmp: figure.savefig(tmp, format='png', dpi=110), path)
+    return path
+
+def render_pdf(path: str, title: str, text: str, chart_paths: Sequence[str]) -> str:
+    """Report text on the first pages, then one page per cached chart; runs in a worker process"""
+    from matplotlib import rc_context
+    from matplotlib.figure import Figure
+    from matplotlib.image import imread
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    lines = [line for paragraph in text.strip().splitlines()
+             for line in (textwrap.wrap(paragraph, LINE_WIDTH) or [''])]
+
+    def write(tmp: str) -> None:
+        # Built-in PDF fonts: no glyph layout or font embedding for the report text
+        with rc_context({'pdf.use14corefonts': True}), PdfPages(tmp, metadata={'Title': title}) as pdf:
+            for page, start in enumerate(range(0, max(len(lines), 1), LINES_PER_PAGE)):
+                figure = Figure(figsize=PAGE_SIZE)
+                if page == 0:
+                    figure.text(0.08, 0.95, title, fontsize=14, weight='bold')
+                figure.text(0.08, 0.92, "\n".join(lines[start:start + LINES_PER_PAGE]),
+                            fontsize=9, va='top', family='monospace', weight='medium')
+                pdf.savefig(figure)
+            for chart_path in chart_paths:
+                figure = Figure(figsize=PAGE_SIZE)
+                ax = figure.add_axes((0.03, 0.03, 0.94, 0.94))
+                # 8-bit RGB, embedded as is: no resampling and no alpha mask to encode
+                pixels = (imread(chart_path)[..., :3] * 255).round().astype(np.uint8)
+                ax.imshow(pixels, interpolation='none')
+                ax.axis('off')
+                pdf.savefig(figure)
+
+    _publish(write, path)
+    return path
+
+class PdfReportRenderer:
+    """
+    Renders reports to PDF in a process pool and serves them by report id
+    submit() returns at once: the readings of each chart window are fetched
+    and downsampled in the caller, and everything matplotlib does happens in
+    the worker processes. A chart is keyed by a hash of its sensor, window
+    and downsampled data, rendered once and reused by every report (in any
+    process) with the same content; concurrent reports wait for the same
+    render instead of repeating it. Finished PDFs are files named by report
+    id, and so are the pending and failed markers written next to them, so
+    any worker can report a render's state and serve the result.
+    """
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None, sensor_id: Optional[str] = None,
+                 output_dir: str = ProductionConfig.REPORT_PDF_DIR,
+                 chart_dir: str = ProductionConfig.REPORT_CHART_DIR,
+                 windows: Sequence[int] = ProductionConfig.REPORT_CHART_WINDOWS,
+                 chart_points: int = ProductionConfig.REPORT_CHART_POINTS,
+                 chart_cache_size: int = ProductionConfig.REPORT_CHART_CACHE_SIZE,
+                 executor: Optional[Executor] = None,
+                 pending_timeout: float = ProductionConfig.REPORT_PENDING_TIMEOUT):
+        self.db_manager = db_manager or DatabaseManager()
+        self.sensor_id = sensor_id or ProductionConfig.DEFAULT_SENSOR_ID
+        self.output_dir = output_dir
+        self.chart_dir = chart_dir
+        self.windows = tuple(windows)
+        self.chart_points = chart_points
+        self.chart_cache_size = chart_cache_size
+        self.pending_timeout = pending_timeout
+        self._executor = executor
+        self._own_executor = executor is None
+        self._lock = threading.Lock()
+        self._charts: Dict[str, Future] = {}        # chart key -> render in progress
+        self._jobs: Dict[str, Future] = {}          # report id -> render in progress
+        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(chart_dir, exist_ok=True)
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            # spawn: the API process runs threads, which fork would copy mid-flight
+            self._executor = ProcessPoolExecutor(ProductionConfig.REPORT_RENDER_WORKERS,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _load_window(self, hours: int) -> pd.DataFrame:
+        rows = self.db_manager.execute_query(
+            f'''SELECT timestamp, {", ".join(PARAMETERS)} FROM sensor_data
+                WHERE timestamp >= ? ORDER BY timestamp''',
+            ((datetime.now() - timedelta(hours=hours)).isoformat(sep=' '),)
+        )
+        return bucket_means(SensorFrame.from_rows([tuple(row) for row in rows]).to_dataframe(), self.chart_points)
+
+    def chart_key(self, hours: int, data: pd.DataFrame) -> str:
+        digest = hashlib.sha256(f"{CHART_STYLE_VERSION}|{self.sensor_id}|{hours}".encode())
+        digest.update(data.index.to_numpy(dtype='datetime64[ns]').tobytes())
+        digest.update(np.ascontiguousarray(data[list(PARAMETERS)].to_numpy(dtype=np.float64)).tobytes())
+        return digest.hexdigest()
+
+    def _chart(self, hours: int) -> Tuple[str, Optional[Future]]:
+        """Cached chart path, and the render still producing it (None when already on disk)"""
+        data = self._load_window(hours)
+        if data.empty:
+            raise PdfReportError(f"No readings in the last {hours} hours")
+        path = os.path.join(self.chart_dir, f"{self.chart_key(hours, data)}.png")
+        with self._lock:
+            pending = self._charts.get(path)
+            if pending is not None:
+                return path, pending
+            if os.path.exists(path):
+                os.utime(path)  # recently used charts survive pruning
+                return path, None
+            title = f"{self.sensor_id}: last {hours} hours"
+            future = self.executor.submit(render_chart, path, title, data.index.to_numpy(),
+                                          data[list(PARAMETERS)].to_numpy().T)
+            self._charts[path] = future
+        future.add_done_callback(lambda _: self._chart_done(path))
+        return path, future
+
+    def _chart_done(self, path: str) -> None:
+        with self._lock:
+            self._charts.pop(path, None)
+        self._prune_charts()
+
+    def _prune_charts(self) -> None:
+        """Remove the least recently used charts beyond chart_cache_size"""
+        charts = [entry for entry in os.scandir(self.chart_dir) if entry.name.endswith('.png')]
+        if len(charts) <= self.chart_cache_size:
+            return
+        charts.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in charts[:len(charts) - self.chart_cache_size]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def submit(self, text: str, title: Optional[str] = None) -> str:
+        """Queue a report for rendering and return its id"""
+        return self.render(text, title)[0]
+
+    def render(self, text: str, title: Optional[str] = None) -> Tuple[str, Future]:
+        """Queue a report for rendering; returns its id and a future of the PDF path"""
+        title = title or f"Water Quality Risk Report - {self.sensor_id} - {datetime.now():%Y-%m-%d %H:%M}"
+        charts = [self._chart(hours) for hours in self.windows]
+        report_id = uuid.uuid4().hex
+        path = os.path.join(self.output_dir, f"{report_id}.pdf")
+        result = Future()
+        self._write_marker(report_id, 'pending', str(os.getpid()))
+        with self._lock:
+            self._jobs[report_id] = result
+
+        waiting = [future for _, future in charts if future is not None]
+        countdown = [len(waiting)]
+
+        def render() -> None:
+            errors = [future.exception() for future in waiting if future.exception() is not None]
+            if errors:
+                self._finish(report_id, result, error=errors[0])
+                return
+            pdf = self.executor.submit(render_pdf, path, title, text, [chart for chart, _ in charts])
+            pdf.add_done_callback(lambda f: self._finish(report_id, result, error=f.exception()))
+
+        def chart_done(_: Future) -> None:
+            with self._lock:
+                countdown[0] -= 1
+                if countdown[0]:
+                    return
+            render()
+
+        for future in waiting:
+            future.add_done_callback(chart_done)
+        if not waiting:
+            render()
+        return report_id, result
+
+    def _marker(self, report_id: str, state: str) -> str:
+        return os.path.join(self.output_dir, f"{report_id}.{state}")
+
+    def _write_marker(self, report_id: str, state: str, text: str) -> None:
+        def write(tmp: str) -> None:
+            with open(tmp, 'w') as f:
+                f.write(text)
+        _publish(write, self._marker(report_id, state))
+
+    def _finish(self, report_id: str, result: Future, error: Optional[BaseException] = None) -> None:
+        try:
+            if error is not None:
+                # Written before the pending marker goes, so no reader sees the report as unknown
+                self._write_marker(report_id, 'failed', str(error))
+            os.remove(self._marker(report_id, 'pending'))
+        except OSError as e:
+            logger.error(f"Could not update the markers of PDF report {report_id}: {str(e)}")
+        with self._lock:
+            self._jobs.pop(report_id, None)
+        if error is not None:
+            logger.error(f"PDF report {report_id} failed: {str(error)}")
+            result.set_exception(PdfReportError(str(error)))
+        else:
+            result.set_result(self.pdf_path(report_id))
+
+    def pdf_path(self, report_id: str) -> Optional[str]:
+        if not _REPORT_ID.fullmatch(report_id):
+            return None
+        path = os.path.join(self.output_dir, f"{report_id}.pdf")
+        return path if os.path.exists(path) else None
+
+    def status(self, report_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        ('pending' | 'done' | 'failed', error) for a report id, or (None, None) if unknown
+        Read from the files in output_dir, so it answers for reports submitted
+        through any worker; a report pending longer than pending_timeout was
+        lost with its worker and counts as failed
+        """
+        if not _REPORT_ID.fullmatch(report_id):
+            return None, None
+        # The pending marker is removed only after the PDF or failed marker exists
+        try:
+            age = time.time() - os.path.getmtime(self._marker(report_id, 'pending'))
+        except FileNotFoundError:
+            age = None
+        if age is not None:
+            if age > self.pending_timeout and report_id not in self._jobs:
+                return 'failed', f"Rendering did not finish within {self.pending_timeout:.0f}s"
+            return 'pending', None
+        try:
+            with open(self._marker(report_id, 'failed')) as f:
+                return 'failed', f.read()
+        except FileNotFoundError:
+            pass
+        if self.pdf_path(report_id):
+            return 'done', None
+        return None, None
+
+    def close(self) -> None:
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
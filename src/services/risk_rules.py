@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+from config.production import ProductionConfig
+from models.sensor_frame import PARAMETERS, SensorFrame
+
+RISK_FACTOR_LABELS = {
+    'temperature': "High temperature",
+    'ph': "pH out of safe range",
+    'turbidity': "High turbidity",
+    'dissolved_oxygen': "Low dissolved oxygen",
+    'conductivity': "High conductivity"
+}
+
+BatchInput = Union[SensorFrame, pd.DataFrame, Mapping[str, Sequence[float]], np.ndarray]
+
+@dataclass(frozen=True)
+class RiskRule:
+    parameter: str
+    min_value: Optional[float]
+    max_value: Optional[float]
+    factor: str
+
+@dataclass
+class BatchAssessment:
+    factor_mask: np.ndarray   # (n_readings, n_rules) True where a rule fires
+    factor_counts: np.ndarray  # out-of-range parameters per reading
+    risk_levels: np.ndarray    # 0-100 per reading
+    high_risk: np.ndarray      # at least HIGH_RISK_MIN_FACTORS factors
+
+def rules_from_config(config=ProductionConfig) -> List[RiskRule]:
+    """One safe-range rule per parameter from the configured thresholds"""
+    return [
+        RiskRule(parameter, min_value, max_value, RISK_FACTOR_LABELS[parameter])
+        for parameter, (min_value, max_value) in config.get_risk_thresholds().items()
+    ]
+
+class RiskRuleEngine:
+    """
+    Threshold rules compiled once into bound arrays for batch evaluation
+    and into a flat tuple for the single-reading path
+    """
+
+    def __init__(self, rules: Optional[List[RiskRule]] = None,
+                 high_risk_min_factors: int = ProductionConfig.HIGH_RISK_MIN_FACTORS):
+        self.rules = tuple(rules if rules is not None else rules_from_config())
+        self.high_risk_min_factors = high_risk_min_factors
+        self.parameters = tuple(rule.parameter for rule in self.rules)
+        self.factors = tuple(rule.factor for rule in self.rules)
+
+        # Batch path: one column per rule, unbounded sides become +/-inf
+        self._lower = np.array([-np.inf if r.min_value is None else r.min_value for r in self.rules])
+        self._upper = np.array([np.inf if r.max_value is None else r.max_value for r in self.rules])
+
+        # Scalar path: plain floats, no numpy dispatch per reading
+        self._scalar_rules = tuple(
+            (r.parameter, float(self._lower[i]), float(self._upper[i]), r.factor)
+            for i, r in enumerate(self.rules)
+        )
+        self._level_per_factor = 100.0 / len(self.rules) if self.rules else 0.0
+
+    def assess(self, reading: Mapping[str, float]) -> Tuple[float, List[str]]:
+        """Risk level (0-100) and triggered factors for one reading"""
+        factors = [
+            factor for parameter, lower, upper, factor in self._scalar_rules
+            if reading[parameter] < lower or reading[parameter] > upper
+        ]
+        return len(factors) * self._level_per_factor, factors
+
+    def is_high_risk(self, reading: Mapping[str, float]) -> bool:
+        return len(self.assess(reading)[1]) >= self.high_risk_min_factors
+
+    def _as_matrix(self, data: BatchInput) -> np.ndarray:
+        """(n_readings, n_rules) float64 matrix in rule order"""
+        if isinstance(data, SensorFrame) and self.parameters == PARAMETERS:
+            return data.values.T  # view, no copy
+        if isinstance(data, np.ndarray):
+            return np.asarray(data, dtype=np.float64).reshape(-1, len(self.rules))
+        if isinstance(data, pd.DataFrame):
+            return data[list(self.parameters)].to_numpy(dtype=np.float64)
+        return np.column_stack([np.asarray(data[p], dtype=np.float64) for p in self.parameters])
+
+    def assess_batch(self, data: BatchInput) -> BatchAssessment:
+        """Evaluate every rule for every reading in one vectorized pass"""
+        values = self._as_matrix(data)
+        # NaN compares False on both sides, so a missing value never fires a rule
+        factor_mask = (values < self._lower) | (values > self._upper)
+        factor_counts = factor_mask.sum(axis=1)
+        return BatchAssessment(
+            factor_mask=factor_mask,
+            factor_counts=factor_counts,
+            risk_levels=factor_counts * self._level_per_factor,
+            high_risk=factor_counts >= self.high_risk_min_factors
+        )
+
+    def risk_labels(self, data: BatchInput) -> np.ndarray:
+        """Binary high-risk labels (int8) used to train the model"""
+        return self.assess_batch(data).high_risk.astype(np.int8)
+
+    def factor_lists(self, factor_mask: np.ndarray) -> List[List[str]]:
+        """Expand a factor mask into per-reading factor names"""
+        return [[self.factors[i] for i in np.flatnonzero(row)] for row in factor_mask]
+
+    def factor_totals(self, factor_mask: np.ndarray) -> Dict[str, int]:
+        """How many readings triggered each factor"""
+        return dict(zip(self.factors, factor_mask.sum(axis=0).tolist()))
+
+@lru_cache(maxsize=1)
+def get_rule_engine() -> RiskRuleEngine:
+    """Process-wide engine built from configuration on first use"""
+    return RiskRuleEngine()
@@ -1,11 +1,16 @@
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+from datetime import datetime
+from typing import Dict, Optional, Union
 import logging
-from models.schemas import SensorData
+from config.production import ProductionConfig
+from models.sensor_frame import SensorFrame
 from utils.database import DatabaseManager
-from utils.validators import DataValidator
+from utils.validators import DataValidator, ValidationResult
+from monitoring.metrics import MetricsCollector
+from services.cold_storage import TieredSensorStore
+from services.feature_store import FeatureStore
+from services.alerts import AlertEngine
 
 logger = logging.getLogger(__name__)
 
@@ -14,10 +19,16 @@ class SensorSimulationError(Exception):
     pass
 
 class WaterSensorSimulator:
-    def __init__(self, db_manager: Optional[DatabaseManager] = None):
+    def __init__(self, db_manager: Optional[DatabaseManager] = None,
+                 archive_store: Optional[TieredSensorStore] = None,
+                 feature_store: Optional[FeatureStore] = None,
+                 alert_engine: Optional[AlertEngine] = None):
         self.db_manager = db_manager or DatabaseManager()
         self.validator = DataValidator()
+        self.archive_store = archive_store
         self._init_db()
+        self.feature_store = feature_store  # window features are materialized at save time
+        self.alert_engine = alert_engine    # and saved readings checked against the alert thresholds
 
     def _init_db(self) -> None:
         """Initialize database table with proper error handling"""
@@ -38,6 +49,20 @@ class WaterSensorSimulator:
                 )
             '''
             self.db_manager.execute_write(query)
+            # Rejected readings, kept as received (no range checks) for inspection
+            self.db_manager.execute_write('''
+                CREATE TABLE IF NOT EXISTS sensor_data_quarantine (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME NOT NULL,
+                    temperature FLOAT,
+                    ph FLOAT,
+                    turbidity FLOAT,
+                    dissolved_oxygen FLOAT,
+                    conductivity FLOAT,
+                    invalid_parameters TEXT NOT NULL,
+                    quarantined_at DATETIME NOT NULL
+                )
+            ''')
             logger.info("Sensor data table initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize database: {str(e)}")
@@ -65,81 +90,127 @@ class WaterSensorSimulator:
             logger.error(f"Error generating sensor reading: {str(e)}")
             raise SensorSimulationError(f"Failed to generate sensor reading: {str(e)}")
 
-    def simulate_batch(self, duration_hours: int = 24, interval_minutes: int = 5) -> pd.DataFrame:
-        """Simulate sensor readings for a given duration with error handling"""
+    def simulate_frame(self, duration_hours: int = 24, interval_minutes: int = 5) -> SensorFrame:
+        """Simulate readings for a given duration as one columnar frame, dropping invalid ones"""
         try:
-            timestamps = []
-            readings = []
-            
-            end_time = datetime.now()
-            start_time = end_time - timedelta(hours=duration_hours)
-            current_time = start_time
-            
-            while current_time <= end_time:
-                try:
-                    reading = self.generate_reading()
-                    readings.append(reading)
-                    timestamps.append(current_time)
-                except SensorSimulationError as e:
-                    logger.warning(f"Skipping invalid reading at {current_time}: {str(e)}")
-                finally:
-                    current_time += timedelta(minutes=interval_minutes)
-            
-            if not readings:
+            end_time = np.datetime64(datetime.now(), 'us')
+            step = np.timedelta64(interval_minutes * 60_000_000, 'us')
+            n = int(duration_hours * 60 // interval_minutes) + 1
+            timestamps = end_time - step * (n - 1) + step * np.arange(n)
+
+            values = np.vstack([
+                np.random.normal(25, 2, n),
+                np.random.normal(7.5, 0.5, n),
+                np.abs(np.random.normal(5, 1, n)),  # Always positive
+                np.abs(np.random.normal(8, 1, n)),
+                np.abs(np.random.normal(500, 50, n))
+            ])
+            frame = SensorFrame(timestamps, values, ProductionConfig.DEFAULT_SENSOR_ID)
+
+            valid = self.validator.validate_frame(frame).valid_rows
+            if not valid.any():
                 raise SensorSimulationError("No valid readings generated")
-            
-            df = pd.DataFrame(readings, index=timestamps)
-            return df
+            if not valid.all():
+                logger.warning(f"Skipping {int((~valid).sum())} invalid simulated readings")
+                frame = frame.select(valid)
+            return frame
         except Exception as e:
             logger.error(f"Batch simulation failed: {str(e)}")
             raise SensorSimulationError(f"Batch simulation failed: {str(e)}")
 
-    def save_to_db(self, df: pd.DataFrame) -> None:
-        """Save simulated data to database with error handling"""
+    def simulate_batch(self, duration_hours: int = 24, interval_minutes: int = 5) -> pd.DataFrame:
+        """Simulate sensor readings for a given duration with error handling"""
+        return self.simulate_frame(duration_hours, interval_minutes).to_dataframe()
+
+    def save_to_db(self, data: Union[pd.DataFrame, SensorFrame],
+                   quarantine: Optional[bool] = None) -> ValidationResult:
+        """
+        Validate and save readings in one transaction with error handling
+        Any invalid reading fails the batch, unless quarantine is on (default:
+        QUARANTINE_INVALID_READINGS): then valid readings are saved and invalid
+        ones go to sensor_data_quarantine in the same transaction
+        """
+        if quarantine is None:
+            quarantine = ProductionConfig.QUARANTINE_INVALID_READINGS
         try:
-            # Convert DataFrame to list of SensorData models for validation
-            sensor_data_list = []
-            for timestamp, row in df.iterrows():
-                sensor_data = SensorData(
-                    timestamp=timestamp,
-                    temperature=row['temperature'],
-                    ph=row['ph'],
-                    turbidity=row['turbidity'],
-                    dissolved_oxygen=row['dissolved_oxygen'],
-                    conductivity=row['conductivity']
-                )
-                sensor_data_list.append(sensor_data)
+            frame = data if isinstance(data, SensorFrame) else SensorFrame.from_dataframe(data)
+
+            result = self.validator.validate_frame(frame)
+            if result.n_rejected:
+                MetricsCollector.record_rejected_readings(result.reject_counts)
+                if not quarantine:
+                    raise SensorSimulationError(f"Invalid sensor readings for: {result.invalid_parameters}")
 
-            # Prepare and execute batch insert
             query = '''
                 INSERT INTO sensor_data 
                 (timestamp, temperature, ph, turbidity, dissolved_oxygen, conductivity)
                 VALUES (?, ?, ?, ?, ?, ?)
             '''
-            
-            data = [(
-                data.timestamp,
-                data.temperature,
-                data.ph,
-                data.turbidity,
-                data.dissolved_oxygen,
-                data.conductivity
-            ) for data in sensor_data_list]
-            
-            for record in data:
-                self.db_manager.execute_write(query, record)
-                
-            logger.info(f"Successfully saved {len(data)} readings to database")
+            if not result.n_rejected:
+                self.db_manager.execute_many(query, frame.to_rows())
+                self._after_save(frame)
+                logger.info(f"Successfully saved {len(frame)} readings to database")
+                return result
+
+            rejected = frame.select(~result.valid_rows)
+            quarantined_at = datetime.now().isoformat(sep=' ')
+            with self.db_manager.get_connection() as conn:
+                self.db_manager.execute_many(query, frame.select(result.valid_rows).to_rows(), conn)
+                self.db_manager.execute_many(
+                    '''INSERT INTO sensor_data_quarantine
+                       (timestamp, temperature, ph, turbidity, dissolved_oxygen, conductivity,
+                        invalid_parameters, quarantined_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                    [(*row, reasons, quarantined_at)
+                     for row, reasons in zip(rejected.to_rows(), result.rejected_parameters())],
+                    conn
+                )
+            self._after_save(frame.select(result.valid_rows))
+            logger.warning(f"Saved {len(frame) - len(rejected)} readings and quarantined {len(rejected)} "
+                           f"(invalid values: {result.reject_counts})")
+            return result
         except Exception as e:
             logger.error(f"Failed to save data to database: {str(e)}")
             raise SensorSimulationError(f"Database save operation failed: {str(e)}")
 
+    def _after_save(self, frame: SensorFrame) -> None:
+        """Feature and alert updates; the readings are stored, so neither may fail the save"""
+        if self.feature_store is not None:
+            try:
+                self.feature_store.update(frame)
+            except Exception as e:  # FeatureStore.backfill recomputes what was missed
+                logger.error(f"Feature update failed for {len(frame)} readings: {str(e)}")
+        if self.alert_engine is not None:
+            try:
+                self.alert_engine.evaluate(frame)
+            except Exception as e:
+                logger.error(f"Alert evaluation failed for {len(frame)} readings: {str(e)}")
+
     def clean_old_data(self, retention_days: int = 30) -> None:
-        """Clean up old data beyond retention period"""
+        """Archive (or, without an archive store, delete) data beyond retention period"""
         try:
+            if self.archive_store is not None:
+                self.archive_store.archive_closed_partitions(retention_days)
+                return
             query = "DELETE FROM sensor_data WHERE timestamp < datetime('now', ?)"
             self.db_manager.execute_write(query, (f'-{retention_days} days',))
             logger.info(f"Cleaned up data older than {retention_days} days")
         except Exception as e:
             logger.error(f"Failed to clean old data: {str(e)}")
             raise SensorSimulationError(f"Data cleanup failed: {str(e)}")
+
+def ingest_simulator(db_manager: Optional[DatabaseManager] = None,
+                     archive_store: Optional[TieredSensorStore] = None,
+                     alert_engine: Optional[AlertEngine] = None) -> WaterSensorSimulator:
+    """
+    Simulator for every path that ingests readings (API, dashboard, scripts)
+    Saved readings update the window features and, when ALERTS_ENABLED, are
+    evaluated by alert_engine (default: a new AlertEngine). clean_old_data
+    archives to archive_store (default: a TieredSensorStore on the same
+    database) instead of deleting.
+    """
+    db_manager = db_manager or DatabaseManager()
+    if alert_engine is None and ProductionConfig.ALERTS_ENABLED:
+        alert_engine = AlertEngine()
+    return WaterSensorSimulator(db_manager, archive_store=archive_store or TieredSensorStore(db_manager),
+                                feature_store=FeatureStore(db_manager), alert_engine=alert_engine)
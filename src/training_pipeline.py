@@ -0,0 +1,215 @@
+import json
+import time
+import argparse
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from risk_prediction import FEATURES, label_risk, load_model_metadata, metadata_path, model_digest
+from services.cold_storage import TieredSensorStore
+from services.feature_store import WINDOW_FEATURES, FeatureStore
+from utils.database import DatabaseManager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+def _max_rss_mb():
+    if resource is None:
+        return float('nan')
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+class TrainingPipeline:
+    """
+    Retrains the risk model on stored sensor_data without holding raw rows in memory
+    Readings are streamed in chunks from both storage tiers. Scaling statistics
+    are fitted incrementally in a first pass. The second pass fills a float32
+    feature matrix, and the forest is fitted on it across n_jobs cores. In
+    warm-start mode, only rows newer than the last trained reading are read and
+    new trees are added to the existing forest. Readings that arrive late,
+    timestamped at or before the last trained one, would never be read that
+    way: warm start counts the stored rows in the trained range and refuses
+    when there are more than were trained on, asking for a full retrain
+    (rows deleted since training can hide late ones). With window_features, rows
+    come from the feature store (hot tier only) with their materialized
+    rolling-window features, the same vectors the API serves.
+    """
+
+    def __init__(self, db_path='data/water_monitoring.db', model_path='models/risk_model.joblib',
+                 chunk_size=100_000, n_estimators=100, n_jobs=-1, trace_memory=False,
+                 window_features=False):
+        db_manager = DatabaseManager(db_path)
+        self.store = TieredSensorStore(db_manager)
+        self.feature_store = FeatureStore(db_manager) if window_features else None
+        self.features = FEATURES + WINDOW_FEATURES if window_features else FEATURES
+        self.model_path = model_path
+        self.chunk_size = chunk_size
+        self.n_estimators = n_estimators
+        self.n_jobs = n_jobs
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    @contextmanager
+    def _stage(self, name):
+        """Record wall-clock time and peak memory of one pipeline stage
+        max_rss_mb is the process high-water mark after the stage; the
+        tracemalloc peak isolates the stage itself when trace_memory is on
+        """
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            peak_mb = float('nan')
+            if self.trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+            self.stages.append({
+                'stage': name,
+                'seconds': time.perf_counter() - started,
+                'peak_traced_mb': peak_mb,
+                'max_rss_mb': _max_rss_mb()
+            })
+
+    def _count(self, start, end):
+        """Training rows stored in [start, end)"""
+        if self.feature_store is not None:
+            return self.feature_store.count_training_rows(start, end)
+        return self.store.count(start, end)
+
+    def _chunks(self, start, end):
+        if self.feature_store is not None:
+            return self.feature_store.iter_training_chunks(start, end, chunk_size=self.chunk_size)
+        return self.store.iter_chunks(start, end, columns=FEATURES, chunk_size=self.chunk_size)
+
+    def _scan(self, start, end, scaler):
+        """Pass 1: count rows and, unless the scaler is frozen, fit it incrementally"""
+        n_rows = 0
+        for chunk in self._chunks(start, end):
+            if scaler is not None:
+                scaler.partial_fit(chunk[self.features])
+            n_rows += len(chunk)
+        return n_rows
+
+    def _materialize(self, start, end, scaler, n_rows):
+        """Pass 2: scaled float32 features and labels, filled chunk by chunk"""
+        X = np.empty((n_rows, len(self.features)), dtype=np.float32)
+        y = np.empty(n_rows, dtype=np.int8)
+        last_timestamp = None
+        offset = 0
+        for chunk in self._chunks(start, end):
+            take = min(len(chunk), n_rows - offset)
+            if take <= 0:
+                break
+            chunk = chunk.iloc[:take]
+            X[offset:offset + take] = scaler.transform(chunk[self.features])
+            y[offset:offset + take] = label_risk(chunk)
+            last_timestamp = chunk['timestamp'].iloc[-1]
+            offset += take
+        return X[:offset], y[:offset], last_timestamp
+
+    def run(self, days=180, warm_start=False, add_trees=20):
+        """Train (or extend) the model and return a summary including per-stage timings"""
+        self.stages = []
+        end = datetime.now()
+        metadata = load_model_metadata(self.model_path)
+
+        if warm_start:
+            model, scaler = joblib.load(self.model_path)
+            if not metadata.get('last_timestamp'):
+                raise ValueError("Warm start needs a model trained by this pipeline")
+            if metadata.get('features', FEATURES) != self.features:
+                raise ValueError("Warm start needs the same feature set as the saved model")
+            # Strictly after the last trained reading
+            start = datetime.fromisoformat(metadata['last_timestamp']) + timedelta(microseconds=1)
+            if metadata.get('trained_from'):
+                late = self._count(datetime.fromisoformat(metadata['trained_from']), start) - metadata['rows']
+                if late > 0:
+                    raise ValueError(f"{late} readings up to {metadata['last_timestamp']} were stored after "
+                                     f"the model was trained; run a full retrain to include them")
+        else:
+            model, scaler = None, StandardScaler()
+            start = end - timedelta(days=days)
+
+        with self._stage('scan'):
+            n_rows = self._scan(start, end, None if warm_start else scaler)
+        if n_rows == 0:
+            return {'rows': 0, 'stages': self.stages, 'metadata': metadata}
+
+        with self._stage('materialize'):
+            X, y, last_timestamp = self._materialize(start, end, scaler, n_rows)
+
+        with self._stage('fit'):
+            if warm_start:
+                if set(np.unique(y)) != set(model.classes_):
+                    raise ValueError("New data does not cover every risk class; run a full retrain")
+                model.set_params(warm_start=True, n_jobs=self.n_jobs,
+                                 n_estimators=model.n_estimators + add_trees)
+            else:
+                model = RandomForestClassifier(n_estimators=self.n_estimators,
+                                               n_jobs=self.n_jobs, random_state=42)
+            model.fit(X, y)
+
+        with self._stage('save'):
+            trained_at = datetime.now()
+            joblib.dump((model, scaler), self.model_path)
+            with open(self.model_path, 'rb') as f:
+                digest = model_digest(f.read())
+            metadata = {
+                'version': trained_at.strftime('%Y%m%dT%H%M%S'),
+                'sha256': digest,  # ties the version to these bytes for model_version()
+                'trained_at': trained_at.isoformat(),
+                # Start of the trained range, which warm starts extend
+                'trained_from': metadata.get('trained_from') if warm_start else start.isoformat(),
+                'last_timestamp': last_timestamp.isoformat(),
+                'n_estimators': model.n_estimators,
+                'rows': int(len(y)) + (metadata.get('rows', 0) if warm_start else 0),
+                'features': self.features
+            }
+            with open(metadata_path(self.model_path), 'w') as f:
+                json.dump(metadata, f, indent=2)
+
+        return {'rows': int(len(y)), 'stages': self.stages, 'metadata': metadata}
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain the risk model from stored sensor data")
+    parser.add_argument('--db-path', default='data/water_monitoring.db')
+    parser.add_argument('--model-path', default='models/risk_model.joblib')
+    parser.add_argument('--days', type=int, default=180, help="history window for a full retrain")
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--n-jobs', type=int, default=-1, help="-1 uses every core")
+    parser.add_argument('--warm-start', action='store_true', help="add trees trained on new rows only")
+    parser.add_argument('--add-trees', type=int, default=20)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="per-stage tracemalloc peaks (slows reading ~3x)")
+    parser.add_argument('--window-features', action='store_true',
+                        help="train on readings plus their 1h/6h/24h features from sensor_features")
+    parser.add_argument('--backfill-features', action='store_true',
+                        help="materialize window features for every stored reading first")
+    args = parser.parse_args()
+
+    if args.backfill_features:
+        FeatureStore(DatabaseManager(args.db_path)).backfill()
+    pipeline = TrainingPipeline(args.db_path, args.model_path, args.chunk_size,
+                                args.n_estimators, args.n_jobs, args.trace_memory,
+                                args.window_features)
+    summary = pipeline.run(days=args.days, warm_start=args.warm_start, add_trees=args.add_trees)
+
+    print(f"Trained on {summary['rows']} readings")
+    for stage in summary['stages']:
+        print(f"  {stage['stage']:<12} {stage['seconds']:8.2f}s  "
+              f"peak traced {stage['peak_traced_mb']:8.1f} MB  max RSS {stage['max_rss_mb']:8.1f} MB")
+    if summary['rows']:
+        print(f"Model version {summary['metadata']['version']} "
+              f"({summary['metadata']['n_estimators']} trees) saved to {args.model_path}")
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import time
+import asyncio
+import threading
 from functools import wraps
 import os
 from dotenv import load_dotenv
@@ -26,6 +28,66 @@ class RateLimiter:
             return True
         return False
 
+class TokenBucket:
+    """Token bucket refilled continuously at refill_per_second up to capacity"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def try_acquire(self, amount: float = 1) -> float:
+        """Take amount tokens if available; otherwise return the seconds to wait"""
+        amount = min(amount, self.capacity)  # oversized requests wait for a full bucket
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.refill_per_second
+
+    def acquire(self, amount: float = 1) -> None:
+        """Block until amount tokens have been taken"""
+        while True:
+            wait = self.try_acquire(amount)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1) -> None:
+        """Wait without blocking the event loop until amount tokens have been taken"""
+        while True:
+            wait = self.try_acquire(amount)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English prompts (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+class LLMRateLimiter:
+    """Request and token budgets per minute, enforced together before each LLM call"""
+
+    def __init__(self, requests_per_minute: int = 60, tokens_per_minute: int = 90_000):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+
+    def acquire(self, tokens: int) -> None:
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+    async def acquire_async(self, tokens: int) -> None:
+        await self.requests.acquire_async(1)
+        await self.tokens.acquire_async(tokens)
+
 class APIKeyManager:
     @staticmethod
     def validate_api_key() -> bool:
@@ -46,4 +108,7 @@ def require_api_key(func: Callable) -> Callable:
     return wrapper
 
 # Initialize rate limiter for OpenAI API calls
-openai_rate_limiter = RateLimiter(max_calls=60, time_window=60)
+openai_rate_limiter = LLMRateLimiter(
+    requests_per_minute=int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', 60)),
+    tokens_per_minute=int(os.getenv('OPENAI_TOKENS_PER_MINUTE', 90000))
+)
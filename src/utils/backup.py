@@ -1,15 +1,148 @@
 import boto3
 import os
+import json
+import time
+import uuid
+import zlib
 import shutil
+import socket
+import sqlite3
+import hashlib
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from datetime import datetime
 import logging
+from typing import Dict, Iterator, List, Optional, Set
 from botocore.exceptions import ClientError
 
+CHUNK_SIZE = 4 * 1024 * 1024  # multiple of every SQLite page size
+ONLINE_PREFIX = "online/"
+LOCK_PREFIX = "locks/"
+LOCK_STALE_SECONDS = 6 * 3600   # locks older than this were left by a crashed process
+GC_WAIT_SECONDS = 600           # longest a backup waits for a running chunk GC
+
+class BackupError(Exception):
+    """Custom exception for backup errors"""
+    pass
+
+class ChunkStore(ABC):
+    """Key/value blob target for content-addressed backup chunks"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def list_keys(self, prefix: str = "") -> Set[str]:
+        ...
+
+class LocalChunkStore(ChunkStore):
+    """Chunk store in a local directory (or a mounted stand-in for S3)"""
+
+    def __init__(self, root: str = "backups/online"):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def delete(self, key: str) -> None:
+        os.remove(self._path(key))
+
+    def list_keys(self, prefix: str = "") -> Set[str]:
+        keys = set()
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                key = os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/")
+                if key.startswith(prefix) and not key.endswith(".tmp"):
+                    keys.add(key)
+        return keys
+
+class S3ChunkStore(ChunkStore):
+    """Chunk store in any S3-compatible bucket"""
+
+    def __init__(self, bucket_name: str, s3_client=None, prefix: str = ONLINE_PREFIX):
+        self.bucket_name = bucket_name
+        self.s3_client = s3_client or boto3.client('s3')
+        self.prefix = prefix
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=self.prefix + key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put(self, key: str, data: bytes) -> None:
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=self.prefix + key, Body=data)
+
+    def get(self, key: str) -> bytes:
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.prefix + key)
+        return response['Body'].read()
+
+    def delete(self, key: str) -> None:
+        self.s3_client.delete_object(Bucket=self.bucket_name, Key=self.prefix + key)
+
+    def list_keys(self, prefix: str = "") -> Set[str]:
+        keys = set()
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix + prefix):
+            for obj in page.get('Contents', []):
+                keys.add(obj['Key'][len(self.prefix):])
+        return keys
+
+def _chunk_key(digest: str) -> str:
+    return f"chunks/{digest[:2]}/{digest}"
+
+def _throughput(num_bytes: int, seconds: float) -> float:
+    """MB/s, guarded against zero-length timings"""
+    return (num_bytes / 1e6) / seconds if seconds > 0 else float('inf')
+
 class BackupManager:
-    def __init__(self, bucket_name: str = None):
+    def __init__(self, bucket_name: str = None, chunk_store: Optional[ChunkStore] = None):
         self.bucket_name = bucket_name or os.getenv('BACKUP_BUCKET_NAME')
         self.s3_client = boto3.client('s3')
         self.logger = logging.getLogger(__name__)
+        self._chunk_store = chunk_store
+
+    @property
+    def chunk_store(self) -> ChunkStore:
+        """Target for online backups: the configured bucket, else a local directory"""
+        if self._chunk_store is None:
+            if self.bucket_name:
+                self._chunk_store = S3ChunkStore(self.bucket_name, self.s3_client)
+            else:
+                self._chunk_store = LocalChunkStore(os.getenv('BACKUP_CHUNK_DIR', 'backups/online'))
+        return self._chunk_store
 
     def create_local_backup(self, db_path: str) -> str:
         """Create a local backup of the database"""
@@ -24,6 +157,206 @@ class BackupManager:
         self.logger.info(f"Local backup created: {backup_path}")
         return backup_path
 
+    def create_snapshot(self, db_path: str, snapshot_path: str,
+                        pages_per_step: int = 1024, sleep: float = 0.005) -> None:
+        """
+        Consistent copy of a live database through SQLite's backup API
+        Copies pages_per_step pages at a time and releases the lock in between,
+        so writers are only blocked for one step
+        """
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(target, pages=pages_per_step, sleep=sleep)
+        finally:
+            target.close()
+            source.close()
+
+    def _upload_chunks(self, snapshot_path: str, chunk_size: int) -> Dict:
+        """Split a snapshot into content-addressed, compressed chunks; upload only new ones"""
+        store = self.chunk_store
+        known = store.list_keys("chunks/")
+        chunks: List[str] = []
+        file_hash = hashlib.sha256()
+        stats = {'bytes_total': 0, 'bytes_uploaded': 0, 'chunks_new': 0}
+
+        with open(snapshot_path, 'rb') as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                file_hash.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                key = _chunk_key(digest)
+                if key not in known:
+                    compressed = zlib.compress(data, 6)
+                    store.put(key, compressed)
+                    known.add(key)
+                    stats['bytes_uploaded'] += len(compressed)
+                    stats['chunks_new'] += 1
+                chunks.append(digest)
+                stats['bytes_total'] += len(data)
+
+        stats['chunks'] = chunks
+        stats['sha256'] = file_hash.hexdigest()
+        return stats
+
+    def _active_locks(self, kind: str) -> List[str]:
+        """Keys of the unexpired 'backup' or 'gc' locks in the chunk store"""
+        store = self.chunk_store
+        active = []
+        for key in store.list_keys(f"{LOCK_PREFIX}{kind}/"):
+            try:
+                started_at = json.loads(store.get(key))['started_at']
+            except (OSError, ClientError, ValueError, KeyError):
+                continue  # released while listing
+            if time.time() - started_at < LOCK_STALE_SECONDS:
+                active.append(key)
+        return active
+
+    @contextmanager
+    def _lock(self, kind: str) -> Iterator[str]:
+        """
+        Announce a running backup or chunk GC in the chunk store
+        Each side writes its own lock before looking for the other's, so at
+        least one of two concurrent runs sees the other
+        """
+        key = f"{LOCK_PREFIX}{kind}/{uuid.uuid4().hex}.json"
+        lock = {'started_at': time.time(), 'host': socket.gethostname(), 'pid': os.getpid()}
+        self.chunk_store.put(key, json.dumps(lock).encode('utf-8'))
+        try:
+            yield key
+        finally:
+            self.chunk_store.delete(key)
+
+    def _wait_for_gc(self, timeout: float = GC_WAIT_SECONDS, poll: float = 1.0) -> None:
+        deadline = time.monotonic() + timeout
+        while self._active_locks('gc'):
+            if time.monotonic() >= deadline:
+                raise BackupError(f"Chunk GC still running after {timeout:.0f}s; backup not started")
+            time.sleep(poll)
+
+    def create_online_backup(self, db_path: str, chunk_size: int = CHUNK_SIZE,
+                             pages_per_step: int = 1024) -> Dict:
+        """
+        Online, incremental backup of a live database
+        Waits for a running chunk GC, since it may delete chunks this backup
+        would reuse. Returns the manifest key together with size and
+        throughput figures
+        """
+        with self._lock('backup'):
+            self._wait_for_gc()
+            created_at = datetime.now()
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                snapshot_path = os.path.join(tmp_dir, 'snapshot.db')
+
+                started = time.perf_counter()
+                self.create_snapshot(db_path, snapshot_path, pages_per_step=pages_per_step)
+                snapshot_seconds = time.perf_counter() - started
+
+                started = time.perf_counter()
+                upload = self._upload_chunks(snapshot_path, chunk_size)
+                upload_seconds = time.perf_counter() - started
+
+            # Sortable by time; the suffix keeps backups started in the same microsecond apart
+            manifest_key = (f"manifests/water_monitoring_{created_at.strftime('%Y%m%d_%H%M%S_%f')}_"
+                            f"{uuid.uuid4().hex[:8]}.json")
+            manifest = {
+                'created_at': created_at.isoformat(),
+                'source': os.path.basename(db_path),
+                'size': upload['bytes_total'],
+                'sha256': upload['sha256'],
+                'chunk_size': chunk_size,
+                'compression': 'zlib',
+                'chunks': upload['chunks']
+            }
+            self.chunk_store.put(manifest_key, json.dumps(manifest).encode('utf-8'))
+
+        stats = {
+            'manifest': manifest_key,
+            'bytes_total': upload['bytes_total'],
+            'bytes_uploaded': upload['bytes_uploaded'],
+            'chunks_total': len(upload['chunks']),
+            'chunks_new': upload['chunks_new'],
+            'snapshot_seconds': snapshot_seconds,
+            'upload_seconds': upload_seconds,
+            'snapshot_mb_per_s': _throughput(upload['bytes_total'], snapshot_seconds),
+            'upload_mb_per_s': _throughput(upload['bytes_total'], upload_seconds)
+        }
+        self.logger.info(
+            f"Online backup {manifest_key}: {stats['bytes_total'] / 1e6:.1f} MB, "
+            f"{stats['chunks_new']}/{stats['chunks_total']} new chunks "
+            f"({stats['bytes_uploaded'] / 1e6:.1f} MB uploaded), "
+            f"snapshot {stats['snapshot_mb_per_s']:.0f} MB/s, chunking {stats['upload_mb_per_s']:.0f} MB/s"
+        )
+        return stats
+
+    def list_online_backups(self) -> List[str]:
+        """Manifest keys of online backups, oldest first"""
+        return sorted(self.chunk_store.list_keys("manifests/"))
+
+    def restore_online_backup(self, manifest_key: str, target_path: str) -> Dict:
+        """Rebuild a database file from an online backup manifest and verify it"""
+        store = self.chunk_store
+        manifest = json.loads(store.get(manifest_key))
+        file_hash = hashlib.sha256()
+        tmp_path = f"{target_path}.restoring"
+
+        started = time.perf_counter()
+        with open(tmp_path, 'wb') as f:
+            for digest in manifest['chunks']:
+                data = zlib.decompress(store.get(_chunk_key(digest)))
+                if hashlib.sha256(data).hexdigest() != digest:
+                    os.remove(tmp_path)
+                    raise ValueError(f"Corrupt backup chunk: {digest}")
+                file_hash.update(data)
+                f.write(data)
+        restore_seconds = time.perf_counter() - started
+
+        if file_hash.hexdigest() != manifest['sha256']:
+            os.remove(tmp_path)
+            raise ValueError(f"Restored database does not match manifest {manifest_key}")
+        os.replace(tmp_path, target_path)
+
+        stats = {
+            'bytes_total': manifest['size'],
+            'restore_seconds': restore_seconds,
+            'restore_mb_per_s': _throughput(manifest['size'], restore_seconds)
+        }
+        self.logger.info(
+            f"Restored {manifest_key} to {target_path}: {manifest['size'] / 1e6:.1f} MB "
+            f"at {stats['restore_mb_per_s']:.0f} MB/s"
+        )
+        return stats
+
+    def clean_old_online_backups(self, retention_days: int = 30) -> int:
+        """
+        Drop expired manifests, then delete chunks no remaining manifest references
+        Chunks are kept while a backup is running: it may reuse them before its
+        manifest exists. Returns the number of chunks deleted
+        """
+        store = self.chunk_store
+        cutoff = datetime.now().timestamp() - (retention_days * 86400)
+        referenced: Set[str] = set()
+
+        with self._lock('gc'):
+            for key in self.list_online_backups():
+                manifest = json.loads(store.get(key))
+                if datetime.fromisoformat(manifest['created_at']).timestamp() < cutoff:
+                    store.delete(key)
+                    self.logger.info(f"Removed old online backup: {key}")
+                else:
+                    referenced.update(_chunk_key(digest) for digest in manifest['chunks'])
+
+            running = self._active_locks('backup')
+            if running:
+                self.logger.info(f"Skipping chunk cleanup: {len(running)} online backup(s) in progress")
+                return 0
+            unreferenced = store.list_keys("chunks/") - referenced
+            for key in unreferenced:
+                store.delete(key)
+        return len(unreferenced)
+
     def upload_to_s3(self, file_path: str) -> bool:
         """Upload backup to S3"""
         try:
@@ -44,14 +377,17 @@ class BackupManager:
             
             for backup_file in os.listdir(backup_dir):
                 file_path = os.path.join(backup_dir, backup_file)
-                if os.path.getctime(file_path) < cutoff_date:
+                if os.path.isfile(file_path) and os.path.getctime(file_path) < cutoff_date:
                     os.remove(file_path)
                     self.logger.info(f"Removed old backup: {file_path}")
 
-            # Clean S3 backups
+            # Clean S3 backups (online backup chunks are shared between backups
+            # and are cleaned by reference in clean_old_online_backups)
             response = self.s3_client.list_objects_v2(Bucket=self.bucket_name)
             if 'Contents' in response:
                 for obj in response['Contents']:
+                    if obj['Key'].startswith(ONLINE_PREFIX):
+                        continue
                     if obj['LastModified'].timestamp() < cutoff_date:
                         self.s3_client.delete_object(
                             Bucket=self.bucket_name,
@@ -62,9 +398,15 @@ class BackupManager:
         except Exception as e:
             self.logger.error(f"Error cleaning old backups: {str(e)}")
 
-    def perform_backup(self, db_path: str):
+    def perform_backup(self, db_path: str, online: bool = False):
         """Perform complete backup process"""
         try:
+            if online:
+                self.create_online_backup(db_path)
+                self.clean_old_online_backups()
+                self.logger.info("Backup process completed successfully")
+                return
+
             # Create local backup
             backup_path = self.create_local_backup(db_path)
             
@@ -1,14 +1,107 @@
+import re
+import time
 import sqlite3
+import logging
+import threading
+from collections import OrderedDict, deque
 from contextlib import contextmanager
-from typing import Generator
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Generator, Iterable, Iterator, List, Optional, Tuple
 import os
+import pandas as pd
 from dotenv import load_dotenv
 
+from config.production import ProductionConfig
+from monitoring.metrics import MetricsCollector
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE(?: IF NOT EXISTS)?)\s+([A-Za-z_]\w*)', re.IGNORECASE)
+_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)([A-Za-z_]\w*)')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+@lru_cache(maxsize=1024)
+def statement_label(query: str) -> Tuple[str, str]:
+    """(operation, first table) of a statement, for metrics"""
+    words = query.split(None, 1)
+    operation = words[0].lower() if words else 'unknown'
+    table = _TABLE.search(query)
+    return operation, table.group(1) if table else 'none'
+
+class SlowQueryLog:
+    """
+    Most recent statements slower than the threshold, with their query plans
+    Shared by every DatabaseManager in the process. Plans come from EXPLAIN
+    QUERY PLAN on the same connection and are cached per statement text;
+    statements that scan a whole table are counted per table and logged as
+    warnings.
+    """
+
+    def __init__(self, maxlen: int = ProductionConfig.DB_SLOW_QUERY_LOG_SIZE, max_plans: int = 256):
+        self._entries = deque(maxlen=maxlen)
+        self._plans: 'OrderedDict[str, List[str]]' = OrderedDict()
+        self.max_plans = max_plans
+        self._lock = threading.Lock()
+
+    def _plan(self, conn: sqlite3.Connection, query: str, params) -> List[str]:
+        with self._lock:
+            if query in self._plans:
+                self._plans.move_to_end(query)
+                return self._plans[query]
+        if not query.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        try:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ())]
+        except sqlite3.Error as e:
+            plan = [f"plan unavailable: {e}"]
+        with self._lock:
+            self._plans[query] = plan
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan
+
+    def record(self, conn: Optional[sqlite3.Connection], query: str, params, seconds: float, rows: int) -> Dict:
+        plan = self._plan(conn, query, params) if conn is not None and ProductionConfig.DB_EXPLAIN_SLOW_QUERIES else []
+        full_scans = sorted({match.group(1) for match in map(_SCAN.match, plan) if match})
+        entry = {
+            'sql': ' '.join(query.split())[:1000],
+            'params': len(params or ()),
+            'duration_ms': round(seconds * 1000, 2),
+            'rows': rows,
+            'plan': plan,
+            'full_scans': full_scans,
+            'at': datetime.now().isoformat(sep=' ')
+        }
+        with self._lock:
+            self._entries.append(entry)
+        for table in full_scans:
+            MetricsCollector.record_full_scan(table)
+        message = f"Slow query ({entry['duration_ms']:.1f} ms, {rows} rows): {entry['sql'][:200]}"
+        if full_scans:
+            logger.warning(f"{message} -- full scan of {', '.join(full_scans)}; plan: {' | '.join(plan)}")
+        else:
+            logger.info(f"{message}; plan: {' | '.join(plan)}")
+        return entry
+
+    def entries(self) -> List[Dict]:
+        """Logged statements, newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+
+slow_query_log = SlowQueryLog()
+
 class DatabaseManager:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, slow_query_ms: Optional[float] = None):
         self.db_path = db_path or os.getenv('DATABASE_PATH', 'data/water_monitoring.db')
+        self.slow_query_seconds = (ProductionConfig.DB_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms) / 1000
         self._ensure_db_directory()
 
     def _ensure_db_directory(self) -> None:
@@ -37,25 +130,86 @@ class DatabaseManager:
             if connection:
                 connection.close()
 
+    def _observe(self, conn: Optional[sqlite3.Connection], query: str, params, started: float, rows: int) -> None:
+        """Per-statement timing and row count; slow statements go to the slow-query log with their plan"""
+        seconds = time.perf_counter() - started
+        operation, table = statement_label(query)
+        MetricsCollector.observe_query(operation, table, seconds, rows)
+        if seconds >= self.slow_query_seconds:
+            slow_query_log.record(conn, query, params, seconds, rows)
+
     def execute_query(self, query: str, params: tuple = None) -> list:
         """
         Executes a query with parameter binding for security
         """
         with self.get_connection() as conn:
+            started = time.perf_counter()
             cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            return cursor.fetchall()
+            rows = cursor.fetchall()
+            self._observe(conn, query, params, started, len(rows))
+            return rows
 
     def execute_write(self, query: str, params: tuple = None) -> None:
         """
         Executes a write operation with parameter binding
         """
         with self.get_connection() as conn:
+            started = time.perf_counter()
             cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
+            self._observe(conn, query, params, started, max(cursor.rowcount, 0))
+
+    def execute_many(self, query: str, rows: Iterable[tuple],
+                     conn: Optional[sqlite3.Connection] = None) -> int:
+        """
+        Executes one parameterised statement for every row in a single transaction
+        Pass conn to run inside an open connection's transaction
+        Returns the number of rows affected
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                return self.execute_many(query, rows, conn)
+        started = time.perf_counter()
+        cursor = conn.cursor()
+        cursor.executemany(query, rows)
+        self._observe(None, query, None, started, cursor.rowcount)  # no single plan to explain
+        return cursor.rowcount
+
+    def read_frame(self, query: str, params: tuple = None, conn: Optional[sqlite3.Connection] = None,
+                   **kwargs) -> pd.DataFrame:
+        """
+        pd.read_sql_query, timed and plan-checked like execute_query
+        Pass conn to read on an open connection (inside its transaction);
+        use iter_frames for chunked reads
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                return self.read_frame(query, params, conn, **kwargs)
+        started = time.perf_counter()
+        df = pd.read_sql_query(query, conn, params=params, **kwargs)
+        self._observe(conn, query, params, started, len(df))
+        return df
+
+    def iter_frames(self, query: str, params: tuple = None, chunksize: int = 100_000,
+                    conn: Optional[sqlite3.Connection] = None, **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        read_frame in chunks of chunksize rows
+        Each chunk is timed and plan-checked as one statement; the first
+        includes running the query
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                yield from self.iter_frames(query, params, chunksize, conn, **kwargs)
+            return
+        started = time.perf_counter()
+        for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunksize, **kwargs):
+            self._observe(conn, query, params, started, len(chunk))
+            yield chunk
+            started = time.perf_counter()
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+DOWNSAMPLING_METHODS = ('lttb', 'envelope')
+
+def _epoch_ns(values) -> np.ndarray:
+    """Timestamps as int64 nanoseconds since the epoch"""
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets point selection
+    Returns the indices of at most n_out points that preserve the visual shape
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1][:n_out], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (n_out - 2)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Twice the triangle area between the last selected point, each
+        # candidate in this bucket and the average of the next bucket
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+def _bucket_starts(x: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Start offsets of equal-width time buckets over sorted x (empty buckets skipped)"""
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.array([0])
+    bucket = np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    return np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+
+def bucket_envelope(x: np.ndarray, y: np.ndarray, n_buckets: int) -> Dict[str, np.ndarray]:
+    """Per-bucket min/max/mean of y over equal-width buckets of sorted x"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    starts = _bucket_starts(x, n_buckets)
+    counts = np.diff(np.append(starts, len(x)))
+    return {
+        'x': np.add.reduceat(x, starts) / counts,
+        'mean': np.add.reduceat(y, starts) / counts,
+        'min': np.minimum.reduceat(y, starts),
+        'max': np.maximum.reduceat(y, starts),
+        'count': counts
+    }
+
+def downsample_series(df: pd.DataFrame, parameter: str, max_points: int,
+                      method: str = 'lttb', time_column: str = 'timestamp') -> pd.DataFrame:
+    """
+    Reduce one parameter's time series to at most max_points points
+    'lttb' returns selected raw rows; 'envelope' returns per-bucket
+    mean/min/max columns named '<parameter>', '<parameter>_min', '<parameter>_max'
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    df = df.sort_values(time_column)
+    times = df[time_column]
+    is_time = not pd.api.types.is_numeric_dtype(times)
+    base = 0
+    if is_time and len(df):
+        # Offsets from the first timestamp keep float64 precise to well below a second
+        ns = _epoch_ns(times)
+        base = int(ns[0])
+        x = (ns - base).astype(np.float64)
+    else:
+        x = times.to_numpy(dtype=np.float64)
+    y = df[parameter].to_numpy(dtype=np.float64)
+
+    if method == 'lttb':
+        return df[[time_column, parameter]].iloc[lttb_indices(x, y, max_points)]
+
+    if len(df) <= max_points:
+        return pd.DataFrame({
+            time_column: times.to_numpy(),
+            parameter: y,
+            f'{parameter}_min': y,
+            f'{parameter}_max': y
+        })
+
+    envelope = bucket_envelope(x, y, max_points)
+    bucket_times = envelope['x']
+    if is_time:
+        bucket_times = pd.to_datetime(base + bucket_times.astype(np.int64))
+    return pd.DataFrame({
+        time_column: bucket_times,
+        parameter: envelope['mean'],
+        f'{parameter}_min': envelope['min'],
+        f'{parameter}_max': envelope['max']
+    })
+
+def bucket_means(df: pd.DataFrame, max_points: int,
+                 columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Average whole rows into at most max_points time buckets
+    Keeps every parameter of a row together; expects a sorted DatetimeIndex
+    """
+    if len(df) <= max_points:
+        return df
+    columns = columns or list(df.columns)
+    ns = _epoch_ns(df.index)
+    x = (ns - ns[0]).astype(np.float64)
+    starts = _bucket_starts(x, max_points)
+    counts = np.diff(np.append(starts, len(x)))
+    values = df[columns].to_numpy(dtype=np.float64)
+    means = np.add.reduceat(values, starts, axis=0) / counts[:, None]
+    index = pd.to_datetime(ns[0] + (np.add.reduceat(x, starts) / counts).astype(np.int64))
+    return pd.DataFrame(means, index=index, columns=columns)
+
+def downsample_readings(df: pd.DataFrame, max_points: int, method: str = 'mean',
+                        parameter: str = 'temperature') -> pd.DataFrame:
+    """
+    Reduce whole readings (sorted DatetimeIndex, one column per parameter) to at most max_points rows
+    'mean' averages rows into time buckets; 'lttb' keeps the raw readings LTTB
+    selects for `parameter`; 'envelope' gives every column its per-bucket mean
+    plus '<column>_min' and '<column>_max'
+    """
+    if method == 'mean':
+        return bucket_means(df, max_points)
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    series = df.rename_axis('timestamp').reset_index()  # positional index, so selected labels are row offsets
+    if method == 'lttb':
+        if parameter not in df.columns:
+            raise ValueError(f"Unknown parameter: {parameter}")
+        return df.iloc[downsample_series(series, parameter, max_points).index.to_numpy()]
+    # Buckets depend on the timestamps only, so every column's envelope shares them
+    return pd.concat([downsample_series(series, column, max_points, method='envelope').set_index('timestamp')
+                      for column in df.columns], axis=1)
@@ -1,38 +1,126 @@
+import atexit
 import logging
 import os
+import queue
+import random
+import threading
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional
+
+from config.production import ProductionConfig
+
+try:
+    from pythonjsonlogger.json import JsonFormatter
+except ImportError:  # python-json-logger < 3
+    from pythonjsonlogger.jsonlogger import JsonFormatter
+
+LOGGER_NAME = 'WaterMonitoring'
+request_logger = logging.getLogger(f'{LOGGER_NAME}.requests')
+
+_setup_lock = threading.Lock()
+_queue_handler: Optional['DroppingQueueHandler'] = None
+_listener: Optional[QueueListener] = None
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the listener thread; when the queue is full the record is dropped, never waited on"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def _build_handlers(json_format: bool) -> List[logging.Handler]:
+    if json_format:
+        formatter = JsonFormatter('%(asctime)s %(name)s %(levelname)s %(message)s')
+    else:
+        formatter = logging.Formatter(ProductionConfig.LOG_FORMAT)
+
+    # Create logs directory if it doesn't exist
+    os.makedirs('logs', exist_ok=True)
+    log_file = f'logs/water_monitoring_{datetime.now().strftime("%Y%m")}.log'
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=10485760,  # 10MB
+        backupCount=5
+    )
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, console_handler]
+
+def _start_listener(handlers: List[logging.Handler]) -> QueueListener:
+    global _listener
+    log_queue = queue.Queue(maxsize=ProductionConfig.LOG_QUEUE_SIZE)
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def _restart_listener_in_child() -> None:
+    """A forked worker inherits the queue handler but not the listener thread"""
+    if _listener is not None:
+        _start_listener(list(_listener.handlers))
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def setup_logging(queued: Optional[bool] = None, json_format: Optional[bool] = None) -> logging.Logger:
+    """
+    Configure the application logger once per process; later calls return it unchanged
+    Queued mode (LOG_QUEUED, on by default) keeps file and console I/O off the
+    request path: callers only enqueue, and a background listener thread
+    formats and writes. LOG_JSON switches both outputs to one JSON object per line.
+    """
+    global _queue_handler
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        if logger.handlers:
+            return logger
+        queued = ProductionConfig.LOG_QUEUED if queued is None else queued
+        json_format = ProductionConfig.LOG_JSON if json_format is None else json_format
+
+        handlers = _build_handlers(json_format)
+        if queued:
+            _queue_handler = DroppingQueueHandler(None)
+            _start_listener(handlers)
+            logger.addHandler(_queue_handler)
+            atexit.register(stop_logging)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+        logger.setLevel(ProductionConfig.LOG_LEVEL)
+    return logger
+
+os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+def log_request(method: str, path: str, status_code: int, duration: float) -> None:
+    """
+    One line per request, sampled at REQUEST_LOG_SAMPLE_RATE
+    Server errors and requests slower than REQUEST_LOG_SLOW_SECONDS are always logged
+    """
+    always = status_code >= 500 or duration >= ProductionConfig.REQUEST_LOG_SLOW_SECONDS
+    if not always and random.random() >= ProductionConfig.REQUEST_LOG_SAMPLE_RATE:
+        return
+    request_logger.log(
+        logging.WARNING if status_code >= 500 else logging.INFO,
+        f"{method} {path} {status_code} {duration * 1000:.1f}ms",
+        extra={'method': method, 'path': path, 'status_code': status_code,
+               'duration_ms': round(duration * 1000, 1)}
+    )
 
 class Logger:
-    def __init__(self):
-        # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-
-        # Set up logging format
-        log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        formatter = logging.Formatter(log_format)
-
-        # Set up file handler with rotation
-        log_file = f'logs/water_monitoring_{datetime.now().strftime("%Y%m")}.log'
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=10485760,  # 10MB
-            backupCount=5
-        )
-        file_handler.setFormatter(formatter)
-
-        # Set up console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-
-        # Create logger
-        self.logger = logging.getLogger('WaterMonitoring')
-        self.logger.setLevel(logging.INFO)
-        
-        # Add handlers
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+    def __init__(self, queued: Optional[bool] = None, json_format: Optional[bool] = None):
+        self.logger = setup_logging(queued, json_format)
 
     def get_logger(self):
         return self.logger
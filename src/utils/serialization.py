@@ -0,0 +1,94 @@
+from typing import Any, Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi.responses import Response
+
+from models.sensor_frame import PARAMETERS, SensorFrame
+
+_ROW_FIELDS = ('timestamp',) + PARAMETERS
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson; numpy arrays and datetimes are encoded natively"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def _rounded(values: np.ndarray, decimals: Optional[int]) -> np.ndarray:
+    return values if decimals is None else np.round(values, decimals)
+
+def frame_to_columnar_json(frame: SensorFrame, decimals: Optional[int] = None) -> bytes:
+    """
+    {"timestamp": [...], "temperature": [...], ...} straight from the frame's arrays
+    orjson walks the numpy buffers directly, so no Python float per value is
+    created; NaN becomes null
+    """
+    payload = {'timestamp': frame.timestamps}
+    for parameter, values in frame.columns.items():
+        payload[parameter] = _rounded(values, decimals)
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def frame_to_rows_json(frame: SensorFrame, decimals: Optional[int] = None) -> bytes:
+    """
+    The List[SensorData] shape, [{"timestamp": ..., "temperature": ...}, ...],
+    for readings that were validated when the frame was built
+    """
+    timestamps = frame.timestamps.tolist()  # datetime objects, encoded like pydantic does
+    columns = [_rounded(values, decimals).tolist() for values in frame.values]
+    return orjson.dumps([dict(zip(_ROW_FIELDS, row)) for row in zip(timestamps, *columns)])
+
+def dataframe_to_json(df: pd.DataFrame, columnar: bool = False) -> bytes:
+    """
+    A timestamp-indexed DataFrame with any columns (e.g. min/max envelopes),
+    encoded in the rows or columnar shape of the frame encoders above
+    """
+    timestamps = df.index.to_numpy(dtype='datetime64[us]')
+    if columnar:
+        payload = {'timestamp': timestamps, **{column: df[column].to_numpy() for column in df.columns}}
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    fields = ('timestamp', *df.columns)
+    columns = [df[column].to_numpy().tolist() for column in df.columns]
+    return orjson.dumps([dict(zip(fields, row)) for row in zip(timestamps.tolist(), *columns)])
+
+def _benchmark(n_readings: int = 20_000, repeat: int = 5) -> None:
+    """Per-reading cost of the history response paths through a real FastAPI app"""
+    import time
+    from typing import List
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from models.schemas import SensorData
+
+    timestamps = np.datetime64('2026-01-01T00:00:00', 'us') + np.arange(n_readings) * np.timedelta64(5, 'm')
+    rng = np.random.default_rng(0)
+    frame = SensorFrame(timestamps, np.abs(rng.normal([[25], [7.5], [5], [8], [500]], 1, (5, n_readings))))
+
+    app = FastAPI()
+
+    @app.get("/pydantic", response_model=List[SensorData])
+    def pydantic_path():
+        return [SensorData(timestamp=ts, **dict(zip(PARAMETERS, values)))
+                for ts, *values in zip(frame.timestamps.tolist(), *frame.values.tolist())]
+
+    @app.get("/rows")
+    def rows_path():
+        return FastJSONResponse(frame_to_rows_json(frame))
+
+    @app.get("/columnar")
+    def columnar_path():
+        return FastJSONResponse(frame_to_columnar_json(frame))
+
+    client = TestClient(app)
+    for path in ('/pydantic', '/rows', '/columnar'):
+        client.get(path)  # warm up
+        started = time.perf_counter()
+        for _ in range(repeat):
+            body = client.get(path).content
+        per_reading = (time.perf_counter() - started) / repeat / n_readings
+        print(f"{path:<10} {per_reading * 1e6:7.2f} us/reading  {len(body) / n_readings:6.1f} B/reading")
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,99 @@
+import os
+import time
+import atexit
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+from models.sensor_frame import PARAMETERS
+
+COUNTERS = ('requests', 'readings', 'risk_assessments', 'errors')
+
+# Segment layout (all 8-byte slots):
+#   [0]                     sequence number of the latest reading (odd while being written)
+#   [1]                     latest reading timestamp, epoch seconds (float64 bits)
+#   [2 : 2 + P]             latest reading parameters (float64)
+#   [2 + P : 2 + P + C]     counters (int64)
+_SEQ = 0
+_TIMESTAMP = 1
+_VALUES = slice(2, 2 + len(PARAMETERS))
+_COUNTERS = slice(2 + len(PARAMETERS), 2 + len(PARAMETERS) + len(COUNTERS))
+_SLOTS = 2 + len(PARAMETERS) + len(COUNTERS)
+
+class SharedState:
+    """
+    Latest reading and counters in a shared memory segment visible to every worker
+    Created by the launcher before it forks, so children inherit both the
+    mapping and the writer lock. Writers serialise on the lock. Readers never
+    block: the latest reading is guarded by a sequence number (a seqlock), and
+    a read is retried if a write overlapped it.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, lock):
+        self._shm = shm
+        self._lock = lock
+        self._creator_pid = os.getpid()  # forked workers inherit this and only detach
+        self._ints = np.ndarray((_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        self._floats = np.ndarray((_SLOTS,), dtype=np.float64, buffer=shm.buf)
+
+    @classmethod
+    def create(cls) -> 'SharedState':
+        shm = shared_memory.SharedMemory(create=True, size=_SLOTS * 8)
+        state = cls(shm, multiprocessing.Lock())
+        state._ints[:] = 0
+        atexit.register(state.close)
+        return state
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def set_latest(self, reading: Dict[str, float], timestamp: Optional[float] = None) -> None:
+        with self._lock:
+            self._ints[_SEQ] += 1
+            self._floats[_TIMESTAMP] = time.time() if timestamp is None else timestamp
+            self._floats[_VALUES] = [reading[p] for p in PARAMETERS]
+            self._ints[_SEQ] += 1
+
+    def get_latest(self) -> Optional[Dict[str, float]]:
+        """Consistent snapshot of the latest reading, or None before the first one"""
+        while True:
+            seq = self._ints[_SEQ]
+            if seq == 0:
+                return None
+            if seq % 2 == 0:
+                timestamp = float(self._floats[_TIMESTAMP])
+                values = self._floats[_VALUES].tolist()
+                if self._ints[_SEQ] == seq:
+                    return {'timestamp': timestamp, **dict(zip(PARAMETERS, values))}
+            time.sleep(0)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        index = _COUNTERS.start + COUNTERS.index(counter)
+        with self._lock:
+            self._ints[index] += amount
+
+    def counters(self) -> Dict[str, int]:
+        return dict(zip(COUNTERS, self._ints[_COUNTERS].tolist()))
+
+    def close(self) -> None:
+        """Release the mapping; the creating process also removes the segment"""
+        if self._shm is None:
+            return
+        unlink = os.getpid() == self._creator_pid
+        del self._ints, self._floats
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+        self._shm = None
+
+_state: Optional[SharedState] = None
+
+def get_shared_state() -> SharedState:
+    """The process's shared state, created on first use when no launcher set one up"""
+    global _state
+    if _state is None:
+        _state = SharedState.create()
+    return _state
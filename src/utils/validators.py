@@ -1,7 +1,48 @@
 import re
-from typing import Dict, Union, List
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Sequence, Tuple, Union, List
 import numpy as np
 
+from models.sensor_frame import PARAMETERS
+
+@dataclass
+class ValidationResult:
+    """
+    Range checks for a block of readings
+    `masks` is (n_parameters, n_readings), True where a value is valid, so a
+    caller can keep the good rows of a batch instead of failing all of it
+    """
+    parameters: Tuple[str, ...]
+    masks: np.ndarray
+
+    @cached_property
+    def valid_rows(self) -> np.ndarray:
+        """True for readings whose every parameter is valid"""
+        return self.masks.all(axis=0)
+
+    @property
+    def n_rejected(self) -> int:
+        return int(len(self.valid_rows) - np.count_nonzero(self.valid_rows))
+
+    @cached_property
+    def reject_counts(self) -> Dict[str, int]:
+        """Invalid values per parameter"""
+        invalid = self.masks.shape[1] - np.count_nonzero(self.masks, axis=1)
+        return dict(zip(self.parameters, invalid.tolist()))
+
+    @property
+    def invalid_parameters(self) -> List[str]:
+        return [p for p, count in self.reject_counts.items() if count]
+
+    def as_dict(self) -> Dict[str, np.ndarray]:
+        return dict(zip(self.parameters, self.masks))
+
+    def rejected_parameters(self) -> List[str]:
+        """Comma-separated invalid parameters of each rejected reading, in row order"""
+        names = np.array(self.parameters, dtype=object)
+        return [','.join(names[~column]) for column in self.masks[:, ~self.valid_rows].T]
+
 class DataValidator:
     # Defines acceptable ranges for water quality parameters
     VALID_RANGES = {
@@ -31,6 +72,23 @@ class DataValidator:
         
         return validation_results
 
+    @staticmethod
+    def validate_array(values: np.ndarray, parameters: Sequence[str] = PARAMETERS) -> ValidationResult:
+        """
+        Validates a (n_parameters, n_readings) array in one vectorized pass
+        Returns per-parameter, per-reading masks and reject counts (NaN is invalid)
+        """
+        values = np.asarray(values, dtype=float)
+        bounds = np.array([DataValidator.VALID_RANGES[p] for p in parameters], dtype=float)
+        # NaN compares False on both sides, so it fails the range check
+        masks = (values >= bounds[:, :1]) & (values <= bounds[:, 1:])
+        return ValidationResult(tuple(parameters), masks)
+
+    @staticmethod
+    def validate_frame(frame) -> ValidationResult:
+        """Validates every reading of a SensorFrame (see validate_array)"""
+        return DataValidator.validate_array(frame.values)
+
     @staticmethod
     def sanitize_input(value: str) -> str:
         """
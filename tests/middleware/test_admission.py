@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from src.middleware.admission import AdmissionControlMiddleware
+
+CLASSES = {
+    'critical': (0, 8, 8, 0.05, None),
+    'standard': (1, 8, 8, None, None),
+    'expensive': (2, 1, 0, None, 0.2)
+}
+
+def _client():
+    app = FastAPI()
+
+    @app.get("/sensor-data/current")
+    async def current():
+        return {"ok": True}
+
+    @app.get("/reports/slow")
+    async def slow(seconds: float = 0.1):
+        await asyncio.sleep(seconds)
+        return {"ok": True}
+
+    guarded = AdmissionControlMiddleware(app, classes=CLASSES, queue_timeout=1, retry_after=7)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=guarded), base_url="http://test")
+    return guarded, client
+
+def test_expensive_requests_are_shed_when_their_queue_is_full():
+    async def scenario():
+        _, client = _client()
+        async with client:
+            return await asyncio.gather(client.get("/reports/slow"), client.get("/reports/slow"),
+                                        client.get("/sensor-data/current"))
+
+    first, second, cheap = asyncio.run(scenario())
+    assert sorted([first.status_code, second.status_code]) == [200, 503]
+    shed = first if first.status_code == 503 else second
+    assert shed.headers["Retry-After"] == "7"
+    assert cheap.status_code == 200
+
+def test_deadline_returns_504():
+    async def scenario():
+        _, client = _client()
+        async with client:
+            return await client.get("/reports/slow", params={"seconds": 5})
+
+    assert asyncio.run(scenario()).status_code == 504
+
+def test_lower_priorities_are_shed_while_critical_p99_is_over_budget():
+    async def scenario():
+        guarded, client = _client()
+        for _ in range(50):
+            guarded.classes['critical'].observe(0.5)
+        async with client:
+            return await client.get("/reports/slow"), await client.get("/sensor-data/current")
+
+    expensive, cheap = asyncio.run(scenario())
+    assert expensive.status_code == 503
+    assert cheap.status_code == 200
+
+def test_pdf_status_polls_are_not_expensive():
+    guarded = AdmissionControlMiddleware(FastAPI(), classes=CLASSES)
+    assert guarded.classify("/reports/pdf/abc123").name == 'standard'
+    assert guarded.classify("/reports/pdf").name == 'expensive'
+    assert guarded.classify("/reports/generate").name == 'expensive'
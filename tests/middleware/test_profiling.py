@@ -0,0 +1,54 @@
+import asyncio
+import pstats
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from src.middleware.profiling import ProfileStore, ProfilingMiddleware
+
+def _client(store, token="secret"):
+    app = FastAPI()
+
+    @app.get("/busy")
+    def busy():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        return {"ok": True}
+
+    profiled = ProfilingMiddleware(app, store=store, token=token)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=profiled), base_url="http://test")
+
+def _get(client, path, headers=None):
+    async def request():
+        async with client:
+            return await client.get(path, headers=headers)
+    return asyncio.run(request())
+
+def test_header_profiles_only_with_the_token(tmp_path):
+    store = ProfileStore(str(tmp_path), max_profiles=2)
+    assert "x-profile-id" not in _get(_client(store), "/busy", {"X-Profile": "sample"}).headers
+    assert "x-profile-id" not in _get(_client(store), "/busy").headers
+
+    responses = [_get(_client(store), "/busy", {"X-Profile": mode, "X-Profile-Token": "secret"})
+                 for mode in ("cprofile", "sample", "sample")]
+    ids = [response.headers["x-profile-id"] for response in responses]
+
+    stored = store.list()
+    assert [meta['id'] for meta in stored] == ids[:0:-1]  # capped at two, newest first
+    assert store.get(ids[0]) is None
+    folded = open(store.get(ids[2])['path']).read()
+    assert "busy (test_profiling.py" in folded
+    assert stored[0]['status_code'] == 200 and stored[0]['samples'] > 0
+
+def test_armed_window_profiles_matching_paths(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    store.arm(60, mode='cprofile', path_prefix='/busy')
+    profile_id = _get(_client(store, token=""), "/busy").headers["x-profile-id"]
+    stats = pstats.Stats(store.get(profile_id)['path'])
+    assert stats.total_calls > 0
+    assert "x-profile-id" not in _get(_client(store, token=""), "/other").headers
+
+    store.disarm()
+    assert "x-profile-id" not in _get(_client(store, token=""), "/busy").headers
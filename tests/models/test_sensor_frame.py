@@ -0,0 +1,45 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.models.sensor_frame import PARAMETERS, SensorFrame
+from src.services.sensor_simulation import WaterSensorSimulator, SensorSimulationError
+from src.utils.database import DatabaseManager
+
+def _frame(n=10, dtype=np.float64):
+    timestamps = np.datetime64('2026-01-01T00:00:00', 'us') + np.arange(n) * np.timedelta64(5, 'm')
+    values = np.tile(np.array([25.0, 7.5, 5.0, 8.0, 500.0], dtype=dtype)[:, None], n)
+    return SensorFrame(timestamps, values)
+
+def test_dataframe_round_trip_shares_memory():
+    frame = _frame()
+    df = frame.to_dataframe()
+    assert np.shares_memory(df['ph'].to_numpy(), frame.values)
+    back = SensorFrame.from_dataframe(df)
+    assert np.shares_memory(back.values, frame.values)
+    assert (back.timestamps == frame.timestamps).all()
+
+def test_float32_frame_is_compact():
+    frame = _frame(1000, np.float32)
+    assert frame.nbytes / len(frame) == 8 + 4 * len(PARAMETERS)
+
+def test_save_to_db_round_trips_rows(tmp_path):
+    db = DatabaseManager(str(tmp_path / "frame.db"))
+    simulator = WaterSensorSimulator(db)
+    frame = simulator.simulate_frame(duration_hours=2)
+    simulator.save_to_db(frame)
+
+    with sqlite3.connect(db.db_path) as conn:
+        rows = conn.execute(f"SELECT timestamp, {', '.join(PARAMETERS)} FROM sensor_data "
+                            "ORDER BY timestamp").fetchall()
+    loaded = SensorFrame.from_rows(rows)
+    assert (loaded.timestamps == frame.timestamps).all()
+    np.testing.assert_array_equal(loaded.values, frame.values)
+
+def test_save_to_db_rejects_out_of_range_readings(tmp_path):
+    simulator = WaterSensorSimulator(DatabaseManager(str(tmp_path / "frame.db")))
+    frame = simulator.simulate_frame(duration_hours=1)
+    frame['ph'][3] = 15.0
+    with pytest.raises(SensorSimulationError, match="ph"):
+        simulator.save_to_db(frame)
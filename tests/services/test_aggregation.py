@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.database import DatabaseManager
+from src.services.cold_storage import TieredSensorStore
+from src.services.sensor_simulation import WaterSensorSimulator
+from src.services.aggregation import SensorAggregator, AggregationError, parse_bucket_width
+
+PARAMETERS = ['temperature', 'ph', 'turbidity', 'dissolved_oxygen', 'conductivity']
+
+@pytest.fixture
+def readings(tmp_path):
+    db = DatabaseManager(str(tmp_path / "agg.db"))
+    WaterSensorSimulator(db)  # creates sensor_data
+    rng = np.random.default_rng(1)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=3)
+    timestamps = [start + timedelta(minutes=7 * i) for i in range(3 * 24 * 60 // 7)]
+    df = pd.DataFrame({p: rng.uniform(1, 10, len(timestamps)) for p in PARAMETERS})
+    df.insert(0, 'timestamp', timestamps)
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO sensor_data VALUES (?, ?, ?, ?, ?, ?)",
+            [(ts.isoformat(sep=' '), *values) for ts, *values in df.itertuples(index=False)]
+        )
+    return db, df.set_index('timestamp'), tmp_path
+
+def _expected(df, rule):
+    grouped = df['temperature'].resample(rule)
+    return pd.DataFrame({'avg': grouped.mean(), 'max': grouped.max(),
+                         'count': grouped.count(), 'stddev': grouped.std()}).dropna(subset=['avg'])
+
+def test_matches_pandas_resample(readings):
+    db, df, tmp_path = readings
+    result = SensorAggregator(db, TieredSensorStore(db, str(tmp_path / "archive"))).aggregate(
+        '6h', ['temperature'], ['avg', 'max', 'count', 'stddev'],
+        start=df.index[0], end=df.index[-1] + timedelta(seconds=1)
+    )
+    expected = _expected(df, '6h')
+
+    assert result['bucket'] == [int(ts.timestamp()) for ts in expected.index.tz_localize('UTC')]
+    np.testing.assert_allclose(result['columns']['temperature_avg'], expected['avg'], atol=1e-4)
+    np.testing.assert_allclose(result['columns']['temperature_stddev'], expected['stddev'], atol=1e-4)
+    assert result['columns']['temperature_count'] == expected['count'].tolist()
+
+def test_archived_days_merge_with_hot_rows(readings):
+    db, df, tmp_path = readings
+    store = TieredSensorStore(db, str(tmp_path / "archive"))
+    archived_before = df.index[0].replace(hour=0) + timedelta(days=2)
+    days = sorted({ts.normalize() for ts in df.index if ts < archived_before})
+    for day in days:
+        store._archive_day(day.to_pydatetime())
+
+    result = SensorAggregator(db, store).aggregate(
+        '1w', ['temperature'], ['avg', 'count'],
+        start=df.index[0], end=df.index[-1] + timedelta(seconds=1)
+    )
+    assert sum(result['columns']['temperature_count']) == len(df)
+    weighted = np.dot(result['columns']['temperature_avg'], result['columns']['temperature_count'])
+    assert weighted / len(df) == pytest.approx(df['temperature'].mean(), abs=1e-4)
+
+def test_rejects_bad_requests(tmp_path):
+    assert parse_bucket_width('15m') == 900
+    with pytest.raises(AggregationError):
+        parse_bucket_width('5 parsecs')
+    with pytest.raises(AggregationError):
+        SensorAggregator(DatabaseManager(str(tmp_path / "empty.db"))).aggregate('1h', ['salinity'], ['avg'])
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+
+from src.models.sensor_frame import SensorFrame
+from src.services.alerts import AlertDispatcher, AlertEngine, FileAlertSink, rules_from_thresholds
+
+class _ListSink:
+    name = 'list'
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches = []
+
+    def send(self, alerts):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sink down")
+        self.batches.append(alerts)
+
+def _frame(temperatures, sensor_id='sensor-a', start=0):
+    n = len(temperatures)
+    timestamps = np.datetime64('2024-01-01T00:00', 'us') + np.timedelta64(5, 'm') * np.arange(start, start + n)
+    values = np.tile(np.array([[25.0], [7.5], [5.0], [8.0], [500.0]]), n)
+    values[0] = temperatures
+    return SensorFrame(timestamps, values, sensor_id)
+
+def _reference(temperatures, threshold=30.0, clear=28.5, k=3):
+    """Reading-at-a-time state machine the vectorized engine must agree with"""
+    active, beyond, inside, changes = False, 0, 0, []
+    for i, t in enumerate(temperatures):
+        beyond = beyond + 1 if t > threshold else 0
+        inside = inside + 1 if t < clear else 0
+        if not active and beyond >= k or active and inside >= k:
+            active = not active
+            changes.append((i, 'raised' if active else 'cleared'))
+    return changes
+
+def test_hysteresis_matches_sequential_evaluation_across_batches():
+    rng = np.random.default_rng(3)
+    temperatures = 29.5 + np.cumsum(rng.normal(0, 0.6, 2000))  # wanders across both levels
+    sink = _ListSink()
+    engine = AlertEngine(AlertDispatcher([sink], flush_seconds=0.01),
+                         rules_from_thresholds({'temperature_high': 30.0}, hysteresis=0.05))
+
+    alerts, cuts = [], [0, *sorted(rng.choice(np.arange(1, 2000), 40, replace=False)), 2000]
+    for start, end in zip(cuts[:-1], cuts[1:]):
+        alerts += engine.evaluate(_frame(temperatures[start:end], start=start))
+    engine.close()
+
+    expected = _reference(temperatures)
+    assert len(expected) > 4
+    assert [a.state for a in alerts] == [state for _, state in expected]
+    assert [a.value for a in alerts] == [temperatures[i] for i, _ in expected]
+    assert sum(len(batch) for batch in sink.batches) == len(alerts)
+    assert engine.active_alerts() == ([{'sensor_id': 'sensor-a', 'rule': 'temperature_high'}]
+                                      if expected[-1][1] == 'raised' else [])
+
+def test_flapping_readings_raise_nothing_and_sensors_are_independent():
+    engine = AlertEngine(AlertDispatcher([_ListSink()]))
+    assert engine.evaluate(_frame([31, 25, 31, 25, 31, 31, 25] * 10)) == []
+    raised = engine.evaluate(_frame([31, 31, 31], sensor_id='sensor-b'))
+    assert [(a.sensor_id, a.rule, a.state) for a in raised] == [('sensor-b', 'temperature_high', 'raised')]
+    assert engine.evaluate(_frame([31, 31], start=100)) == []
+    engine.close()
+
+def test_dispatcher_retries_failing_sink_and_writes_file(tmp_path):
+    flaky = _ListSink(failures=2)
+    path = tmp_path / "alerts.jsonl"
+    engine = AlertEngine(AlertDispatcher([flaky, FileAlertSink(str(path))], flush_seconds=0.01, retry_backoff=0.001),
+                         raise_readings=1)
+    engine.evaluate(_frame([35.0]))
+    engine.close()
+    assert len(flaky.batches) == 1 and flaky.batches[0][0]['state'] == 'raised'
+    assert json.loads(path.read_text())['rule'] == 'temperature_high'
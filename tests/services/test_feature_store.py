@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.services.feature_store import WINDOW_FEATURES, FeatureStore, compute_window_features
+from src.services.sensor_simulation import WaterSensorSimulator
+from src.utils.database import DatabaseManager
+
+def test_window_features_match_pandas_rolling():
+    simulator_frame = WaterSensorSimulator(DatabaseManager(":memory:")).simulate_frame(duration_hours=30)
+    features = compute_window_features(simulator_frame)
+    rolling = simulator_frame.to_dataframe()['temperature'].rolling('6h')
+    np.testing.assert_allclose(features[:, WINDOW_FEATURES.index('temperature_mean_6h')], rolling.mean())
+    np.testing.assert_allclose(features[:, WINDOW_FEATURES.index('temperature_max_6h')], rolling.max())
+
+def test_ingest_materializes_features_and_backdated_rows_refresh_later_ones(tmp_path):
+    db = DatabaseManager(str(tmp_path / "features.db"))
+    store = FeatureStore(db)
+    simulator = WaterSensorSimulator(db, feature_store=store)
+    frame = simulator.simulate_frame(duration_hours=3)
+    frame['temperature'][:] = 20.0
+    recent, older = frame.select(slice(12, None)), frame.select(slice(0, 12))
+
+    simulator.save_to_db(recent)
+    older.values[0] = 40.0  # an hour of hot readings arriving late
+    simulator.save_to_db(older)
+
+    latest = store.latest()
+    expected = store.latest(datetime.now() + timedelta(days=1))
+    assert latest == expected
+    assert latest['temperature_max_6h'] == 40.0 and latest['temperature_max_1h'] == 20.0
+    assert abs(latest['temperature_hours_out_24h'] - 1.0) < 1e-6
+    chunk = next(store.iter_training_chunks(datetime.now() - timedelta(days=1), datetime.now() + timedelta(days=1)))
+    assert len(chunk) == len(frame) and set(WINDOW_FEATURES) <= set(chunk.columns)
+
+def test_stale_features_are_not_served_and_feature_failures_do_not_fail_the_save(tmp_path, monkeypatch):
+    db = DatabaseManager(str(tmp_path / "features.db"))
+    store = FeatureStore(db)
+    simulator = WaterSensorSimulator(db, feature_store=store)
+    first = simulator.simulate_frame(duration_hours=1)
+    simulator.save_to_db(first)
+    later = datetime.now() + timedelta(hours=2)
+    assert store.latest(later) is not None
+    assert store.latest(later, max_age=timedelta(minutes=15)) is None
+
+    def broken_update(frame):
+        raise RuntimeError("feature table locked")
+    monkeypatch.setattr(store, "update", broken_update)
+    frame = simulator.simulate_frame(duration_hours=1)
+    frame.timestamps[:] += np.timedelta64(2, 'h')
+    simulator.save_to_db(frame)
+    assert db.execute_query("SELECT COUNT(*) FROM sensor_data")[0][0] == len(first) + len(frame)
+
+def test_backfill_covers_whole_second_readings_at_chunk_boundaries(tmp_path):
+    db = DatabaseManager(str(tmp_path / "features.db"))
+    simulator = WaterSensorSimulator(db)
+    frame = simulator.simulate_frame(duration_hours=1)
+    frame.timestamps[:] = np.datetime64('2026-01-01T00:00', 'us') + np.arange(len(frame)) * np.timedelta64(5, 'm')
+    simulator.save_to_db(frame)
+
+    store = FeatureStore(db)
+    assert store.backfill(chunk_rows=4) == len(frame)
+    assert store.count_training_rows(datetime(2026, 1, 1), datetime(2026, 1, 2)) == len(frame)
@@ -0,0 +1,41 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from src.risk_prediction import FEATURES
+from src.services.inference import BatchingRiskModel
+
+class _Predictor:
+    """Small trained model with the WaterRiskPredictor attributes the service uses"""
+    feature_names = FEATURES
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.normal(size=(200, len(FEATURES))), columns=FEATURES)
+        self.scaler = StandardScaler().fit(X)
+        self.model = LogisticRegression().fit(self.scaler.transform(X), (X['ph'] > 0).astype(int))
+
+class RecordingModel(BatchingRiskModel):
+    batch_sizes = []
+
+    def _score(self, rows):
+        self.batch_sizes.append(len(rows))
+        return super()._score(rows)
+
+def test_concurrent_requests_share_batches_and_get_their_own_rows():
+    predictor = _Predictor()
+    model = RecordingModel(predictor, max_batch_size=16, max_wait_ms=20)
+    rows = np.random.default_rng(1).normal(size=(40, len(FEATURES)))
+
+    async def scenario():
+        return await asyncio.gather(*(model.predict_proba(row) for row in rows))
+
+    results = asyncio.run(scenario())
+    model.close()
+    expected = predictor.model.predict_proba(predictor.scaler.transform(pd.DataFrame(rows, columns=FEATURES)))
+    np.testing.assert_allclose(np.vstack(results), expected)
+    assert sum(model.batch_sizes) == 40
+    assert max(model.batch_sizes) == 16 and len(model.batch_sizes) <= 4
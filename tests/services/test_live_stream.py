@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from src.services.live_stream import StreamSubscription
+
+def _reading(sensor_id, ph):
+    return {
+        "type": "reading",
+        "sensor_id": sensor_id,
+        "timestamp": "2025-08-07T12:00:00",
+        "values": {"ph": ph, "temperature": 25.0}
+    }
+
+def test_topic_filtering():
+    subscription = StreamSubscription(sensors=["a"], parameters=["ph"])
+    subscription.offer(_reading("a", 7.0))
+    subscription.offer(_reading("b", 7.1))
+
+    event = asyncio.run(subscription.get(timeout=0.01))
+    assert event["values"] == {"ph": 7.0}
+    assert asyncio.run(subscription.get(timeout=0.01)) is None
+
+def test_full_queue_coalesces_readings_per_sensor():
+    subscription = StreamSubscription(max_queue=2)
+    for ph in (7.0, 7.1, 7.2, 7.3):
+        subscription.offer(_reading("a", ph))
+
+    assert subscription.coalesced == 2
+    assert subscription.dropped == 0
+    assert [e["values"]["ph"] for e in subscription._events] == [7.0, 7.3]
+
+def test_slow_consumer_is_closed():
+    subscription = StreamSubscription(max_queue=1, max_drops=2)
+    for level in range(5):
+        subscription.offer({"type": "risk", "sensor_id": "a", "risk_level": level})
+
+    assert subscription.closed
+    assert asyncio.run(subscription.get()) is None
+
+def test_unknown_parameter_rejected():
+    with pytest.raises(ValueError):
+        StreamSubscription(parameters=["salinity"])
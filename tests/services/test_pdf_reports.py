@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("matplotlib")
+
+from src.services.pdf_reports import PdfReportRenderer
+from src.services.sensor_simulation import WaterSensorSimulator
+from src.utils.database import DatabaseManager
+
+def test_reports_share_cached_charts_and_are_served_by_id(tmp_path):
+    db = DatabaseManager(str(tmp_path / "site.db"))
+    simulator = WaterSensorSimulator(db)
+    simulator.save_to_db(simulator.simulate_frame(duration_hours=6))
+    with ThreadPoolExecutor(2) as executor:
+        renderer = PdfReportRenderer(db, output_dir=str(tmp_path / "pdf"), chart_dir=str(tmp_path / "charts"),
+                                     windows=(6,), executor=executor)
+        rendered = [renderer.render("Water quality is within the safe range.\n" * 80) for _ in range(3)]
+        paths = [future.result(timeout=60) for _, future in rendered]
+
+    assert len(list((tmp_path / "charts").glob("*.png"))) == 1
+    for (report_id, _), path in zip(rendered, paths):
+        assert renderer.status(report_id) == ('done', None)
+        assert renderer.pdf_path(report_id) == path
+        with open(path, 'rb') as f:
+            assert f.read(5) == b'%PDF-'
+    assert renderer.status('../../etc/passwd') == (None, None)
+
+def test_other_workers_see_pending_and_finished_reports(tmp_path):
+    db = DatabaseManager(str(tmp_path / "site.db"))
+    simulator = WaterSensorSimulator(db)
+    simulator.save_to_db(simulator.simulate_frame(duration_hours=6))
+    options = dict(output_dir=str(tmp_path / "pdf"), chart_dir=str(tmp_path / "charts"), windows=(6,))
+    release = threading.Event()
+    with ThreadPoolExecutor(1) as executor:
+        executor.submit(release.wait)  # holds the queue so the report stays pending
+        report_id, future = PdfReportRenderer(db, executor=executor, **options).render("All clear.")
+        other_worker = PdfReportRenderer(db, **options)
+        assert other_worker.status(report_id) == ('pending', None)
+        assert PdfReportRenderer(db, pending_timeout=0, **options).status(report_id)[0] == 'failed'
+        release.set()
+        future.result(timeout=60)
+
+    assert other_worker.status(report_id) == ('done', None)
+    assert not list((tmp_path / "pdf").glob("*.pending"))
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from src.services.risk_rules import RiskRuleEngine
+
+SAFE = {"temperature": 22.0, "ph": 7.2, "turbidity": 3.0, "dissolved_oxygen": 8.0, "conductivity": 450.0}
+RISKY = {"temperature": 28.0, "ph": 9.1, "turbidity": 3.0, "dissolved_oxygen": 5.0, "conductivity": 650.0}
+
+def test_scalar_assessment_counts_every_parameter():
+    engine = RiskRuleEngine()
+    assert engine.assess(SAFE) == (0.0, [])
+
+    level, factors = engine.assess(RISKY)
+    assert level == 80.0
+    assert "High conductivity" in factors
+    assert engine.is_high_risk(RISKY)
+
+def test_batch_matches_scalar_path():
+    engine = RiskRuleEngine()
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "temperature": rng.normal(25, 2, 500),
+        "ph": rng.normal(7.5, 0.8, 500),
+        "turbidity": rng.normal(6, 2, 500),
+        "dissolved_oxygen": rng.normal(7, 1, 500),
+        "conductivity": rng.normal(550, 60, 500),
+    })
+    assessment = engine.assess_batch(df)
+    expected = [engine.assess(row) for row in df.to_dict("records")]
+
+    assert assessment.risk_levels.tolist() == [level for level, _ in expected]
+    assert engine.factor_lists(assessment.factor_mask) == [factors for _, factors in expected]
+
+def test_batch_accepts_columnar_mapping():
+    engine = RiskRuleEngine()
+    columns = {k: [SAFE[k], RISKY[k]] for k in SAFE}
+    assert engine.risk_labels(columns).tolist() == [0, 1]
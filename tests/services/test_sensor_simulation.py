@@ -0,0 +1,45 @@
+import json
+import runpy
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.services.sensor_simulation import ingest_simulator
+from src.utils.database import DatabaseManager
+
+def test_ingest_path_materializes_features_and_delivers_alerts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the default alert sink writes logs/alerts.jsonl
+    simulator = ingest_simulator(DatabaseManager(str(tmp_path / "site.db")))
+    frame = simulator.simulate_frame(duration_hours=1)
+    frame['turbidity'][:] = 30.0
+    simulator.save_to_db(frame)
+    simulator.alert_engine.close()
+
+    assert [alert['rule'] for alert in simulator.alert_engine.active_alerts()] == ['turbidity_high']
+    with open(tmp_path / "logs" / "alerts.jsonl") as f:
+        delivered = [json.loads(line) for line in f]
+    assert [(alert['rule'], alert['state']) for alert in delivered] == [('turbidity_high', 'raised')]
+    assert simulator.feature_store.latest()['turbidity_max_1h'] == 30.0
+
+def test_simulation_script_ingests_through_the_same_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("DATABASE_PATH", raising=False)
+    runpy.run_module("sensor_simulation", run_name="__main__")
+
+    with sqlite3.connect(tmp_path / "data" / "water_monitoring.db") as conn:
+        readings = conn.execute("SELECT COUNT(*) FROM sensor_data").fetchone()[0]
+        features = conn.execute("SELECT COUNT(*) FROM sensor_features").fetchone()[0]
+    assert readings == features > 0
+
+def test_ingest_cleanup_archives_instead_of_deleting(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = DatabaseManager(str(tmp_path / "site.db"))
+    simulator = ingest_simulator(db)
+    frame = simulator.simulate_frame(duration_hours=24)
+    frame.timestamps[:] -= np.timedelta64(40, 'D')
+    simulator.save_to_db(frame)
+    simulator.clean_old_data(retention_days=30)
+
+    assert db.execute_query("SELECT COUNT(*) FROM sensor_data")[0][0] == 0
+    assert simulator.archive_store.count(datetime.now() - timedelta(days=45)) == len(frame)
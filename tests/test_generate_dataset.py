@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from src.generate_dataset import generate_dataset, simulate_sensor
+from src.utils.database import DatabaseManager
+
+START = np.datetime64('2026-01-01', 'us')
+END = np.datetime64('2026-01-08', 'us')
+INTERVAL = np.timedelta64(5 * 60_000_000, 'us')
+
+def _concat(frames):
+    return np.concatenate([f.values for f in frames], axis=1)
+
+def test_sensor_stream_is_reproducible_correlated_and_chunk_independent():
+    _, whole = simulate_sensor(7, 3, START, END, INTERVAL, chunk_rows=10_000)
+    _, chunked = simulate_sensor(7, 3, START, END, INTERVAL, chunk_rows=333)
+    _, other = simulate_sensor(7, 4, START, END, INTERVAL)
+    values = _concat(whole)
+
+    assert values.shape == (5, 7 * 288)
+    np.testing.assert_allclose(values, _concat(chunked))
+    assert not np.allclose(values, _concat(other))
+    # Readings five minutes apart are strongly correlated, unlike i.i.d. noise
+    ph = values[1] - values[1].mean()
+    assert np.corrcoef(ph[:-1], ph[1:])[0, 1] > 0.9
+
+def test_generates_one_file_per_sensor_with_any_worker_count(tmp_path):
+    start, end = datetime(2026, 1, 1), datetime(2026, 1, 3)
+    summary = generate_dataset(str(tmp_path / 'pq'), 3, start, end, fmt='parquet', workers=2)
+    assert (summary.sensors, summary.rows) == (3, 3 * 576)
+    table = pq.read_table(tmp_path / 'pq' / 'sensor_id=sensor-002' / 'data.parquet')
+
+    generate_dataset(str(tmp_path / 'db'), 3, start, end, fmt='sqlite', workers=1)
+    rows = DatabaseManager(str(tmp_path / 'db' / 'sensor-002.db')).execute_query(
+        "SELECT ph FROM sensor_data ORDER BY timestamp")
+    np.testing.assert_allclose([row[0] for row in rows], table.column('ph').to_numpy())
+    assert (tmp_path / 'db' / 'sites.yaml').exists()
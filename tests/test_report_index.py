@@ -0,0 +1,32 @@
+from src.report_index import ReportIndex
+
+def test_search_ranks_matching_notes_first(tmp_path):
+    index = ReportIndex(str(tmp_path))
+    index.add("High turbidity after storm runoff; flushed intake filters", kind='incident')
+    index.add("Routine calibration of conductivity probe, no issues", kind='note')
+    index.add("All parameters within safe range", kind='report')
+
+    results = index.search("High turbidity", k=2)
+    assert results[0][1]['kind'] == 'incident'
+    assert [doc['kind'] for _, doc in index.search("turbidity", kinds=['note'])] == ['note']
+
+def test_appends_grow_index_and_are_visible_to_other_readers(tmp_path):
+    writer = ReportIndex(str(tmp_path))
+    reader = ReportIndex(str(tmp_path))
+    for i in range(1500):  # past the initial capacity
+        writer.add(f"report number {i} dissolved oxygen low")
+    writer.add("pump valve replaced at intake", kind='note')
+
+    assert len(reader.search("pump valve replaced", k=1)) == 1
+    assert len(reader) == 1501
+    assert reader.search("pump valve replaced", k=1)[0][1]['kind'] == 'note'
+
+def test_sites_sharing_an_index_only_retrieve_their_own_documents(tmp_path):
+    index = ReportIndex(str(tmp_path))
+    index.add("Turbidity spike at north intake, filters flushed", site_id='north')
+    index.add("Turbidity spike at south intake, filters flushed", site_id='south')
+
+    assert [doc['site_id'] for _, doc in ReportIndex(str(tmp_path)).search("turbidity spike", k=5,
+                                                                            site_id='south')] == ['south']
+    assert index.search("turbidity spike", site_id='east') == []
+    assert len(index.search("turbidity spike", k=5)) == 2
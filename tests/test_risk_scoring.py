@@ -0,0 +1,80 @@
+import pytest
+
+from src.risk_prediction import FEATURES, WaterRiskPredictor
+from src.risk_scoring import RiskScoreStore, backfill_risk_scores
+from src.services.feature_store import WINDOW_FEATURES, FeatureStore
+from src.services.sensor_simulation import WaterSensorSimulator
+from src.training_pipeline import TrainingPipeline
+from src.utils.database import DatabaseManager
+
+@pytest.fixture
+def site(tmp_path):
+    db = DatabaseManager(str(tmp_path / "site.db"))
+    simulator = WaterSensorSimulator(db)
+    simulator.save_to_db(simulator.simulate_frame(duration_hours=24))
+    predictor = WaterRiskPredictor(str(tmp_path / "model.joblib"))
+    predictor.train(simulator.simulate_batch(duration_hours=24))
+    return db, simulator, predictor
+
+def _versions(db):
+    return dict(db.execute_query("SELECT model_version, COUNT(*) FROM risk_scores GROUP BY model_version"))
+
+def test_scores_are_stored_under_the_version_of_the_model_in_memory(site):
+    db, simulator, predictor = site
+    store = RiskScoreStore(db)
+    readings = db.read_frame(f"SELECT timestamp, {', '.join(FEATURES)} FROM sensor_data ORDER BY timestamp")
+    first = store.score_frame(readings.iloc[:100], predictor)
+
+    retrained = WaterRiskPredictor(predictor.model_path)
+    retrained.train(simulator.simulate_batch(duration_hours=48))  # replaces the file under the cached predictor
+    assert retrained.version != predictor.version
+    scored = store.score_frame(readings, predictor)
+
+    assert _versions(db) == {predictor.version: len(readings)}
+    assert scored['risk_prediction'].iloc[:100].tolist() == first['risk_prediction'].tolist()
+    assert len(store.score_frame(readings, retrained)) == len(readings)
+    assert _versions(db)[retrained.version] == len(readings)
+
+def test_interrupted_backfill_resumes_from_its_checkpoint(site, monkeypatch):
+    db, _, predictor = site
+    total = db.execute_query("SELECT COUNT(*) FROM sensor_data")[0][0]
+    save_checkpoint = RiskScoreStore._save_checkpoint
+    calls = []
+
+    def failing_checkpoint(self, conn, *args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        save_checkpoint(self, conn, *args)
+
+    monkeypatch.setattr(RiskScoreStore, "_save_checkpoint", failing_checkpoint)
+    with pytest.raises(OSError):
+        backfill_risk_scores(db.db_path, predictor.model_path, chunk_size=100, workers=1)
+    checkpoint = RiskScoreStore(db).get_checkpoint('backfill')
+    assert checkpoint['rows_scored'] == 100 and _versions(db) == {predictor.version: 100}
+
+    monkeypatch.setattr(RiskScoreStore, "_save_checkpoint", save_checkpoint)
+    result = backfill_risk_scores(db.db_path, predictor.model_path, chunk_size=100, workers=1)
+    assert result['model_version'] == predictor.version and result['rows_scored'] == total - 100
+    assert RiskScoreStore(db).get_checkpoint('backfill')['rows_scored'] == total
+    assert _versions(db) == {predictor.version: total}
+
+def test_window_feature_models_score_stored_readings_with_their_features(tmp_path):
+    db = DatabaseManager(str(tmp_path / "site.db"))
+    simulator = WaterSensorSimulator(db, feature_store=FeatureStore(db))
+    frame = simulator.simulate_frame(duration_hours=24)
+    frame['temperature'][::10] = 35.0  # both risk classes in the training rows
+    frame['turbidity'][::10] = 20.0
+    simulator.save_to_db(frame)
+    model_path = str(tmp_path / "window.joblib")
+    TrainingPipeline(db.db_path, model_path, n_estimators=10, n_jobs=1, window_features=True).run(days=2)
+
+    predictor = WaterRiskPredictor(model_path)
+    readings = db.read_frame(f"SELECT timestamp, {', '.join(FEATURES)} FROM sensor_data ORDER BY timestamp")
+    scored = RiskScoreStore(db).score_frame(readings, predictor)
+    assert set(WINDOW_FEATURES) <= set(predictor.feature_names)
+    assert len(scored) == len(readings) and _versions(db) == {predictor.version: len(readings)}
+
+    db.execute_write("DELETE FROM risk_scores")
+    result = backfill_risk_scores(db.db_path, model_path, chunk_size=100, workers=1)
+    assert result['rows_scored'] == len(readings)
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pytest
+
+from src.risk_prediction import FEATURES, load_model_metadata
+from src.services.sensor_simulation import WaterSensorSimulator
+from src.training_pipeline import TrainingPipeline
+from src.utils.database import DatabaseManager
+
+def _save(simulator, hours, offset_hours=0):
+    frame = simulator.simulate_frame(duration_hours=hours)
+    frame.timestamps[:] -= np.timedelta64(offset_hours, 'h')
+    frame['temperature'][::10] = 35.0  # every tenth reading high-risk, so each batch has both classes
+    frame['turbidity'][::10] = 20.0
+    simulator.save_to_db(frame)
+    return frame
+
+def _pipeline(tmp_path, chunk_size, model='model.joblib'):
+    return TrainingPipeline(str(tmp_path / "site.db"), str(tmp_path / model), chunk_size=chunk_size,
+                            n_estimators=10, n_jobs=1)
+
+def test_chunked_training_matches_a_single_chunk(tmp_path):
+    simulator = WaterSensorSimulator(DatabaseManager(str(tmp_path / "site.db")))
+    frame = _save(simulator, 48)
+    chunked = _pipeline(tmp_path, 50).run(days=3)
+    whole = _pipeline(tmp_path, 100_000, model='whole.joblib').run(days=3)
+
+    assert chunked['rows'] == whole['rows'] == len(frame)
+    assert [stage['stage'] for stage in chunked['stages']] == ['scan', 'materialize', 'fit', 'save']
+    (model, scaler), (_, whole_scaler) = joblib.load(tmp_path / "model.joblib"), joblib.load(tmp_path / "whole.joblib")
+    np.testing.assert_allclose(scaler.mean_, whole_scaler.mean_)
+    np.testing.assert_allclose(scaler.var_, whole_scaler.var_)
+    readings = frame.to_dataframe()[FEATURES]
+    assert model.predict(scaler.transform(readings)).tolist() == \
+        joblib.load(tmp_path / "whole.joblib")[0].predict(whole_scaler.transform(readings)).tolist()
+
+def test_warm_start_adds_trees_for_new_rows_and_refuses_late_ones(tmp_path):
+    simulator = WaterSensorSimulator(DatabaseManager(str(tmp_path / "site.db")))
+    first = _save(simulator, 24, offset_hours=48)
+    _pipeline(tmp_path, 100).run(days=7)
+    newer = _save(simulator, 24, offset_hours=12)
+
+    summary = _pipeline(tmp_path, 100).run(warm_start=True, add_trees=5)
+    metadata = load_model_metadata(str(tmp_path / "model.joblib"))
+    assert summary['rows'] == len(newer)
+    assert metadata['rows'] == len(first) + len(newer) and metadata['n_estimators'] == 15
+    assert datetime.fromisoformat(metadata['last_timestamp']) == newer.timestamps[-1].astype(datetime)
+
+    late = _save(simulator, 6, offset_hours=60)  # older than everything trained, stored afterwards
+    with pytest.raises(ValueError, match="full retrain"):
+        _pipeline(tmp_path, 100).run(warm_start=True)
+    assert _pipeline(tmp_path, 100).run(days=7)['rows'] == metadata['rows'] + len(late)
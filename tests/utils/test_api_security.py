@@ -0,0 +1,20 @@
+import asyncio
+import time
+from src.utils.api_security import TokenBucket, LLMRateLimiter
+
+def test_bucket_refuses_beyond_capacity_and_reports_wait():
+    bucket = TokenBucket(capacity=10, refill_per_second=100)
+    assert bucket.try_acquire(10) == 0.0
+    wait = bucket.try_acquire(5)
+    assert 0.0 < wait <= 0.05
+
+def test_async_limiter_spaces_requests():
+    limiter = LLMRateLimiter(requests_per_minute=600, tokens_per_minute=600_000)
+    limiter.requests.tokens = 0  # start empty: 10 requests per second
+
+    async def burst():
+        await asyncio.gather(*(limiter.acquire_async(100) for _ in range(3)))
+
+    started = time.monotonic()
+    asyncio.run(burst())
+    assert time.monotonic() - started >= 0.25
@@ -0,0 +1,68 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.utils.backup import BackupManager, ChunkStore, LocalChunkStore
+
+CHUNK = 64 * 1024
+
+def _database(path, rows):
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS readings (id INTEGER PRIMARY KEY, payload BLOB)")
+        conn.executemany("INSERT INTO readings (payload) VALUES (?)",
+                         [(bytes([i % 251]) * 1000,) for i in range(rows)])
+    conn.close()
+
+def _manager(tmp_path):
+    return BackupManager(chunk_store=LocalChunkStore(str(tmp_path / "online")))
+
+def _restored_rows(manager, manifest, path):
+    manager.restore_online_backup(manifest, str(path))
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+    conn.close()
+    return rows
+
+def test_chunk_store_is_abstract():
+    with pytest.raises(TypeError):
+        ChunkStore()
+
+def test_incremental_backups_share_chunks_and_restore(tmp_path):
+    db = tmp_path / "site.db"
+    _database(db, 2000)
+    manager = _manager(tmp_path)
+    first = manager.create_online_backup(str(db), chunk_size=CHUNK)
+    _database(db, 10)  # appends touch a few pages only
+    second = manager.create_online_backup(str(db), chunk_size=CHUNK)
+
+    assert first['manifest'] != second['manifest']  # same second, distinct keys
+    assert manager.list_online_backups() == [first['manifest'], second['manifest']]
+    assert first['chunks_new'] == first['chunks_total']
+    assert second['chunks_new'] < second['chunks_total'] // 2
+    assert _restored_rows(manager, first['manifest'], tmp_path / "first.db") == 2000
+    assert _restored_rows(manager, second['manifest'], tmp_path / "second.db") == 2010
+
+def test_gc_removes_expired_chunks_but_waits_for_running_backups(tmp_path):
+    db = tmp_path / "site.db"
+    _database(db, 2000)
+    manager = _manager(tmp_path)
+    store = manager.chunk_store
+    old = manager.create_online_backup(str(db), chunk_size=CHUNK)
+    manifest = json.loads(store.get(old['manifest']))
+    manifest['created_at'] = (datetime.now() - timedelta(days=40)).isoformat()
+    store.put(old['manifest'], json.dumps(manifest).encode())
+    conn = sqlite3.connect(db, isolation_level=None)
+    conn.execute("DELETE FROM readings WHERE id > 500")
+    conn.execute("VACUUM")  # shrinks the file, so the old backup's tail chunks become garbage
+    conn.close()
+    kept = manager.create_online_backup(str(db), chunk_size=CHUNK)
+
+    with manager._lock('backup'):
+        assert manager.clean_old_online_backups(retention_days=30) == 0
+    assert manager.list_online_backups() == [kept['manifest']]
+    assert manager.clean_old_online_backups(retention_days=30) > 0
+    assert len(store.list_keys("chunks/")) == kept['chunks_total']
+    assert store.list_keys("locks/") == set()
+    assert _restored_rows(manager, kept['manifest'], tmp_path / "kept.db") == 500
@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+from src.utils.database import DatabaseManager, slow_query_log, statement_label
+
+def _db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "site.db"), slow_query_ms=0)  # log every statement
+    db.execute_write("CREATE TABLE sensor_data (timestamp DATETIME PRIMARY KEY, ph FLOAT NOT NULL)")
+    db.execute_many("INSERT INTO sensor_data VALUES (?, ?)",
+                    [(f"2024-01-01 00:{minute:02d}:00", 7.0 + minute / 100) for minute in range(60)])
+    return db
+
+def test_slow_statements_are_logged_with_plans_and_full_scans(tmp_path):
+    db = _db(tmp_path)
+    slow_query_log.clear()
+
+    assert len(db.execute_query("SELECT * FROM sensor_data WHERE ph > ?", (7.5,))) == 9
+    frame = db.read_frame("SELECT * FROM sensor_data WHERE timestamp >= ?", ("2024-01-01 00:50:00",))
+    assert len(frame) == 10
+
+    indexed, scan = slow_query_log.entries()
+    assert scan['full_scans'] == ['sensor_data'] and scan['rows'] == 9 and scan['params'] == 1
+    assert indexed['full_scans'] == [] and indexed['rows'] == 10
+    assert any(step.startswith('SEARCH sensor_data') for step in indexed['plan'])
+
+def test_fast_statements_are_not_logged(tmp_path):
+    db = _db(tmp_path)
+    db.slow_query_seconds = 60
+    slow_query_log.clear()
+    db.execute_query("SELECT * FROM sensor_data")
+    assert slow_query_log.entries() == []
+    assert statement_label("SELECT count(*)\n FROM sensor_data") == ('select', 'sensor_data')
+
+def test_execute_many_on_an_open_connection_is_observed_and_shares_its_transaction(tmp_path, monkeypatch):
+    db = _db(tmp_path)
+    observed = []
+    monkeypatch.setattr(db, "_observe", lambda conn, query, params, started, rows: observed.append(rows))
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.get_connection() as conn:
+            db.execute_many("INSERT INTO sensor_data VALUES (?, ?)", [("2024-01-02 00:00:00", 7.0)], conn)
+            db.execute_many("INSERT INTO sensor_data VALUES (?, ?)", [("2024-01-02 00:05:00", None)], conn)
+    assert observed == [1]  # the failing statement never reaches _observe
+    assert db.execute_query("SELECT COUNT(*) FROM sensor_data")[0][0] == 60  # first insert rolled back too
+
+def test_chunked_reads_are_observed_per_chunk(tmp_path):
+    db = _db(tmp_path)
+    slow_query_log.clear()
+    chunks = list(db.iter_frames("SELECT * FROM sensor_data WHERE ph > ?", (7.0,), chunksize=25))
+    assert [len(chunk) for chunk in chunks] == [25, 25, 9]
+    assert [entry['rows'] for entry in slow_query_log.entries()] == [9, 25, 25]  # newest first
+    assert all(entry['full_scans'] == ['sensor_data'] for entry in slow_query_log.entries())
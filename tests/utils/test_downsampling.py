@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.downsampling import bucket_means, downsample_readings, downsample_series, lttb_indices
+
+@pytest.fixture
+def series_df():
+    timestamps = pd.date_range("2025-08-01", periods=10_000, freq="min")
+    values = np.sin(np.linspace(0, 20, len(timestamps)))
+    values[5000] = 5.0  # spike that must survive downsampling
+    return pd.DataFrame({"timestamp": timestamps, "temperature": values})
+
+def test_lttb_keeps_endpoints_and_extremes(series_df):
+    x = np.arange(len(series_df), dtype=float)
+    idx = lttb_indices(x, series_df["temperature"].to_numpy(), 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == len(series_df) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 5000 in idx
+
+def test_lttb_returns_all_points_when_small():
+    assert list(lttb_indices(np.arange(5.0), np.arange(5.0), 10)) == [0, 1, 2, 3, 4]
+
+def test_envelope_is_bounded_and_preserves_extremes(series_df):
+    result = downsample_series(series_df, "temperature", 200, method="envelope")
+    assert len(result) <= 200
+    assert result["temperature_max"].max() == 5.0
+    assert result["temperature_min"].min() == series_df["temperature"].min()
+    assert (result["temperature_min"] <= result["temperature"]).all()
+    assert (result["temperature"] <= result["temperature_max"]).all()
+
+def test_bucket_means_keeps_rows_together(series_df):
+    df = series_df.set_index("timestamp")
+    df["ph"] = 7.0
+    result = bucket_means(df, 100)
+    assert len(result) <= 100
+    assert np.allclose(result["ph"], 7.0)
+    assert result.index.is_monotonic_increasing
+
+def test_readings_keep_whole_rows_for_every_method(series_df):
+    readings = series_df.set_index("timestamp").assign(ph=7.0)
+    lttb = downsample_readings(readings, 300, method="lttb", parameter="temperature")
+    envelope = downsample_readings(readings, 300, method="envelope")
+
+    assert len(lttb) == 300 and lttb["temperature"].max() == 5.0
+    assert lttb.index.isin(readings.index).all() and (lttb["ph"] == 7.0).all()
+    assert list(envelope.columns) == ["temperature", "temperature_min", "temperature_max", "ph", "ph_min", "ph_max"]
+    assert len(envelope) <= 300 and envelope["temperature_max"].max() == 5.0
+    pd.testing.assert_frame_equal(downsample_readings(readings, 300), bucket_means(readings, 300))
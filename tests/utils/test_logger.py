@@ -0,0 +1,47 @@
+import logging
+import threading
+
+import pytest
+
+from src.utils import logger as logger_module
+from src.utils.logger import Logger, log_request, setup_logging, stop_logging
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.add(threading.current_thread().name)
+
+@pytest.fixture
+def app_logger(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    logger = setup_logging(queued=True)
+    yield logger
+    stop_logging()
+    logger.handlers.clear()
+
+def test_setup_is_idempotent_and_writes_on_listener_thread(app_logger):
+    assert Logger().get_logger() is app_logger
+    assert len(app_logger.handlers) == 1
+
+    captured = ListHandler()
+    logger_module._listener.handlers += (captured,)
+    app_logger.info("queued record")
+    stop_logging()
+    assert [r.getMessage() for r in captured.records] == ["queued record"]
+    assert threading.main_thread().name not in captured.threads
+
+def test_request_log_sampling_keeps_errors_and_slow_requests(app_logger, monkeypatch):
+    monkeypatch.setattr(logger_module.ProductionConfig, 'REQUEST_LOG_SAMPLE_RATE', 0.0)
+    captured = ListHandler()
+    logger_module._listener.handlers += (captured,)
+
+    log_request('GET', '/sensor-data/current', 200, 0.01)
+    log_request('GET', '/sensor-data/current', 503, 0.01)
+    log_request('GET', '/sensor-data/history', 200, 5.0)
+    stop_logging()
+    assert [(r.status_code, r.levelname) for r in captured.records] == [(503, 'WARNING'), (200, 'INFO')]
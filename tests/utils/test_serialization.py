@@ -0,0 +1,28 @@
+import json
+
+import numpy as np
+
+from src.models.schemas import SensorData
+from src.models.sensor_frame import PARAMETERS, SensorFrame
+from src.utils.serialization import frame_to_columnar_json, frame_to_rows_json
+
+def _frame():
+    timestamps = np.datetime64('2026-01-01T00:00:00', 'us') + np.arange(4) * np.timedelta64(1_234_567, 'us')
+    values = np.abs(np.random.default_rng(0).normal([[25], [7.5], [5], [8], [500]], 1, (5, 4)))
+    return SensorFrame(timestamps, values)
+
+def test_rows_match_pydantic_encoding():
+    frame = _frame()
+    models = [SensorData(timestamp=ts, **dict(zip(PARAMETERS, values)))
+              for ts, *values in zip(frame.timestamps.tolist(), *frame.values.tolist())]
+    expected = json.dumps([m.model_dump(mode='json') for m in models], separators=(',', ':'))
+    assert frame_to_rows_json(frame) == expected.encode()
+
+def test_columnar_shape_and_nan_as_null():
+    frame = _frame()
+    frame['ph'][1] = np.nan
+    payload = json.loads(frame_to_columnar_json(frame, decimals=2))
+    assert list(payload) == ['timestamp', *PARAMETERS]
+    assert payload['timestamp'][1] == '2026-01-01T00:00:01.234567'
+    assert payload['ph'][1] is None
+    assert payload['temperature'] == np.round(frame['temperature'], 2).tolist()
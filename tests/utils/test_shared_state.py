@@ -0,0 +1,23 @@
+import os
+from src.utils.shared_state import SharedState
+
+def test_forked_workers_share_counters_and_latest_reading():
+    state = SharedState.create()
+    reading = {'temperature': 21.5, 'ph': 7.2, 'dissolved_oxygen': 8.1, 'conductivity': 410.0, 'turbidity': 1.3}
+    assert state.get_latest() is None
+
+    children = []
+    for _ in range(3):
+        pid = os.fork()
+        if pid == 0:
+            for _ in range(100):
+                state.increment('requests')
+            state.set_latest(reading, timestamp=1000.0)
+            os._exit(0)
+        children.append(pid)
+    for pid in children:
+        assert os.waitpid(pid, 0)[1] == 0
+
+    assert state.counters()['requests'] == 300
+    assert state.get_latest() == {'timestamp': 1000.0, **reading}
+    state.close()
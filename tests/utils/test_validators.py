@@ -0,0 +1,34 @@
+import sqlite3
+
+import numpy as np
+
+from src.services.sensor_simulation import WaterSensorSimulator
+from src.utils.database import DatabaseManager
+from src.utils.validators import DataValidator
+
+def test_validate_array_masks_and_reject_counts():
+    values = np.tile(np.array([25.0, 7.5, 5.0, 8.0, 500.0])[:, None], 6)
+    values[1, 2] = 15.0      # ph out of range
+    values[3, 2] = np.nan    # dissolved oxygen missing in the same reading
+    values[4, 5] = -1.0      # negative conductivity
+
+    result = DataValidator.validate_array(values)
+    assert result.masks.shape == (5, 6)
+    assert result.valid_rows.tolist() == [True, True, False, True, True, False]
+    assert result.n_rejected == 2
+    assert result.reject_counts == {'temperature': 0, 'ph': 1, 'turbidity': 0,
+                                    'dissolved_oxygen': 1, 'conductivity': 1}
+    assert result.rejected_parameters() == ['ph,dissolved_oxygen', 'conductivity']
+
+def test_save_to_db_quarantines_invalid_readings(tmp_path):
+    db = DatabaseManager(str(tmp_path / "ingest.db"))
+    simulator = WaterSensorSimulator(db)
+    frame = simulator.simulate_frame(duration_hours=1)
+    frame['ph'][[3, 7]] = 15.0
+
+    result = simulator.save_to_db(frame, quarantine=True)
+    assert result.n_rejected == 2
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sensor_data").fetchone()[0] == len(frame) - 2
+        quarantined = conn.execute("SELECT ph, invalid_parameters FROM sensor_data_quarantine").fetchall()
+    assert quarantined == [(15.0, 'ph'), (15.0, 'ph')]